@@ -1,41 +1,95 @@
+import os
 import sys
-import xbmcaddon
+import time
 import xbmcgui
 import xbmcplugin
 from datetime import datetime
-from typing import Any, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import urlencode, parse_qsl
-from resources.lib import areena
 from resources.lib import logger
-from resources.lib.extractor import extract_media_url, media_url_for_plain_url
-from resources.lib.searchhistory import get_search_history
-from resources.lib.kodi import play_media, show_notification, icon_path, set_video_info
+from resources.lib import timing
+from resources.lib.manifesturl import live_tv_manifest_url, media_url_for_plain_url
+from resources.lib.kodi import addon, localized, play_media, show_notification, icon_path, \
+    profile_path, refresh_container, screen_width, set_video_info
+
+# The modules that depend on requests and html5lib are slow to import. Routes
+# import them only when they are needed. See tests/test_startup.py.
+if TYPE_CHECKING:
+    from resources.lib.areena import AreenaLink, StreamLink
+    from resources.lib.epg import ChannelSchedule
 
 _url = sys.argv[0]
 _handle = int(sys.argv[1])
-_addon = xbmcaddon.Addon()
-localized = _addon.getLocalizedString
+
+# Default number of items on a page. Same as areena.DEFAULT_PAGE_SIZE.
+DEFAULT_PAGE_SIZE = 30
+
+# Time limit in seconds for downloading the next page in the background
+PREFETCH_TIMEOUT = 5
+
+# Maximum number of matches from the local search index on a search page
+LOCAL_RESULTS_LIMIT = 10
+
+# Time limit in seconds for downloading the artwork of the next page
+IMAGE_PREFETCH_TIMEOUT = 10
+
+# Time limit in seconds for refreshing a stale listing in the background
+REVALIDATE_TIMEOUT = 10
+
+# Whether Kodi may cache the listing of a route on disk and show it again
+# without calling the add-on, for example when navigating back. Listings that
+# change often are not cached.
+CACHE_TO_DISC = {
+    None: False,
+    'search_menu': False,
+    'search_page': False,
+    'series': True,
+    'series_all': True,
+    'season': True,
+    'season_all': True,
+    'live_menu': False,
+}
+
+# Actions that download from the network. The caches are enabled for them.
+NETWORK_ACTIONS = ['play_areenaurl', 'series', 'series_all', 'season', 'season_all',
+                   'live_menu', 'search_input', 'search_page']
+
+# Number of newest cProfile dumps kept in the profile directory
+MAX_PROFILE_FILES = 20
+
+# Labels of the "more" links on the live menu, by the live source name
+_live_source_more_labels = {
+    'only_in_areena': 30007,
+    'sports': 30008,
+}
 
 
 def show_menu() -> None:
+    from resources.lib import epg
+
+    if addon().getSettingBool('show_epg'):
+        schedules = epg.load_schedules(profile_path('cache.sqlite'))
+    else:
+        schedules = {}
+
     listing = [
-        list_item_video(
+        list_item_live_channel(
             'Yle TV1',
-            areena.live_tv_manifest_url('622365', 'yletv1fin'),
-            thumbnail=icon_path('tv1.png'),
-            is_live=True
+            live_tv_manifest_url('622365', 'yletv1fin'),
+            icon_path('tv1.png'),
+            schedules.get(epg.TV1)
         ),
-        list_item_video(
+        list_item_live_channel(
             'Yle TV2',
-            areena.live_tv_manifest_url('622366', 'yletv2fin'),
-            thumbnail=icon_path('tv2.png'),
-            is_live=True
+            live_tv_manifest_url('622366', 'yletv2fin'),
+            icon_path('tv2.png'),
+            schedules.get(epg.TV2)
         ),
-        list_item_video(
+        list_item_live_channel(
             'Yle Teema & Fem',
-            areena.live_tv_manifest_url('622367', 'yletvteemafemfin'),
-            thumbnail=icon_path('teemafem.png'),
-            is_live=True
+            live_tv_manifest_url('622367', 'yletvteemafemfin'),
+            icon_path('teemafem.png'),
+            schedules.get(epg.TEEMA_FEM)
         ),
         list_item_live_broadcasts(),
         list_item_search_menu(),
@@ -43,7 +97,46 @@ def show_menu() -> None:
 
     xbmcplugin.addDirectoryItems(_handle, listing, len(listing))
     xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_NONE)
-    xbmcplugin.endOfDirectory(_handle)
+    xbmcplugin.endOfDirectory(_handle, cacheToDisc=CACHE_TO_DISC[None])
+
+
+def list_item_live_channel(
+    channel_name: str,
+    path: str,
+    thumbnail: str,
+    schedule: Optional['ChannelSchedule']
+) -> Tuple[str, Any, bool]:
+    """A live TV channel with the current and the next program, if known."""
+    label = channel_name
+    description = None
+    if schedule is not None:
+        current, following = schedule.now_and_next(time.time())
+        lines = []
+        if current is not None:
+            label = f'{channel_name}: {current.title}'
+            lines.append(f'{_program_time(current.start, current.end)} {current.title}')
+            if current.description:
+                lines.append(current.description)
+        if following is not None:
+            if lines:
+                lines.append('')
+            lines.append(f'{localized(30013)}: '
+                         f'{_program_time(following.start, following.end)} {following.title}')
+        description = '\n'.join(lines) or None
+
+    return list_item_video(
+        label,
+        path,
+        thumbnail=thumbnail,
+        description=description,
+        is_live=True
+    )
+
+
+def _program_time(start: float, end: float) -> str:
+    start_time = datetime.fromtimestamp(start).strftime('%H:%M')
+    end_time = datetime.fromtimestamp(end).strftime('%H:%M')
+    return f'{start_time}\u2013{end_time}'
 
 
 def list_item_video(
@@ -55,7 +148,8 @@ def list_item_video(
     description: Optional[str] = None,
     duration: Optional[int] = None,
     action: str = 'play',
-    is_live: bool = False
+    is_live: bool = False,
+    season: Optional[int] = None
 ) -> Tuple[str, Any, bool]:
     query = urlencode({'action': action, 'path': path})
     item_url = f'{_url}?{query}'
@@ -65,14 +159,10 @@ def list_item_video(
     if is_live:
         item.setProperty('IsLive', 'true')
 
-    set_video_info(item, published=published, plot=description, duration=duration)
+    set_video_info(item, published=published, plot=description, duration=duration,
+                   season=season)
 
-    art = {}
-    if thumbnail:
-        art['thumb'] = thumbnail
-    if fanart:
-        art['fanart'] = fanart
-    item.setArt(art)
+    item.setArt(_art(thumb=thumbnail, fanart=fanart))
 
     is_folder = False
     return (item_url, item, is_folder)
@@ -83,6 +173,7 @@ def list_item_series(
     series_id: str,
     thumbnail: Optional[str] = None,
     description: Optional[str] = None,
+    fanart: Optional[str] = None,
 ) -> Tuple[str, Any, bool]:
     q = urlencode({
         'action': 'series',
@@ -91,12 +182,23 @@ def list_item_series(
     item_url = f'{_url}?{q}'
     item = xbmcgui.ListItem(label, offscreen=True)
     set_video_info(item, plot=description)
-    if thumbnail:
-        item.setArt({'thumb': thumbnail})
+    item.setArt(_art(thumb=thumbnail, fanart=fanart))
     is_folder = True
     return (item_url, item, is_folder)
 
 
+def _art(**images: Optional[str]) -> dict:
+    """Build a setArt() dictionary. Images found in the image cache are
+    replaced by the local copies."""
+    from resources.lib import imagecache
+
+    return {
+        role: imagecache.art_path(url)
+        for role, url in images.items()
+        if url
+    }
+
+
 def list_item_series_next_page(
     label: str,
     season_playlist_url: str,
@@ -118,6 +220,30 @@ def list_item_series_next_page(
     return (item_url, item, is_folder)
 
 
+def list_item_season_all_episodes(season_playlist_url: str) -> Tuple[str, Any, bool]:
+    q = urlencode({
+        'action': 'season_all',
+        'season_playlist_url': season_playlist_url,
+    })
+    item_url = f'{_url}?{q}'
+    item = xbmcgui.ListItem(localized(30009), offscreen=True)
+    item.setProperty('SpecialSort', 'bottom')
+    is_folder = True
+    return (item_url, item, is_folder)
+
+
+def list_item_series_all_seasons(series_id: str) -> Tuple[str, Any, bool]:
+    q = urlencode({
+        'action': 'series_all',
+        'series_id': series_id,
+    })
+    item_url = f'{_url}?{q}'
+    item = xbmcgui.ListItem(localized(30011), offscreen=True)
+    item.setProperty('SpecialSort', 'bottom')
+    is_folder = True
+    return (item_url, item, is_folder)
+
+
 def list_item_search_menu() -> Tuple[str, Any, bool]:
     item_url = f'{_url}?action=search_menu'
     item = xbmcgui.ListItem(localized(30000), offscreen=True)
@@ -134,6 +260,25 @@ def list_item_live_broadcasts() -> Tuple[str, Any, bool]:
     return (item_url, item, is_folder)
 
 
+def list_item_live_pagination(
+    label: str,
+    source: str,
+    offset: int,
+    page_size: int
+) -> Tuple[str, Any, bool]:
+    q = urlencode({
+        'action': 'live_menu',
+        'source': source,
+        'offset': offset,
+        'page_size': page_size,
+    })
+    item_url = f'{_url}?{q}'
+    item = xbmcgui.ListItem(label, offscreen=True)
+    item.setProperty('SpecialSort', 'bottom')
+    is_folder = True
+    return (item_url, item, is_folder)
+
+
 def list_item_search_pagination(
     label: str,
     keyword: str,
@@ -171,11 +316,13 @@ def list_item_new_search() -> Tuple[str, Any, bool]:
 
 
 def do_search_query() -> None:
+    from resources.lib.searchhistory import get_search_history
+
     dialog = xbmcgui.Dialog()
     keyword = dialog.input(localized(30000), '', type=xbmcgui.INPUT_ALPHANUM)
 
     if keyword:
-        history = get_search_history(_addon)
+        history = get_search_history(addon())
         history.update(keyword)
 
         show_search_result_page(keyword)
@@ -184,29 +331,74 @@ def do_search_query() -> None:
 def show_search_result_page(
     keyword: str,
     offset: int = 0,
-    page_size: int = areena.DEFAULT_PAGE_SIZE
+    page_size: int = DEFAULT_PAGE_SIZE,
+    instant_local_results: bool = False
 ) -> None:
+    """Show a page of search results.
+
+    The titles found in the local search index are shown first on the first
+    page. If instant_local_results is True and the search results are not
+    in the cache, only the local matches are shown at first. The search
+    results are then downloaded and the listing is reloaded. The listing
+    must be reloadable without side effects, so this is not done after the
+    search input dialog.
+    """
+    from resources.lib import areena
+
     logger.debug(f'Executing search: "{keyword}", offset = {offset}, page_size = {page_size}')
 
-    searchresults = areena.search(keyword, offset, page_size)
-    show_links(searchresults)
+    if (
+        instant_local_results and
+        offset == 0 and
+        not areena.is_search_cached(keyword, offset, page_size)
+    ):
+        local_links = areena.search_local(keyword, LOCAL_RESULTS_LIMIT)
+        if local_links:
+            show_links(local_links, cache_to_disc=False)
+            _refresh_with_search_results(keyword, offset, page_size)
+            return
+
+    num_items = show_links(
+        areena.iter_search_with_local(keyword, offset, page_size, LOCAL_RESULTS_LIMIT),
+        cache_to_disc=CACHE_TO_DISC['search_page'],
+        prefetch=True
+    )
 
-    if not searchresults:
+    if num_items == 0:
         show_notification(localized(30004))
 
 
+def _refresh_with_search_results(keyword: str, offset: int, page_size: int) -> None:
+    """Download search results into the cache and reload the listing to show them."""
+    import requests
+    from resources.lib import areena
+
+    try:
+        areena.search(keyword, offset, page_size)
+    except requests.RequestException as ex:
+        logger.warning(f'Search failed, showing only the local matches: {ex}')
+        return
+
+    # Reload only if the reloaded listing will find the results in the cache.
+    # Otherwise the listing would be reloaded again and again.
+    if areena.is_search_cached(keyword, offset, page_size):
+        refresh_container(f'{_url}{sys.argv[2]}')
+
+
 def show_search() -> None:
+    from resources.lib.searchhistory import get_search_history
+
     listing = [
         list_item_new_search(),
     ]
 
-    history = get_search_history(_addon)
+    history = get_search_history(addon())
     listing.extend(
         list_item_search_pagination(
             label,
             label,
             offset=0,
-            page_size=areena.DEFAULT_PAGE_SIZE,
+            page_size=DEFAULT_PAGE_SIZE,
             update_search_history=True
         )
         for label in history.list()
@@ -214,46 +406,132 @@ def show_search() -> None:
 
     xbmcplugin.addDirectoryItems(_handle, listing, len(listing))
     xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_NONE)
-    xbmcplugin.endOfDirectory(_handle)
+    xbmcplugin.endOfDirectory(_handle, cacheToDisc=CACHE_TO_DISC['search_menu'])
     xbmcplugin.setContent(_handle, 'videos')
 
 
 def show_series(series_id: str, offset: int, page_size: int) -> None:
-    show_links(areena.playlist(series_id, offset, page_size))
+    from resources.lib import areena
+    from resources.lib.recentseries import get_recent_series
+
+    if offset == 0:
+        # The background service keeps the recently opened series fresh
+        get_recent_series(addon()).update(series_id)
+
+    show_links(areena.iter_playlist(series_id, offset, page_size),
+               cache_to_disc=CACHE_TO_DISC['series'], prefetch=True)
 
 
 def show_season(season_playlist_url: str, offset: int, page_size: int) -> None:
-    show_links(areena.season_playlist(season_playlist_url, offset, page_size))
+    from resources.lib import areena
+
+    show_links(areena.iter_season_playlist(season_playlist_url, offset, page_size),
+               cache_to_disc=CACHE_TO_DISC['season'], prefetch=True)
+
+
+def show_season_all_episodes(season_playlist_url: str) -> None:
+    from resources.lib import areena
+
+    links, failed_offsets = areena.season_all_episodes(season_playlist_url)
+    show_links(links, cache_to_disc=CACHE_TO_DISC['season_all'] and not failed_offsets)
+
+    if failed_offsets:
+        show_notification(localized(30010), icon=xbmcgui.NOTIFICATION_ERROR)
+
+
+def show_series_all_seasons(series_id: str) -> None:
+    from resources.lib import areena
+
+    links, incomplete_seasons = areena.series_all_episodes(series_id)
+    show_links(links, cache_to_disc=CACHE_TO_DISC['series_all'] and not incomplete_seasons)
+
+    if incomplete_seasons:
+        show_notification(localized(30010), icon=xbmcgui.NOTIFICATION_ERROR)
+
+
+def show_live_broadcasts(
+    source: Optional[str] = None,
+    offset: int = 0,
+    page_size: Optional[int] = None
+) -> None:
+    from resources.lib import areena
+
+    if source is not None and source not in areena.LIVE_SOURCES:
+        logger.error(f'Unknown live source: {source}')
+        return
+
+    page_size = page_size or areena.LIVE_PAGE_SIZE
+    sources = [source] if source else None
+    show_links(areena.get_live_broadcasts(sources, offset, page_size),
+               enable_sorting=False, cache_to_disc=CACHE_TO_DISC['live_menu'])
+
+
+def show_links(
+    links: Iterable['AreenaLink'],
+    *,
+    enable_sorting: bool = True,
+    cache_to_disc: bool = True,
+    prefetch: bool = False
+) -> int:
+    """Show links as a directory listing.
+
+    links can be a generator. It is consumed only once. Returns the number of
+    items on the listing.
+
+    If some of the links were created from stale cached responses, they are
+    refreshed after the listing has been shown. The listing is reloaded if
+    the content changed.
+    """
+    from resources.lib import areena
+    from resources.lib import httpcache
+
+    # The links are downloaded and parsed while the generator is consumed.
+    # Those phases are measured separately and excluded from render.
+    with timing.measure('render'):
+        navigation: List['AreenaLink'] = []
+        listing = list(_directory_items(links, navigation))
+
+        xbmcplugin.addDirectoryItems(_handle, listing, len(listing))
+        if enable_sorting:
+            xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_UNSORTED)
+            xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_DATE)
+            xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_LABEL)
+            xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_DURATION)
+        else:
+            xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_NONE)
+        xbmcplugin.endOfDirectory(_handle, cacheToDisc=cache_to_disc)
+        xbmcplugin.setContent(_handle, 'videos')
+
+    # The directory has already been handed to Kodi. Refresh stale responses
+    # and download the next page so that it can be shown from the cache if
+    # the user opens it.
+    if httpcache.revalidate(REVALIDATE_TIMEOUT):
+        refresh_container(f'{_url}{sys.argv[2]}')
+
+    if prefetch and addon().getSettingBool('prefetch_next_page'):
+        next_page = areena.prefetch_next_page(navigation, PREFETCH_TIMEOUT)
+        _prefetch_artwork(next_page)
+
+    return len(listing)
 
 
-def show_live_broadcasts() -> None:
-    show_links(areena.get_live_broadcasts(), enable_sorting=False)
+def _directory_items(
+    links: Iterable['AreenaLink'],
+    navigation: List['AreenaLink']
+) -> Iterator[Tuple[str, Any, bool]]:
+    """Convert links into addDirectoryItems tuples one at a time.
 
+    Links other than StreamLinks are also appended to navigation.
+    """
+    from resources.lib import areena
 
-def show_links(links: Sequence[areena.AreenaLink], *, enable_sorting=True) -> None:
-    listing = []
     for link in links:
         if isinstance(link, areena.StreamLink):
-            if link.is_folder:
-                series_id = link.homepage.rsplit('/', 1)[-1]
-                item = list_item_series(
-                    label=link.title,
-                    series_id=series_id,
-                    thumbnail=link.thumbnail,
-                    description=link.description,
-                )
-            else:
-                item = list_item_video(
-                    label=link.title,
-                    path=link.homepage,
-                    thumbnail=link.thumbnail,
-                    fanart=link.fanart,
-                    published=link.published,
-                    description=link.description,
-                    duration=link.duration_seconds,
-                    action='play_areenaurl'
-                )
-        elif isinstance(link, areena.SearchNavigationLink):
+            yield _stream_link_item(link)
+            continue
+
+        navigation.append(link)
+        if isinstance(link, areena.SearchNavigationLink):
             item = list_item_search_pagination(
                 label=localized(30002),
                 keyword=link.keyword,
@@ -276,22 +554,71 @@ def show_links(links: Sequence[areena.AreenaLink], *, enable_sorting=True) -> No
                 page_size=link.page_size,
                 bottom=bottom
             )
+        elif isinstance(link, areena.SeasonAllEpisodesLink):
+            item = list_item_season_all_episodes(link.season_playlist_url)
+        elif isinstance(link, areena.SeriesAllSeasonsLink):
+            item = list_item_series_all_seasons(link.series_id)
+        elif isinstance(link, areena.LiveNavigationLink):
+            label_id = _live_source_more_labels.get(link.source, 30002)
+            item = list_item_live_pagination(
+                label=localized(label_id),
+                source=link.source,
+                offset=link.offset,
+                page_size=link.page_size
+            )
         else:
             logger.warning(f'Unknown Areena link type: {type(link)}')
             continue
 
-        listing.append(item)
+        yield item
 
-    xbmcplugin.addDirectoryItems(_handle, listing, len(listing))
-    if enable_sorting:
-        xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_UNSORTED)
-        xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_DATE)
-        xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_LABEL)
-        xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_DURATION)
+
+def _stream_link_item(link: 'StreamLink') -> Tuple[str, Any, bool]:
+    if link.is_folder:
+        series_id = link.homepage.rsplit('/', 1)[-1]
+        return list_item_series(
+            label=link.title,
+            series_id=series_id,
+            thumbnail=link.thumbnail,
+            description=link.description,
+            fanart=link.fanart,
+        )
+
+    if link.season is not None:
+        label = f'{localized(30005)} {link.season}: {link.title}'
     else:
-        xbmcplugin.addSortMethod(_handle, xbmcplugin.SORT_METHOD_NONE)
-    xbmcplugin.endOfDirectory(_handle)
-    xbmcplugin.setContent(_handle, 'videos')
+        label = link.title
+
+    return list_item_video(
+        label=label,
+        path=link.homepage,
+        thumbnail=link.thumbnail,
+        fanart=link.fanart,
+        published=link.published,
+        description=link.description,
+        duration=link.duration_seconds,
+        action='play_areenaurl',
+        season=link.season
+    )
+
+
+def _prefetch_artwork(links: Iterable['AreenaLink']) -> None:
+    """Download the thumbnails of links into the image cache.
+
+    Fanart is shown only for the selected item, so it is not prefetched.
+    """
+    from resources.lib import areena
+    from resources.lib import imagecache
+
+    if not imagecache.is_enabled():
+        return
+
+    urls = []
+    for link in links:
+        if isinstance(link, areena.StreamLink):
+            urls.append(link.thumbnail)
+
+    imagecache.prefetch(urls, IMAGE_PREFETCH_TIMEOUT)
 
 
 def int_or_else(x: str, default: int) -> int:
@@ -301,8 +628,99 @@ def int_or_else(x: str, default: int) -> int:
         return default
 
 
+def enable_caches() -> None:
+    """Enable the persistent caches used by the network routes."""
+    from resources.lib import artwork
+    from resources.lib import circuitbreaker
+    from resources.lib import hedging
+    from resources.lib import httpcache
+    from resources.lib import imagecache
+    from resources.lib import playlist
+    from resources.lib import searchindex
+
+    cache_filename = profile_path('cache.sqlite')
+    httpcache.configure(cache_filename, addon().getSettingBool('stale_while_revalidate'))
+    playlist.configure_seasons_cache(cache_filename)
+    circuitbreaker.configure(cache_filename)
+    searchindex.configure(cache_filename)
+    hedging.configure(cache_filename if addon().getSettingBool('hedge_requests') else None)
+
+    artwork.set_screen_width(screen_width())
+    image_cache_bytes = addon().getSettingInt('image_cache_megabytes') * 1024 * 1024
+    imagecache.configure(profile_path('images'), image_cache_bytes)
+
+
 def router(paramstring: str) -> None:
+    """Run the route selected by paramstring and log how long each phase took.
+
+    If the profile_invocations setting is enabled, the route is run under
+    cProfile and the statistics are saved in the add-on profile directory.
+    """
     params = dict(parse_qsl(paramstring[1:]))
+    action = params.get('action', 'menu')
+
+    timing.reset()
+    start = time.perf_counter()
+    try:
+        if addon().getSettingBool('profile_invocations'):
+            _run_profiled(lambda: route(params), action)
+        else:
+            route(params)
+    finally:
+        elapsed = time.perf_counter() - start
+        logger.debug(f'Timing of {action}: {timing.summary(elapsed)}')
+
+
+def _run_profiled(func: Callable[[], None], action: str) -> None:
+    """Run func under cProfile and save the statistics as a pstats file."""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(func)
+    finally:
+        directory = profile_path('profiles')
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        filename = os.path.join(directory, f'{timestamp}-{action}.pstats')
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(filename)
+            _remove_old_profiles(directory)
+        except OSError as ex:
+            logger.warning(f'Failed to save the profile: {ex}')
+        else:
+            logger.info(f'Profile saved to {filename}')
+
+
+def _remove_old_profiles(directory: str) -> None:
+    profiles = sorted(x for x in os.listdir(directory) if x.endswith('.pstats'))
+    for filename in profiles[:-MAX_PROFILE_FILES]:
+        os.remove(os.path.join(directory, filename))
+
+
+def route(params: Dict[str, str]) -> None:
+    action = params.get('action')
+    if action not in NETWORK_ACTIONS:
+        _dispatch(params)
+        return
+
+    import requests
+
+    enable_caches()
+    try:
+        _dispatch(params)
+    except requests.RequestException as ex:
+        # The timeouts, retries and the circuit breaker in httpclient turn an
+        # unresponsive server into an exception instead of a frozen UI
+        logger.error(f'Network error: {ex}')
+        show_notification(localized(30012), icon=xbmcgui.NOTIFICATION_ERROR)
+        if action == 'play_areenaurl':
+            xbmcplugin.setResolvedUrl(_handle, False, xbmcgui.ListItem(offscreen=True))
+        else:
+            xbmcplugin.endOfDirectory(_handle, succeeded=False)
+
+
+def _dispatch(params: Dict[str, str]) -> None:
     if params:
         action = params.get('action')
         if action in ['play', 'play_areenaurl']:
@@ -312,6 +730,7 @@ def router(paramstring: str) -> None:
                 return
 
             if action == 'play_areenaurl':
+                from resources.lib.extractor import extract_media_url
                 media_url = extract_media_url(path)
             else:
                 media_url = media_url_for_plain_url(path)
@@ -325,29 +744,36 @@ def router(paramstring: str) -> None:
             play_media(_handle, media_url)
         elif action == 'series':
             offset = int_or_else(params.get('offset', ''), 0)
-            page_size = int_or_else(params.get('page_size', ''), areena.DEFAULT_PAGE_SIZE)
+            page_size = int_or_else(params.get('page_size', ''), DEFAULT_PAGE_SIZE)
             show_series(params['series_id'], offset, page_size)
         elif action == 'season':
             offset = int_or_else(params.get('offset', ''), 0)
-            page_size = int_or_else(params.get('page_size', ''), areena.DEFAULT_PAGE_SIZE)
+            page_size = int_or_else(params.get('page_size', ''), DEFAULT_PAGE_SIZE)
             show_season(params['season_playlist_url'], offset, page_size)
+        elif action == 'series_all':
+            show_series_all_seasons(params['series_id'])
+        elif action == 'season_all':
+            show_season_all_episodes(params['season_playlist_url'])
         elif action == 'search_menu':
             show_search()
         elif action == 'live_menu':
-            show_live_broadcasts()
+            offset = int_or_else(params.get('offset', ''), 0)
+            page_size = int_or_else(params.get('page_size', ''), 0)
+            show_live_broadcasts(params.get('source'), offset, page_size or None)
         elif action == 'search_input':
             do_search_query()
         elif action == 'search_page':
             keyword = params.get('keyword', '')
             offset = int_or_else(params.get('offset', ''), 0)
-            page_size = int_or_else(params.get('page_size', ''), areena.DEFAULT_PAGE_SIZE)
+            page_size = int_or_else(params.get('page_size', ''), DEFAULT_PAGE_SIZE)
 
             if params.get('update_search_history') and keyword:
                 # Move the selected keyword to the top of the search history
-                history = get_search_history(_addon)
+                from resources.lib.searchhistory import get_search_history
+                history = get_search_history(addon())
                 history.update(keyword)
 
-            show_search_result_page(keyword, offset, page_size)
+            show_search_result_page(keyword, offset, page_size, instant_local_results=True)
         else:
             logger.error(f"Unknown action: {action or '(missing)'}")
     else:
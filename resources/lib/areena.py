@@ -1,21 +1,38 @@
 import requests  # type: ignore
+from . import artwork
+from . import endpoints
+from . import httpcache
 from . import logger
-from .playlist import download_playlist, parse_playlist_seasons
+from . import searchindex
+from . import timing
+from .playlist import EpisodeMetadata, SeriesSeasons, download_full_playlist, \
+    download_full_playlists, download_playlist, series_seasons, stream_playlist
 from .extractor import duration_from_search_result, parse_finnish_date
-from dataclasses import dataclass, InitVar
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import InitVar, dataclass
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from urllib.parse import urlencode
 
 DEFAULT_PAGE_SIZE = 30
+LIVE_PAGE_SIZE = 10
+
+# Maximum number of live broadcast lists that are downloaded in parallel
+MAX_LIVE_WORKERS = 4
 
 
 class AreenaLink:
-    pass
+    __slots__ = ()
 
 
-@dataclass
+@dataclass(slots=True)
 class StreamLink(AreenaLink):
+    """A playable video or, if is_folder is True, a series.
+
+    Listings can have hundreds of these, so the attributes are stored in
+    slots instead of an instance dictionary. The thumbnail and the fanart
+    are derived from image_id and image_version, unless they are given.
+    """
     homepage: str
     title: str
     description: Optional[str] = None
@@ -26,14 +43,16 @@ class StreamLink(AreenaLink):
     is_folder: bool = False
     thumbnail: Optional[str] = None
     fanart: Optional[str] = None
+    season: Optional[int] = None
 
-    def __post_init__(self, image_id, image_version):
-        if not self.title:
-            self.title = '???'
+    def __post_init__(self, image_id: Optional[str], image_version: Optional[str]) -> None:
+        self.title = self.title or '???'
 
         if image_id is not None:
             if self.thumbnail is None:
-                self.thumbnail = _thumbnail_url(image_id, image_version)
+                self.thumbnail = artwork.image_url(image_id, image_version, artwork.THUMB)
+            if self.fanart is None:
+                self.fanart = artwork.image_url(image_id, image_version, artwork.FANART)
 
 
 @dataclass(frozen=True)
@@ -52,8 +71,21 @@ class SeriesNavigationLink(AreenaLink):
     is_next_page: bool
 
 
-def live_tv_manifest_url(stream_id, stream_name):
-    return f'https://yletv.akamaized.net/hls/live/{stream_id}/{stream_name}/index.m3u8'
+@dataclass(frozen=True)
+class SeasonAllEpisodesLink(AreenaLink):
+    season_playlist_url: str
+
+
+@dataclass(frozen=True)
+class SeriesAllSeasonsLink(AreenaLink):
+    series_id: str
+
+
+@dataclass(frozen=True)
+class LiveNavigationLink(AreenaLink):
+    source: str
+    offset: int
+    page_size: int
 
 
 def playlist(
@@ -61,20 +93,48 @@ def playlist(
     offset: int = 0,
     page_size: int = DEFAULT_PAGE_SIZE
 ) -> List[AreenaLink]:
-    seasons = parse_playlist_seasons(series_id)
+    return list(iter_playlist(series_id, offset, page_size))
+
+
+def iter_playlist(
+    series_id: str,
+    offset: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> Iterator[AreenaLink]:
+    """Generate the episodes of a single-season series or the seasons of a series."""
+    seasons = series_seasons(series_id)
     if seasons is None:
         logger.warning('Failed to parse the playlist')
-        return []
+        return
+
+    links = _playlist_from_seasons(series_id, seasons, offset, page_size)
+    first = next(links, None)
+    if first is None:
+        # The seasons may have been loaded from the cache and the playlist URL
+        # may have changed since. Parse the series page again and retry if
+        # the seasons are different.
+        refreshed = series_seasons(series_id, refresh=True)
+        if refreshed is not None and refreshed != seasons:
+            yield from _playlist_from_seasons(series_id, refreshed, offset, page_size)
+    else:
+        yield first
+        yield from links
 
+
+def _playlist_from_seasons(
+    series_id: str,
+    seasons: SeriesSeasons,
+    offset: int,
+    page_size: int
+) -> Iterator[AreenaLink]:
     season_urls = seasons.season_playlist_urls()
 
     if len(season_urls) == 1:
-        return season_playlist(season_urls[0][1], offset, page_size)
+        yield from iter_season_playlist(season_urls[0][1], offset, page_size)
     else:
-        return [
-            SeriesNavigationLink(url, i, 0, DEFAULT_PAGE_SIZE, False)
-            for i, url in season_urls
-        ]
+        for i, url in season_urls:
+            yield SeriesNavigationLink(url, i, 0, DEFAULT_PAGE_SIZE, False)
+        yield SeriesAllSeasonsLink(series_id)
 
 
 def season_playlist(
@@ -82,20 +142,21 @@ def season_playlist(
     offset: int = 0,
     page_size: int = DEFAULT_PAGE_SIZE
 ) -> List[AreenaLink]:
-    playlist, meta = download_playlist(season_url, offset, page_size)
-
-    links: List[AreenaLink] = [
-        StreamLink(
-            homepage=ep.homepage,
-            title=ep.title,
-            description=ep.description,
-            duration_seconds=ep.duration_seconds,
-            published=ep.published,
-            image_id=ep.image_id,
-            image_version=ep.image_version
-        )
-        for ep in playlist
-    ]
+    return list(iter_season_playlist(season_url, offset, page_size))
+
+
+def iter_season_playlist(
+    season_url: str,
+    offset: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> Iterator[AreenaLink]:
+    """Generate the episodes on a page of a season playlist and the pagination links.
+
+    StreamLinks are created directly from the decoded response without
+    intermediate lists.
+    """
+    episodes, meta = stream_playlist(season_url, offset, page_size, StreamLink)
+    yield from _indexed(episodes)
 
     # Pagination links
     limit = meta.get('limit', DEFAULT_PAGE_SIZE)
@@ -104,9 +165,57 @@ def season_playlist(
 
     next_offset = offset + limit
     if next_offset < count:
-        links.append(SeriesNavigationLink(season_url, 0, next_offset, limit, True))
+        yield SeriesNavigationLink(season_url, 0, next_offset, limit, True)
+        if offset == 0:
+            yield SeasonAllEpisodesLink(season_url)
 
-    return links
+
+def season_all_episodes(season_url: str) -> Tuple[List[AreenaLink], List[int]]:
+    """Return all episodes of a season in one listing.
+
+    The second return value is the list of playlist offsets that failed to
+    download. If it is not empty, some episodes are missing.
+    """
+    episodes, failed_offsets = download_full_playlist(season_url)
+    return [_episode_link(ep) for ep in episodes], failed_offsets
+
+
+def series_all_episodes(series_id: str) -> Tuple[List[AreenaLink], List[int]]:
+    """Return the episodes of all seasons of a series in one listing.
+
+    The episodes are ordered by the season number and then by the playlist
+    order within the season. The second return value lists the season numbers
+    that are missing episodes because of download failures.
+    """
+    seasons = series_seasons(series_id)
+    if seasons is None:
+        logger.warning('Failed to parse the playlist')
+        return [], []
+
+    season_urls = sorted(seasons.season_playlist_urls(), key=lambda x: x[0])
+    results = download_full_playlists([url for _, url in season_urls])
+
+    links: List[AreenaLink] = []
+    incomplete_seasons = []
+    for (season_number, _), (episodes, failed_offsets) in zip(season_urls, results):
+        links.extend(_episode_link(ep, season_number) for ep in episodes)
+        if failed_offsets:
+            incomplete_seasons.append(season_number)
+
+    return links, incomplete_seasons
+
+
+def _episode_link(ep: EpisodeMetadata, season: Optional[int] = None) -> StreamLink:
+    return StreamLink(
+        homepage=ep.homepage,
+        title=ep.title,
+        description=ep.description,
+        duration_seconds=ep.duration_seconds,
+        published=ep.published,
+        image_id=ep.image_id,
+        image_version=ep.image_version,
+        season=season
+    )
 
 
 def search(
@@ -114,18 +223,136 @@ def search(
     offset: int = 0,
     page_size: int = DEFAULT_PAGE_SIZE
 ) -> List[AreenaLink]:
+    return list(iter_search(keyword, offset, page_size))
+
+
+def iter_search(
+    keyword: str,
+    offset: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> Iterator[AreenaLink]:
     search_response = _get_search_results(keyword, offset, page_size)
-    return _parse_search_results(search_response)
+    yield from _indexed(timing.measure_iter('parse search', _iter_search_results(search_response)))
+
+
+def iter_search_with_local(
+    keyword: str,
+    offset: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    local_limit: int = 10
+) -> Iterator[AreenaLink]:
+    """Generate the matching titles from the local index followed by the search results.
+
+    The local matches are included only on the first page. Search results
+    that were already among the local matches are skipped. If the search
+    fails but there are local matches, only the local matches are returned.
+    """
+    local = search_local(keyword, local_limit) if offset == 0 else []
+    yield from local
+
+    seen = {link.homepage for link in local}
+    try:
+        for link in iter_search(keyword, offset, page_size):
+            if not (isinstance(link, StreamLink) and link.homepage in seen):
+                yield link
+    except requests.RequestException as ex:
+        if not local:
+            raise
 
+        logger.warning(f'Search failed, showing only the local matches: {ex}')
 
-def _get_search_results(keyword: str, offset: int, page_size: int) -> Dict:
-    r = requests.get(_search_url(keyword, offset=offset, page_size=page_size))
+
+def search_local(keyword: str, limit: int) -> List[StreamLink]:
+    """Return the series and episodes matching keyword from the local index."""
+    return [StreamLink(**data) for data in searchindex.search(keyword, limit)]
+
+
+def is_search_cached(keyword: str, offset: int, page_size: int) -> bool:
+    """Can the search results be shown without waiting for the network?"""
+    return httpcache.is_cached(_search_url(keyword, offset, page_size), 'search')
+
+
+def _get_search_results(
+    keyword: str,
+    offset: int,
+    page_size: int,
+    timeout: Optional[float] = None
+) -> Dict:
+    url = _search_url(keyword, offset=offset, page_size=page_size)
+    r = httpcache.get(url, 'search', timeout=timeout)
     r.raise_for_status()
-    return r.json()
+    with timing.measure('parse search'):
+        return r.json()
+
+
+def prefetch_next_page(links: Sequence[AreenaLink], timeout: float) -> List[AreenaLink]:
+    """Download the next page of a search or season listing into the cache.
+
+    The next page is found from the pagination link among links. Returns the
+    links on the next page so that their artwork can be prefetched, too.
+    Does nothing and returns an empty list if the response cache is not
+    enabled. Errors are ignored.
+    """
+    if not httpcache.is_enabled():
+        return []
+
+    for link in links:
+        try:
+            if isinstance(link, SearchNavigationLink):
+                logger.debug(f'Prefetching search results at offset {link.offset}')
+                response = _get_search_results(link.keyword, link.offset, link.page_size, timeout)
+                return list(_indexed(_parse_search_results(response, pagination_links=False)))
+            elif isinstance(link, SeriesNavigationLink) and link.is_next_page:
+                logger.debug(f'Prefetching playlist at offset {link.offset}')
+                episodes, _ = download_playlist(
+                    link.season_playlist_url, link.offset, link.page_size, timeout)
+                return list(_indexed(_episode_link(ep) for ep in episodes))
+        except (requests.RequestException, ValueError) as ex:
+            logger.debug(f'Prefetching the next page failed: {ex}')
+            break
+
+    return []
 
 
 def _parse_search_results(search_response: Dict, pagination_links: bool = True) -> List[AreenaLink]:
-    results: List[AreenaLink] = []
+    with timing.measure('parse search'):
+        return list(_iter_search_results(search_response, pagination_links))
+
+
+def _indexed(links: Iterable[AreenaLink]) -> Iterator[AreenaLink]:
+    """Pass links through and add the StreamLinks to the local search index.
+
+    The links are added when the generator is exhausted. Only search and
+    season listings are indexed. Live broadcasts end, so they would become
+    stale local matches.
+    """
+    streams = []
+    for link in links:
+        if isinstance(link, StreamLink):
+            streams.append(link)
+        yield link
+
+    searchindex.add((link.homepage, link.title, _index_value(link)) for link in streams)
+
+
+def _index_value(link: StreamLink) -> dict:
+    """Return the StreamLink constructor arguments that recreate link."""
+    return {
+        'homepage': link.homepage,
+        'title': link.title,
+        'description': link.description,
+        'duration_seconds': link.duration_seconds,
+        'published': link.published,
+        'is_folder': link.is_folder,
+        'thumbnail': link.thumbnail,
+        'fanart': link.fanart,
+    }
+
+
+def _iter_search_results(
+    search_response: Dict,
+    pagination_links: bool = True
+) -> Iterator[AreenaLink]:
     for item in search_response.get('data', []):
         uri = item.get('pointer', {}).get('uri')
         pointer_type = item.get('pointer', {}).get('type')
@@ -151,7 +378,7 @@ def _parse_search_results(search_response: Dict, pagination_links: bool = True)
                     if published is None and len(description) < 100:
                         title = f'{description}: {title}'
 
-                results.append(StreamLink(
+                yield StreamLink(
                     homepage=uri,
                     title=title,
                     duration_seconds=duration,
@@ -159,18 +386,18 @@ def _parse_search_results(search_response: Dict, pagination_links: bool = True)
                     description=title,
                     image_id=image_data.get('id'),
                     image_version=image_data.get('version')
-                ))
+                )
             elif pointer_type == 'series':
                 title = item.get('title', {})
                 image_data = item.get('image', {})
-                results.append(StreamLink(
+                yield StreamLink(
                     homepage=uri,
                     title=title,
                     description=title,
                     image_id=image_data.get('id'),
                     image_version=image_data.get('version'),
                     is_folder=True
-                ))
+                )
             elif pointer_type == 'package':
                 logger.debug('Ignoring a search result of type "package"')
             else:
@@ -192,9 +419,7 @@ def _parse_search_results(search_response: Dict, pagination_links: bool = True)
 
         next_offset = offset + limit
         if next_offset < count:
-            results.append(SearchNavigationLink(keyword, next_offset, limit))
-
-    return results
+            yield SearchNavigationLink(keyword, next_offset, limit)
 
 
 def _search_url(keyword: str, offset: int, page_size: int) -> str:
@@ -213,43 +438,70 @@ def _search_url(keyword: str, offset: int, page_size: int) -> str:
         'country': 'FI',
         'isPortabilityRegion': 'true',
     })
-    return f'https://areena.api.yle.fi/v1/ui/search?{q}'
-
-
-def _thumbnail_url(image_id: str, version: Optional[str] = None) -> str:
-    version = version or '1624522786'
-    return (
-        f'https://images.cdn.yle.fi/image/upload/w_320,dpr_1.0,fl_lossy,f_auto,'
-        f'q_auto,d_yle-elava-arkisto.jpg/v{version}/{image_id}.jpg'
-    )
-
-
-def _fanart_url(image_id: str, version: Optional[str] = None) -> str:
-    version = version or '1624522786'
-    return (
-        f'https://images.cdn.yle.fi/image/upload/w_auto,dpr_auto,fl_lossy,f_auto,'
-        f'q_auto,d_yle-elava-arkisto.jpg/v{version}/{image_id}.jpg'
-    )
-
-
-def get_live_broadcasts():
-    links = []
+    return f"{endpoints.url(endpoints.AREENA_API, '/v1/ui/search')}?{q}"
 
-    # only in Areena
-    r1 = requests.get(_only_in_areena_live_url(0, 10))
-    if 200 <= r1.status_code < 300:
-        links.extend(_parse_search_results(r1.json(), False))
-    elif r1.status_code >= 400:
-        logger.warning(f'Error {r1.status_code} while downloading {r1.url}')
 
-    # sports
-    r2 = requests.get(_sport_live_url(0, 10))
-    if 200 <= r2.status_code < 300:
-        links.extend(_parse_search_results(r2.json(), False))
-    elif r2.status_code >= 400:
-        logger.warning(f'Error {r2.status_code} while downloading {r2.url}')
+def get_live_broadcasts(
+    sources: Optional[Sequence[str]] = None,
+    offset: int = 0,
+    page_size: int = LIVE_PAGE_SIZE
+) -> List[AreenaLink]:
+    """Download live broadcast lists concurrently and merge them.
+
+    sources is a list of keys in LIVE_SOURCES. By default, all sources are
+    included. A broadcast that appears on several lists is included only once.
+    A LiveNavigationLink is appended for each source that has more items.
+    """
+    if sources is None:
+        sources = list(LIVE_SOURCES)
+    if not sources:
+        return []
 
-    return links
+    max_workers = min(MAX_LIVE_WORKERS, len(sources))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = list(executor.map(
+            lambda source: _download_live_list(source, offset, page_size),
+            sources
+        ))
+
+    links: List[AreenaLink] = []
+    navigation: List[AreenaLink] = []
+    seen_uris = set()
+    for source, response in zip(sources, responses):
+        if response is None:
+            continue
+
+        for link in _parse_search_results(response, False):
+            if isinstance(link, StreamLink):
+                if link.homepage in seen_uris:
+                    continue
+                seen_uris.add(link.homepage)
+
+            links.append(link)
+
+        meta = response.get('meta', {})
+        limit = meta.get('limit', page_size)
+        next_offset = meta.get('offset', offset) + limit
+        if next_offset < meta.get('count', 0):
+            navigation.append(LiveNavigationLink(source, next_offset, limit))
+
+    return links + navigation
+
+
+def _download_live_list(source: str, offset: int, page_size: int) -> Optional[Dict]:
+    url = LIVE_SOURCES[source](offset, page_size)
+    try:
+        r = httpcache.get(url, 'live')
+    except requests.RequestException as ex:
+        logger.warning(f'Failed to download {url}: {ex}')
+        return None
+
+    if 200 <= r.status_code < 300:
+        with timing.measure('parse live'):
+            return r.json()
+    else:
+        logger.warning(f'Error {r.status_code} while downloading {r.url}')
+        return None
 
 
 def _sport_live_url(offset: int, page_size: int) -> str:
@@ -266,7 +518,7 @@ def _sport_live_url(offset: int, page_size: int) -> str:
         'app_id': 'areena-web-items',
         'app_key': 'wlTs5D9OjIdeS9krPzRQR4I1PYVzoazN'
     })
-    return f'https://areena.api.yle.fi/v1/ui/content/list?{q}'
+    return f"{endpoints.url(endpoints.AREENA_API, '/v1/ui/content/list')}?{q}"
 
 
 def _only_in_areena_live_url(offset: int, page_size: int) -> str:
@@ -284,4 +536,12 @@ def _only_in_areena_live_url(offset: int, page_size: int) -> str:
         'app_id': 'areena-web-items',
         'app_key': 'wlTs5D9OjIdeS9krPzRQR4I1PYVzoazN'
     })
-    return f'https://areena.api.yle.fi/v1/ui/content/list?{q}'
+    return f"{endpoints.url(endpoints.AREENA_API, '/v1/ui/content/list')}?{q}"
+
+
+# Live broadcast lists shown on the live menu. Maps the source name to a
+# function that returns the content/list URL for an offset and a page size.
+LIVE_SOURCES: Dict[str, Callable[[int, int], str]] = {
+    'only_in_areena': _only_in_areena_live_url,
+    'sports': _sport_live_url,
+}
@@ -0,0 +1,48 @@
+"""Image URLs sized for the display resolution and the artwork role."""
+import math
+from . import endpoints
+from typing import Optional
+
+THUMB = 'thumb'
+FANART = 'fanart'
+
+# Image widths in pixels on a 1920 pixels wide display
+REFERENCE_SCREEN_WIDTH = 1920
+ROLE_WIDTHS = {
+    THUMB: 480,
+    FANART: 1920,
+}
+
+# Widths are rounded up to a multiple of this so that the CDN and the Kodi
+# texture cache see only a few different URLs for each image
+WIDTH_STEP = 160
+MIN_WIDTH = 160
+MAX_WIDTH = 3840
+
+DEFAULT_IMAGE_VERSION = '1624522786'
+
+_screen_width = REFERENCE_SCREEN_WIDTH
+
+
+def set_screen_width(width: int) -> None:
+    """Set the horizontal resolution of the display in pixels."""
+    global _screen_width
+
+    _screen_width = width if width > 0 else REFERENCE_SCREEN_WIDTH
+
+
+def image_width(role: str) -> int:
+    """Return the image width in pixels for an artwork role on the current display."""
+    width = ROLE_WIDTHS[role] * _screen_width / REFERENCE_SCREEN_WIDTH
+    width = math.ceil(width / WIDTH_STEP) * WIDTH_STEP
+    return min(max(width, MIN_WIDTH), MAX_WIDTH)
+
+
+def image_url(image_id: str, version: Optional[str] = None, role: str = THUMB) -> str:
+    version = version or DEFAULT_IMAGE_VERSION
+    width = image_width(role)
+    return endpoints.url(
+        endpoints.IMAGES,
+        f'/image/upload/w_{width},dpr_1.0,fl_lossy,f_auto,q_auto,d_yle-elava-arkisto.jpg'
+        f'/v{version}/{image_id}.jpg'
+    )
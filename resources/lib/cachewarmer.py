@@ -0,0 +1,102 @@
+"""Refresh the caches in the background before the user needs them.
+
+The background service (service.py) calls warm_caches() periodically. The
+downloaded responses are stored in the same persistent caches that the plugin
+uses, so the listings open without waiting for the network.
+"""
+import requests  # type: ignore
+from . import areena
+from . import httpclient
+from . import logger
+from .playlist import download_playlist, series_seasons
+from functools import partial
+from typing import Callable, List, Sequence, Tuple
+
+# Time limit in seconds for each request
+REQUEST_TIMEOUT = 10
+
+
+def warm_caches(
+    search_keywords: Sequence[str],
+    series_ids: Sequence[str],
+    max_bytes: int,
+    should_continue: Callable[[], bool] = lambda: True
+) -> int:
+    """Download the responses that the user is likely to need next.
+
+    Refreshes the live broadcast lists, runs the searches in search_keywords
+    and downloads the first playlist page of each season of the series in
+    series_ids.
+
+    Stops when max_bytes response bytes have been downloaded or when
+    should_continue returns False. Both are checked before each request.
+    Returns the number of bytes downloaded.
+    """
+    start_bytes = httpclient.bytes_received()
+
+    stopped = False
+
+    def can_continue() -> bool:
+        nonlocal stopped
+
+        if not stopped:
+            used = httpclient.bytes_received() - start_bytes
+            if used >= max_bytes:
+                logger.info(f'Cache warming stopped at the bandwidth limit ({used} bytes)')
+                stopped = True
+            elif not should_continue():
+                logger.info('Cache warming interrupted')
+                stopped = True
+
+        return not stopped
+
+    tasks = _tasks(search_keywords, series_ids, can_continue)
+    completed = 0
+
+    for description, task in tasks:
+        if not can_continue():
+            break
+
+        logger.debug(f'Cache warming: {description}')
+        try:
+            task()
+        except (requests.RequestException, ValueError) as ex:
+            logger.warning(f'Cache warming failed: {description}: {ex}')
+
+        completed += 1
+
+    used = httpclient.bytes_received() - start_bytes
+    logger.info(f'Cache warming completed {completed}/{len(tasks)} tasks, {used} bytes')
+    return used
+
+
+def _tasks(
+    search_keywords: Sequence[str],
+    series_ids: Sequence[str],
+    can_continue: Callable[[], bool]
+) -> List[Tuple[str, Callable[[], object]]]:
+    tasks: List[Tuple[str, Callable[[], object]]] = [
+        ('live broadcasts', areena.get_live_broadcasts),
+    ]
+    tasks.extend(
+        (f'search "{keyword}"', partial(areena.search, keyword))
+        for keyword in search_keywords
+    )
+    tasks.extend(
+        (f'series {series_id}', partial(_warm_series, series_id, can_continue))
+        for series_id in series_ids
+    )
+    return tasks
+
+
+def _warm_series(series_id: str, can_continue: Callable[[], bool]) -> None:
+    seasons = series_seasons(series_id)
+    if seasons is None:
+        return
+
+    # Use the same page size as the plugin so that the URLs match
+    for _, season_url in seasons.season_playlist_urls():
+        if not can_continue():
+            return
+
+        download_playlist(season_url, 0, areena.DEFAULT_PAGE_SIZE, timeout=REQUEST_TIMEOUT)
@@ -0,0 +1,105 @@
+"""A per-host circuit breaker that is remembered across plugin invocations.
+
+After FAILURE_THRESHOLD consecutive failed requests to a host the circuit of
+the host opens and requests to it fail immediately for OPEN_SECONDS. After
+that one trial request is let through. If it succeeds, the circuit closes.
+Otherwise it stays open for another period.
+
+The plugin is a new process on every invocation, so the state is stored in
+a database when the breaker has been configured with configure(). Otherwise
+it is kept only in memory.
+"""
+import threading
+import time
+from . import logger
+from .storage import Storage
+from typing import Dict, Optional
+
+# Number of consecutive failures that opens the circuit of a host
+FAILURE_THRESHOLD = 3
+
+# How long requests to a failing host fail immediately
+OPEN_SECONDS = 30
+
+# The stored state of a host is forgotten after this long without updates
+STATE_MAX_AGE_SECONDS = 24 * 60 * 60
+
+_storage: Optional[Storage] = None
+# Failure state by host: {'failures': int, 'opened_at': float or None}
+_states: Dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+def configure(storage_filename: Optional[str]) -> None:
+    """Persist the state in a database. Pass None to keep it only in memory."""
+    global _storage
+
+    with _lock:
+        _states.clear()
+        if storage_filename is None:
+            _storage = None
+        else:
+            _storage = Storage(storage_filename, namespace='circuit_breaker')
+
+
+def allow_request(host: str) -> bool:
+    """Return False if requests to host should fail without trying."""
+    with _lock:
+        state = _load(host)
+        opened_at = state.get('opened_at')
+        if opened_at is None:
+            return True
+
+        if time.time() - opened_at < OPEN_SECONDS:
+            return False
+
+        # Let one trial request through. Keep the circuit open for the other
+        # requests until the trial completes.
+        state['opened_at'] = time.time()
+        _save(host, state)
+        return True
+
+
+def record_success(host: str) -> None:
+    with _lock:
+        state = _load(host)
+        if state.get('failures') or state.get('opened_at') is not None:
+            if state.get('opened_at') is not None:
+                logger.info(f'Circuit closed for {host}')
+            _save(host, {'failures': 0, 'opened_at': None})
+
+
+def record_failure(host: str) -> None:
+    with _lock:
+        state = _load(host)
+        failures = state.get('failures', 0) + 1
+        opened_at = state.get('opened_at')
+        if failures >= FAILURE_THRESHOLD:
+            if opened_at is None:
+                logger.warning(f'{failures} consecutive failures, circuit opened for {host}')
+            opened_at = time.time()
+
+        _save(host, {'failures': failures, 'opened_at': opened_at})
+
+
+def _load(host: str) -> dict:
+    state = _states.get(host)
+    if state is None:
+        state = {}
+        if _storage is not None:
+            try:
+                state = _storage.get(host) or {}
+            except Exception as ex:
+                logger.warning(f'Ignoring an invalid circuit breaker state: {ex}')
+        _states[host] = state
+
+    return state
+
+
+def _save(host: str, state: dict) -> None:
+    _states[host] = state
+    if _storage is not None:
+        try:
+            _storage.set(host, state, ttl=STATE_MAX_AGE_SECONDS)
+        except Exception as ex:
+            logger.warning(f'Failed to save the circuit breaker state: {ex}')
@@ -0,0 +1,55 @@
+"""Base URLs of the Yle services used by the add-on.
+
+Each base URL can be overridden with an environment variable (see
+ENVIRONMENT_VARIABLES) or by calling set_base_url(). This makes it possible to
+run the add-on against a local stand-in server, such as tools/fakeserver.py.
+"""
+import os
+from urllib.parse import urlparse
+
+AREENA_API = 'areena_api'
+AREENA_WEB = 'areena_web'
+PLAYER_API = 'player_api'
+LIVE_STREAM = 'live_stream'
+IMAGES = 'images'
+
+DEFAULT_BASE_URLS = {
+    AREENA_API: 'https://areena.api.yle.fi',
+    AREENA_WEB: 'https://areena.yle.fi',
+    PLAYER_API: 'https://player.api.yle.fi',
+    LIVE_STREAM: 'https://yletv.akamaized.net',
+    IMAGES: 'https://images.cdn.yle.fi',
+}
+
+ENVIRONMENT_VARIABLES = {
+    service: f'YLEAREENA_{service.upper()}_URL' for service in DEFAULT_BASE_URLS
+}
+
+_base_urls = {
+    service: os.environ.get(ENVIRONMENT_VARIABLES[service]) or default
+    for service, default in DEFAULT_BASE_URLS.items()
+}
+
+
+def base_url(service: str) -> str:
+    return _base_urls[service]
+
+
+def url(service: str, path: str) -> str:
+    """Return the absolute URL of path on service.
+
+    path must start with a slash.
+    """
+    return f'{_base_urls[service]}{path}'
+
+
+def set_base_url(service: str, base: str) -> None:
+    if service not in DEFAULT_BASE_URLS:
+        raise ValueError(f'Unknown service: {service}')
+
+    _base_urls[service] = base.rstrip('/')
+
+
+def hosts() -> list:
+    """Return the host names of all services."""
+    return sorted({urlparse(x).hostname or '' for x in _base_urls.values()})
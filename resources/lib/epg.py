@@ -0,0 +1,222 @@
+"""Now and next programs on the Yle TV channels.
+
+The day schedule of each channel is downloaded in one request and stored in
+a database. The programs of a channel are kept sorted by the start time, so
+the program on air at a given time is found by a binary search.
+
+Looking up the programs doesn't use the network. The background service
+calls update_schedules() periodically. It downloads the schedule of a
+channel again only after the program that was on air at the previous
+download has ended.
+
+This module is imported by the root menu, so the network modules are
+imported only when a schedule is downloaded. See tests/test_startup.py.
+"""
+import os.path
+import time
+from . import endpoints
+from . import logger
+from .storage import Storage
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+TV1 = 'yle-tv1'
+TV2 = 'yle-tv2'
+TEEMA_FEM = 'yle-teema-fem'
+CHANNELS = [TV1, TV2, TEEMA_FEM]
+
+# Stored schedules are removed after this many seconds without updates
+SCHEDULE_MAX_AGE_SECONDS = 2 * 24 * 60 * 60
+
+# If nothing is on air according to the schedule, try again after this long
+EMPTY_SCHEDULE_RETRY_SECONDS = 10 * 60
+
+# Time limit in seconds for downloading a schedule
+DOWNLOAD_TIMEOUT = 10
+
+
+@dataclass(frozen=True)
+class Program:
+    title: str
+    # Start and end as Unix timestamps
+    start: float
+    end: float
+    description: Optional[str] = None
+
+
+class ChannelSchedule:
+    """The programs of a channel sorted by the start time."""
+    def __init__(self, programs: Sequence[Program], valid_until: float):
+        self.programs = sorted(programs, key=lambda x: x.start)
+        self._starts = [x.start for x in self.programs]
+        # The schedule should be downloaded again after this time
+        self.valid_until = valid_until
+
+    def now_and_next(self, t: float) -> Tuple[Optional[Program], Optional[Program]]:
+        """Return the program on air at time t and the program after it."""
+        i = bisect_right(self._starts, t)
+        current = self.programs[i - 1] if i > 0 and t < self.programs[i - 1].end else None
+        following = self.programs[i] if i < len(self.programs) else None
+        return current, following
+
+    def needs_update(self, t: float) -> bool:
+        return t >= self.valid_until
+
+
+def load_schedules(storage_filename: str) -> Dict[str, ChannelSchedule]:
+    """Return the stored schedules by channel.
+
+    Returns an empty dictionary if nothing has been stored yet.
+    """
+    if not os.path.exists(storage_filename):
+        return {}
+
+    storage = Storage(storage_filename, namespace='epg')
+    schedules = {}
+    try:
+        for channel, data in storage.get_all():
+            schedules[str(channel)] = ChannelSchedule(
+                [Program(*x) for x in data['programs']], data['valid_until'])
+    except Exception as ex:
+        logger.warning(f'Ignoring invalid schedules: {ex}')
+        return {}
+
+    return schedules
+
+
+def needs_update(storage_filename: str, channels: Sequence[str] = CHANNELS) -> List[str]:
+    """Return the channels whose schedules should be downloaded again."""
+    schedules = load_schedules(storage_filename)
+    now = time.time()
+    return [
+        channel for channel in channels
+        if channel not in schedules or schedules[channel].needs_update(now)
+    ]
+
+
+def update_schedules(storage_filename: str, channels: Sequence[str] = CHANNELS) -> List[str]:
+    """Download the schedules of channels that need an update and store them.
+
+    Returns the channels whose schedules were updated. Errors are logged and
+    ignored.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    outdated = needs_update(storage_filename, channels)
+    if not outdated:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(outdated)) as executor:
+        results = list(executor.map(_download_channel_schedule, outdated))
+
+    storage = Storage(storage_filename, namespace='epg')
+    updated = []
+    with storage.session():
+        for channel, schedule in zip(outdated, results):
+            if schedule is None:
+                continue
+
+            storage.set(channel, {
+                'programs': [
+                    (x.title, x.start, x.end, x.description) for x in schedule.programs
+                ],
+                'valid_until': schedule.valid_until,
+            }, ttl=SCHEDULE_MAX_AGE_SECONDS)
+            updated.append(channel)
+
+    logger.debug(f'Updated the schedules of {", ".join(updated) or "no channels"}')
+    return updated
+
+
+def _download_channel_schedule(channel: str) -> Optional[ChannelSchedule]:
+    import requests  # type: ignore
+    from . import httpcache
+
+    now = time.time()
+    # The schedules are by the day in Finland
+    today = datetime.fromtimestamp(now, finnish_timezone(now)).date()
+    programs: List[Program] = []
+    for day in [today, today + timedelta(days=1)]:
+        try:
+            r = httpcache.get(schedule_url(channel, day), 'schedule', timeout=DOWNLOAD_TIMEOUT)
+            r.raise_for_status()
+            programs.extend(parse_schedule(r.json()))
+        except (requests.RequestException, ValueError) as ex:
+            logger.warning(f'Failed to download the schedule of {channel}: {ex}')
+            return None
+
+        # Download the next day only if today's schedule ends with the
+        # current program. Otherwise the next program is already known.
+        schedule = ChannelSchedule(programs, 0)
+        if schedule.now_and_next(now)[1] is not None:
+            break
+
+    current, _ = schedule.now_and_next(now)
+    if current is not None:
+        schedule.valid_until = current.end
+    else:
+        schedule.valid_until = now + EMPTY_SCHEDULE_RETRY_SECONDS
+
+    return schedule
+
+
+def parse_schedule(response: dict) -> List[Program]:
+    """Parse the programs from a schedule API response."""
+    programs = []
+    for item in response.get('data', []):
+        labels = item.get('labels', [])
+        start = _label_time(labels, 'broadcastStartDate')
+        end = _label_time(labels, 'broadcastEndDate')
+        title = item.get('title')
+        if start is None or end is None or not title:
+            continue
+
+        programs.append(Program(title, start, end, item.get('description')))
+
+    return programs
+
+
+def schedule_url(channel: str, day: date) -> str:
+    q = urlencode({
+        'app_id': 'areena-web-items',
+        'app_key': 'wlTs5D9OjIdeS9krPzRQR4I1PYVzoazN',
+        'client': 'yle-areena-web',
+        'language': 'fi',
+        'v': 10,
+        'limit': 100,
+    })
+    path = f'/v1/ui/schedules/{channel}/{day.isoformat()}.json'
+    return f'{endpoints.url(endpoints.AREENA_API, path)}?{q}'
+
+
+def finnish_timezone(t: float) -> timezone:
+    """Return the UTC offset of Finland at Unix time t.
+
+    Finland is at UTC+3 from the last Sunday of March to the last Sunday of
+    October, both at 01:00 UTC, and at UTC+2 otherwise. The rule is coded
+    here, because the time zone database is not available on all Kodi
+    platforms.
+    """
+    utc = datetime.fromtimestamp(t, timezone.utc)
+    summer = _last_sunday_at_1_utc(utc.year, 3) <= utc < _last_sunday_at_1_utc(utc.year, 10)
+    return timezone(timedelta(hours=3 if summer else 2))
+
+
+def _last_sunday_at_1_utc(year: int, month: int) -> datetime:
+    # March and October have 31 days
+    last_day = datetime(year, month, 31, 1, tzinfo=timezone.utc)
+    return last_day - timedelta(days=(last_day.weekday() + 1) % 7)
+
+
+def _label_time(labels: List[dict], type_name: str) -> Optional[float]:
+    raw = next((x.get('raw') for x in labels if x.get('type') == type_name), None)
+    if not raw:
+        return None
+
+    try:
+        return datetime.fromisoformat(raw.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
@@ -1,11 +1,23 @@
 import re
 import requests  # type: ignore
+import time
+from . import endpoints
+from . import httpcache
 from . import logger
 from .manifesturl import ManifestUrl, random_elisa_ipv4
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 from urllib.parse import urlparse
 
+# How long (in seconds) preview API responses are cached
+PREVIEW_TTL_LIVE = 60
+PREVIEW_TTL_ONDEMAND = 60 * 60
+PREVIEW_TTL_NOT_FOUND = 30
+
+# A cached response is not used if the manifest URL token expires sooner than
+# this many seconds.
+MANIFEST_TOKEN_MARGIN = 5 * 60
+
 
 class AreenaPreviewApiResponse:
     def __init__(self, data: Dict[str, Any]) -> None:
@@ -103,10 +115,6 @@ def media_url_for_pid(pid: str) -> Optional[ManifestUrl]:
     return manifest_url
 
 
-def media_url_for_plain_url(url: str) -> ManifestUrl:
-    return ManifestUrl(url, debug_source_name='plain media URL')
-
-
 def program_id_from_url(url: str) -> str:
     parsed = urlparse(url)
     return parsed.path.split('/')[-1]
@@ -119,11 +127,11 @@ def preview_parser(pid: str) -> AreenaPreviewApiResponse:
     }
 
     try:
-        r = requests.get(preview_url(pid), headers=preview_headers)
+        r = httpcache.get(preview_url(pid), 'preview', headers=preview_headers, ttl=_preview_ttl)
         r.raise_for_status()
         preview_json = r.json()
     except requests.HTTPError as ex:
-        if ex.response.status_code == 404:
+        if ex.response is not None and ex.response.status_code == 404:
             logger.warning(f'Preview API result not found in {preview_url(pid)}')
             preview_json = {}
         else:
@@ -132,9 +140,51 @@ def preview_parser(pid: str) -> AreenaPreviewApiResponse:
     return AreenaPreviewApiResponse(preview_json)
 
 
+def _preview_ttl(response: httpcache.CachedResponse) -> float:
+    """Decide how long a preview API response can be cached.
+
+    Live streams and the negative responses (not found or expired) are
+    cached only briefly. On-demand responses are cached longer, but not past
+    the expiration time of a signed manifest URL.
+    """
+    if response.status_code == 404:
+        return PREVIEW_TTL_NOT_FOUND
+    elif not 200 <= response.status_code < 300:
+        return 0
+
+    try:
+        preview = AreenaPreviewApiResponse(response.json())
+    except ValueError:
+        return 0
+
+    data = preview.preview.get('data', {})
+    if preview.is_expired():
+        return PREVIEW_TTL_NOT_FOUND
+    elif preview.is_live() or preview.is_pending() or data.get('ongoing_event') is not None:
+        return PREVIEW_TTL_LIVE
+
+    ttl: float = PREVIEW_TTL_ONDEMAND
+    manifest_url = preview.ongoing().get('manifest_url') or preview.ongoing().get('media_url')
+    token_expiration = _token_expiration(manifest_url or '')
+    if token_expiration is not None:
+        ttl = min(ttl, token_expiration - time.time() - MANIFEST_TOKEN_MARGIN)
+
+    return max(ttl, 0)
+
+
+def _token_expiration(url: str) -> Optional[int]:
+    """Return the expiration timestamp of a signed (Akamai token) URL.
+
+    exp can be the first field of the token (hdnts=exp=...) or follow
+    another field. The ~ separators may be URL-encoded as %7E.
+    """
+    m = re.search(r'(?:[?&~=]|%7[Ee])exp=(\d+)', url)
+    return int(m.group(1)) if m else None
+
+
 def preview_url(pid: str) -> str:
-    return f'https://player.api.yle.fi/v1/preview/{pid}.json?' \
-        'language=fin&ssl=true&countryCode=FI&host=areenaylefi' \
+    return endpoints.url(endpoints.PLAYER_API, f'/v1/preview/{pid}.json') + \
+        '?language=fin&ssl=true&countryCode=FI&host=areenaylefi' \
         '&app_id=player_static_prod' \
         '&app_key=8930d72170e48303cf5f3867780d549b' \
         '&isPortabilityRegion=true'
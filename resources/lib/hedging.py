@@ -0,0 +1,162 @@
+"""Hedged requests for the endpoints whose slow responses the user waits for.
+
+If a request to a hedged endpoint has not been answered within the 95th
+percentile of the earlier response times of the endpoint, an identical
+second request is sent. The response that arrives first is used.
+
+The response times are stored in a database, so the threshold adapts to
+the network and the server over several invocations. Hedging starts after
+MIN_SAMPLES response times have been recorded.
+"""
+import math
+import threading
+import time
+from . import httpclient
+from . import logger
+from .storage import Storage
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+HEDGED_ENDPOINTS = {'search', 'preview'}
+
+# Number of recent response times kept for each endpoint
+MAX_SAMPLES = 50
+
+# Number of response times needed before hedging starts
+MIN_SAMPLES = 10
+
+# The hedged request is never sent sooner than this
+MIN_HEDGE_DELAY_SECONDS = 0.1
+
+_storage: Optional[Storage] = None
+# Recent response times in seconds by endpoint, the newest last
+_samples: Dict[str, List[float]] = {}
+_lock = threading.Lock()
+
+
+def configure(storage_filename: Optional[str]) -> None:
+    """Enable hedging and store the response times in a database.
+
+    Pass None to disable hedging.
+    """
+    global _storage
+
+    with _lock:
+        _samples.clear()
+        if storage_filename is None:
+            _storage = None
+        else:
+            _storage = Storage(storage_filename, namespace='endpoint_latency')
+
+
+def is_enabled() -> bool:
+    return _storage is not None
+
+
+def get(url: str, endpoint: str, **kwargs) -> Any:
+    """Send a GET request with httpclient.get(), hedging it if endpoint is slow.
+
+    kwargs are passed to httpclient.get(). Streamed requests are not hedged.
+    """
+    if not is_enabled() or endpoint not in HEDGED_ENDPOINTS or kwargs.get('stream'):
+        return httpclient.get(url, **kwargs)
+
+    delay = hedge_delay(endpoint)
+    if delay is None:
+        response, elapsed = _timed_get(url, kwargs)
+        record_latency(endpoint, elapsed)
+        return response
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        primary = executor.submit(_timed_get, url, kwargs)
+        primary.add_done_callback(lambda f: _record_future(endpoint, f))
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()[0]
+
+        logger.debug(f'No response in {delay:.2f} s, sending a hedged request to {url}')
+        hedge = executor.submit(_timed_get, url, kwargs)
+        return _first_response([primary, hedge])
+    finally:
+        # Don't wait for the slower request. Its response is discarded.
+        executor.shutdown(wait=False)
+
+
+def hedge_delay(endpoint: str) -> Optional[float]:
+    """Return the 95th percentile response time of endpoint.
+
+    Returns None if there are not enough recorded response times.
+    """
+    with _lock:
+        samples = sorted(_load(endpoint))
+
+    if len(samples) < MIN_SAMPLES:
+        return None
+
+    p95 = samples[math.ceil(0.95 * len(samples)) - 1]
+    return max(p95, MIN_HEDGE_DELAY_SECONDS)
+
+
+def record_latency(endpoint: str, seconds: float) -> None:
+    with _lock:
+        samples = (_load(endpoint) + [seconds])[-MAX_SAMPLES:]
+        _samples[endpoint] = samples
+        if _storage is not None:
+            try:
+                _storage.set(endpoint, samples)
+            except Exception as ex:
+                logger.warning(f'Failed to save response times: {ex}')
+
+
+def _first_response(futures: List[Future]) -> Any:
+    """Return the first successful response among futures.
+
+    The responses of the other requests are closed as they complete. If all
+    requests fail, the exception of the first request is raised.
+    """
+    pending = set(futures)
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((f for f in futures if f in done and f.exception() is None), None)
+
+    for f in futures:
+        if f is not winner:
+            f.add_done_callback(_close_response)
+
+    if winner is None:
+        return futures[0].result()
+
+    return winner.result()[0]
+
+
+def _timed_get(url: str, kwargs: dict) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    response = httpclient.get(url, **kwargs)
+    return response, time.perf_counter() - start
+
+
+def _record_future(endpoint: str, future: Future) -> None:
+    # Failed requests tell nothing about the normal response time
+    if future.exception() is None:
+        record_latency(endpoint, future.result()[1])
+
+
+def _close_response(future: Future) -> None:
+    if future.exception() is None:
+        future.result()[0].close()
+
+
+def _load(endpoint: str) -> List[float]:
+    samples = _samples.get(endpoint)
+    if samples is None:
+        samples = []
+        if _storage is not None:
+            try:
+                samples = _storage.get(endpoint) or []
+            except Exception as ex:
+                logger.warning(f'Ignoring invalid response times: {ex}')
+        _samples[endpoint] = samples
+
+    return samples
@@ -0,0 +1,365 @@
+import json
+import requests  # type: ignore
+import threading
+import time
+from . import hedging
+from . import httpclient
+from . import logger
+from . import timing
+from .storage import Storage
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+# How many seconds a downloaded response is used without asking the server
+# again. Endpoints not listed here are not cached.
+TTL_SECONDS = {
+    'search': 10 * 60,
+    'live': 2 * 60,
+    'playlist': 30 * 60,
+    'series_page': 6 * 60 * 60,
+}
+
+# Entries that haven't been refreshed for this long are removed from the
+# database. Stale entries are kept until then, because they can still be
+# revalidated cheaply with a conditional request.
+MAX_ENTRY_AGE = timedelta(days=7)
+
+# Upper limit for the size of the stored responses. The least recently used
+# responses are evicted when the limit is exceeded.
+MAX_CACHE_BYTES = 20 * 1024 * 1024
+
+# Responses larger than this are compressed
+COMPRESS_THRESHOLD_BYTES = 4096
+
+# Endpoints of listings whose stale responses may be shown immediately and
+# revalidated afterwards, if stale-while-revalidate is enabled. Responses that
+# are needed for playback must always be fresh.
+STALE_WHILE_REVALIDATE_ENDPOINTS = {'search', 'live', 'playlist', 'series_page'}
+
+# Connect and read timeouts in seconds by endpoint. A slow server fails the
+# request instead of leaving Kodi waiting. Series pages are large HTML
+# documents and get more time to download.
+ENDPOINT_TIMEOUTS = {
+    'search': (httpclient.CONNECT_TIMEOUT, 8),
+    'live': (httpclient.CONNECT_TIMEOUT, 8),
+    'playlist': (httpclient.CONNECT_TIMEOUT, 10),
+    'series_page': (httpclient.CONNECT_TIMEOUT, 15),
+    'preview': (httpclient.CONNECT_TIMEOUT, 8),
+    'schedule': (httpclient.CONNECT_TIMEOUT, 8),
+}
+
+# Number of times a failed request is retried. All requests are idempotent
+# GETs. If the caller gives a timeout, the retries must fit in it.
+MAX_RETRIES = 2
+
+_response_cache = None
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    url: str
+    status_code: int
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    # Seconds this response stays fresh. If None, the endpoint TTL is used.
+    max_age: Optional[float] = None
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f'{self.status_code} Error for url: {self.url}', response=self)
+
+
+class ResponseCache():
+    def __init__(self, storage_filename: str, stale_while_revalidate: bool = False):
+        self.storage = Storage(
+            storage_filename,
+            namespace='responses',
+            max_bytes=MAX_CACHE_BYTES,
+            compress_threshold=COMPRESS_THRESHOLD_BYTES
+        )
+        # Storage is not safe to use from several threads at the same time
+        self._lock = threading.Lock()
+        self.stale_while_revalidate = stale_while_revalidate
+        # Arguments of get() for the stale responses that have been returned
+        # but not yet revalidated, by URL
+        self._pending: Dict[str, tuple] = {}
+
+    def get(
+        self,
+        url: str,
+        endpoint: str,
+        headers: Optional[Dict[str, str]] = None,
+        stream_until: Optional[Callable[[str], bool]] = None,
+        timeout: Optional[float] = None,
+        ttl: Optional[Callable[[CachedResponse], float]] = None
+    ) -> CachedResponse:
+        """Return the response for url from the cache or from the network.
+
+        A cached response is returned as is if it is younger than the TTL of
+        the endpoint. An older response is revalidated with a conditional
+        request (If-None-Match/If-Modified-Since).
+
+        If stream_until is given, the body is downloaded only until
+        stream_until returns True for the text received so far.
+
+        timeout is an optional time limit in seconds for the whole request,
+        including the retries. Without it, the ENDPOINT_TIMEOUTS apply to
+        each attempt.
+
+        ttl is an optional function that computes the TTL in seconds from a
+        downloaded response. It overrides the endpoint TTL. Unlike with the
+        endpoint TTL, also error responses are cached if ttl returns a
+        positive value for them.
+
+        If stale_while_revalidate is enabled, a stale successful response of
+        a listing endpoint is returned without a request. It is refreshed
+        when revalidate() is called.
+        """
+        endpoint_ttl = TTL_SECONDS.get(endpoint, 0)
+        if endpoint_ttl <= 0 and ttl is None:
+            return _fetch(url, endpoint, headers, stream_until, timeout)
+
+        cached = self._load(url)
+        now = time.time()
+
+        if cached is not None:
+            max_age = cached.max_age if cached.max_age is not None else endpoint_ttl
+        else:
+            max_age = 0
+
+        if cached is not None and now - cached.fetched_at < max_age:
+            logger.debug(f'Cache hit: {url}')
+            return cached
+
+        if (
+            cached is not None and
+            self.stale_while_revalidate and
+            endpoint in STALE_WHILE_REVALIDATE_ENDPOINTS and
+            200 <= cached.status_code < 300
+        ):
+            logger.debug(f'Using a stale response, revalidating later: {url}')
+            with self._lock:
+                self._pending[url] = (endpoint, headers, stream_until, ttl)
+            return cached
+
+        return self._refresh(url, endpoint, cached, headers, stream_until, timeout, ttl)
+
+    def is_cached(self, url: str, endpoint: str) -> bool:
+        """Would get() return a cached response without waiting for the network?"""
+        cached = self._load(url)
+        if cached is None:
+            return False
+
+        max_age = cached.max_age if cached.max_age is not None else TTL_SECONDS.get(endpoint, 0)
+        if time.time() - cached.fetched_at < max_age:
+            return True
+
+        return (
+            self.stale_while_revalidate and
+            endpoint in STALE_WHILE_REVALIDATE_ENDPOINTS and
+            200 <= cached.status_code < 300
+        )
+
+    def revalidate(self, timeout: Optional[float] = None) -> List[str]:
+        """Refresh the stale responses that get() has returned.
+
+        Returns the URLs whose stored content changed or was removed. Errors
+        are logged and ignored.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+
+        changed = []
+        for url, (endpoint, headers, stream_until, ttl) in pending.items():
+            cached = self._load(url)
+            try:
+                self._refresh(url, endpoint, cached, headers, stream_until, timeout, ttl)
+            except requests.RequestException as ex:
+                logger.warning(f'Failed to revalidate {url}: {ex}')
+                continue
+
+            # Compare what is stored now. A response that wasn't stored, such
+            # as a server error, changes nothing that get() would return.
+            stored = self._load(url)
+            before = cached.text if cached is not None else None
+            after = stored.text if stored is not None else None
+            if after != before:
+                logger.debug(f'Stale response has changed: {url}')
+                changed.append(url)
+
+        return changed
+
+    def _refresh(
+        self,
+        url: str,
+        endpoint: str,
+        cached: Optional[CachedResponse],
+        headers: Optional[Dict[str, str]],
+        stream_until: Optional[Callable[[str], bool]],
+        timeout: Optional[float],
+        ttl: Optional[Callable[[CachedResponse], float]]
+    ) -> CachedResponse:
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached.etag:
+                request_headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                request_headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            response = _fetch(url, endpoint, request_headers, stream_until, timeout)
+        except requests.RequestException as ex:
+            if cached is None or not _can_use_on_error(endpoint, cached):
+                raise
+
+            logger.warning(f'Using a stale response, because downloading failed: {ex}')
+            return cached
+
+        if (
+            response.status_code >= 500 and
+            cached is not None and
+            _can_use_on_error(endpoint, cached)
+        ):
+            logger.warning(f'Using a stale response after status {response.status_code}: {url}')
+            return cached
+
+        if response.status_code == 304 and cached is not None:
+            logger.debug(f'Cached response is still valid: {url}')
+            response = replace(cached, fetched_at=response.fetched_at, max_age=None)
+
+        if ttl is not None:
+            max_age = ttl(response)
+            response = replace(response, max_age=max_age)
+            cacheable = max_age > 0
+        else:
+            cacheable = 200 <= response.status_code < 300
+
+        if cacheable:
+            with self._lock:
+                self.storage.set(url, response.__dict__, ttl=MAX_ENTRY_AGE.total_seconds())
+        elif cached is not None and 400 <= response.status_code < 500:
+            # The content is gone. Don't keep serving the old copy.
+            logger.debug(f'Removing a cached response after status {response.status_code}: {url}')
+            with self._lock:
+                self.storage.delete(url)
+
+        return response
+
+    def remove_expired(self) -> None:
+        with self._lock:
+            self.storage.delete_expired()
+
+    def _load(self, url: str) -> Optional[CachedResponse]:
+        try:
+            with self._lock:
+                data = self.storage.get(url)
+            return CachedResponse(**data) if data is not None else None
+        except Exception as ex:
+            logger.warning(f'Ignoring an invalid cache entry: {ex}')
+            return None
+
+
+def configure(storage_filename: Optional[str], stale_while_revalidate: bool = False) -> None:
+    """Enable the persistent cache. Pass None to disable caching.
+
+    See ResponseCache.get() for stale_while_revalidate.
+    """
+    global _response_cache
+
+    if storage_filename is None:
+        _response_cache = None
+    else:
+        _response_cache = ResponseCache(storage_filename, stale_while_revalidate)
+        _response_cache.remove_expired()
+
+
+def get(
+    url: str,
+    endpoint: str,
+    headers: Optional[Dict[str, str]] = None,
+    stream_until: Optional[Callable[[str], bool]] = None,
+    timeout: Optional[float] = None,
+    ttl: Optional[Callable[[CachedResponse], float]] = None
+) -> CachedResponse:
+    """Download url using the persistent cache, if it has been configured."""
+    if _response_cache is None:
+        return _fetch(url, endpoint, headers, stream_until, timeout)
+    else:
+        return _response_cache.get(url, endpoint, headers, stream_until, timeout, ttl)
+
+
+def is_cached(url: str, endpoint: str) -> bool:
+    """Would get() return a cached response for url without a request?"""
+    if _response_cache is None:
+        return False
+    else:
+        return _response_cache.is_cached(url, endpoint)
+
+
+def revalidate(timeout: Optional[float] = None) -> List[str]:
+    """Refresh the stale responses returned earlier. Returns the changed URLs."""
+    if _response_cache is None:
+        return []
+    else:
+        return _response_cache.revalidate(timeout)
+
+
+def is_enabled() -> bool:
+    return _response_cache is not None
+
+
+def _can_use_on_error(endpoint: str, cached: CachedResponse) -> bool:
+    """Can a stale cached response be used when refreshing it fails?
+
+    Only listings are shown stale. Responses that are needed for playback
+    must be fresh.
+    """
+    return endpoint in STALE_WHILE_REVALIDATE_ENDPOINTS and 200 <= cached.status_code < 300
+
+
+def _fetch(
+    url: str,
+    endpoint: str,
+    headers: Optional[Dict[str, str]],
+    stream_until: Optional[Callable[[str], bool]] = None,
+    timeout: Optional[float] = None
+) -> CachedResponse:
+    request_timeout: httpclient.Timeout
+    if timeout is None:
+        request_timeout = ENDPOINT_TIMEOUTS.get(endpoint, httpclient.DEFAULT_TIMEOUT)
+        deadline = None
+    else:
+        request_timeout = timeout
+        deadline = time.monotonic() + timeout
+
+    phase = f'http {endpoint}'
+    with timing.measure(phase):
+        if stream_until is None:
+            r = hedging.get(url, endpoint, retries=MAX_RETRIES, deadline=deadline,
+                            headers=headers, timeout=request_timeout)
+            text = r.text
+        else:
+            r = httpclient.get(url, retries=MAX_RETRIES, deadline=deadline, headers=headers,
+                               stream=True, timeout=request_timeout)
+            if 200 <= r.status_code < 300:
+                text, _ = httpclient.read_until(r, stream_until)
+            else:
+                text = r.text
+    timing.add_bytes(phase, httpclient.wire_bytes(r))
+
+    return CachedResponse(
+        url=r.url,
+        status_code=r.status_code,
+        text=text if r.status_code != 304 else '',
+        etag=r.headers.get('ETag'),
+        last_modified=r.headers.get('Last-Modified'),
+        fetched_at=time.time(),
+    )
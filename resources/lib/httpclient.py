@@ -0,0 +1,211 @@
+import codecs
+import random
+import requests  # type: ignore
+import threading
+import time
+from . import circuitbreaker
+from . import endpoints
+from . import logger
+from requests.adapters import HTTPAdapter  # type: ignore
+from typing import Callable, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+# Maximum number of kept-alive connections per host
+POOL_MAXSIZE = 4
+
+# A timeout in seconds or a (connect timeout, read timeout) pair
+Timeout = Union[float, Tuple[float, float]]
+
+# Connect and read timeouts in seconds for requests that don't set a timeout
+CONNECT_TIMEOUT = 3.05
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, 10)
+
+# Failed requests are retried after an exponentially growing delay starting
+# from RETRY_BASE_DELAY_SECONDS. The delay is randomized by +-50% so that
+# parallel requests don't retry in lockstep.
+RETRY_BASE_DELAY_SECONDS = 0.25
+RETRY_MAX_DELAY_SECONDS = 2.0
+
+# A retry is not started if less time than this is left before the deadline
+MIN_ATTEMPT_SECONDS = 0.5
+
+# Response statuses that are worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_session: Optional[requests.Session] = None
+
+# Number of response body bytes received by this process
+_bytes_received = 0
+_bytes_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    """Return the HTTP session shared by all modules.
+
+    Connections are kept alive and reused by later requests to the same host
+    during the plugin invocation.
+    """
+    global _session
+
+    if _session is None:
+        _session = requests.Session()
+        # Keep a connection pool for each host the add-on talks to
+        num_hosts = len(endpoints.hosts())
+        adapter = HTTPAdapter(pool_connections=num_hosts, pool_maxsize=POOL_MAXSIZE)
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+
+    return _session
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """The host has failed repeatedly and is not contacted for a while."""
+
+
+def get(
+    url: str,
+    retries: int = 0,
+    deadline: Optional[float] = None,
+    **kwargs
+) -> requests.Response:
+    """Send a GET request.
+
+    If kwargs doesn't include a timeout, DEFAULT_TIMEOUT is used. Connection
+    errors, timeouts and the statuses in RETRY_STATUSES are retried up to
+    retries times. Raises CircuitOpenError without sending a request if the
+    host has been failing (see circuitbreaker).
+
+    deadline is an optional time.monotonic() value by which the request,
+    including the retries, must complete. The timeouts of the attempts are
+    shortened to end by the deadline, and a retry that couldn't start before
+    the deadline is not made.
+    """
+    timeout = kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    host = urlparse(url).hostname or ''
+    if not circuitbreaker.allow_request(host):
+        raise CircuitOpenError(f'{host} is not responding, skipping {url}')
+
+    attempt = 0
+    while True:
+        if deadline is not None:
+            kwargs['timeout'] = _limit_timeout(timeout, deadline - time.monotonic())
+
+        delay = _retry_delay(attempt)
+        try:
+            r = session().get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as ex:
+            if not _can_retry(attempt, retries, delay, deadline):
+                circuitbreaker.record_failure(host)
+                raise
+
+            logger.debug(f'Retrying {url} after an error: {ex}')
+        else:
+            if r.status_code not in RETRY_STATUSES:
+                circuitbreaker.record_success(host)
+                break
+            elif not _can_retry(attempt, retries, delay, deadline):
+                circuitbreaker.record_failure(host)
+                break
+
+            logger.debug(f'Retrying {url} after status {r.status_code}')
+            r.close()
+
+        time.sleep(delay)
+        attempt += 1
+
+    if not kwargs.get('stream'):
+        _count_bytes(wire_bytes(r))
+    return r
+
+
+def wire_bytes(response: requests.Response) -> int:
+    """Return the number of body bytes received over the network for response.
+
+    This is the size before decoding the Content-Encoding, so a compressed
+    body counts with its compressed size. A streamed response counts only
+    the part that has been read.
+    """
+    raw = getattr(response, 'raw', None)
+    if raw is not None:
+        return raw.tell()
+    return len(response.content)
+
+
+def _can_retry(attempt: int, retries: int, delay: float, deadline: Optional[float]) -> bool:
+    if attempt >= retries:
+        return False
+
+    # Leave the retry at least a moment before the deadline
+    return deadline is None or time.monotonic() + delay + MIN_ATTEMPT_SECONDS < deadline
+
+
+def _limit_timeout(timeout: Timeout, remaining: float) -> Timeout:
+    remaining = max(remaining, MIN_ATTEMPT_SECONDS)
+    if isinstance(timeout, tuple):
+        return (min(timeout[0], remaining), min(timeout[1], remaining))
+    else:
+        return min(timeout, remaining)
+
+
+def _retry_delay(attempt: int) -> float:
+    delay = min(RETRY_BASE_DELAY_SECONDS * 2**attempt, RETRY_MAX_DELAY_SECONDS)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def bytes_received() -> int:
+    """Return the number of response body bytes received by this process."""
+    return _bytes_received
+
+
+def _count_bytes(num_bytes: int) -> None:
+    global _bytes_received
+
+    with _bytes_lock:
+        _bytes_received += num_bytes
+
+
+def read_until(
+    response: requests.Response,
+    is_complete: Callable[[str], bool]
+) -> Tuple[str, Optional[int]]:
+    """Read a streamed response body until is_complete returns True.
+
+    The connection is closed without downloading the rest of the body as soon
+    as the text received so far is complete. The response must have been
+    requested with stream=True.
+
+    Returns the received text and the number of bytes that were not
+    downloaded. The number of skipped bytes is None if the server didn't
+    announce the length of the body.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    text = ''
+    completed = False
+    try:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            text += decoder.decode(chunk)
+            if is_complete(text):
+                completed = True
+                break
+        else:
+            text += decoder.decode(b'', final=True)
+    finally:
+        received = response.raw.tell()
+        response.close()
+        _count_bytes(received)
+
+    content_length = response.headers.get('Content-Length')
+    skipped = None
+    if completed and content_length and content_length.isdigit():
+        skipped = max(int(content_length) - received, 0)
+    elif not completed:
+        skipped = 0
+
+    logger.debug(
+        f'Downloaded {received} bytes from {response.url}, '
+        f'skipped {skipped if skipped is not None else "unknown number of"} bytes'
+    )
+
+    return text, skipped
@@ -0,0 +1,174 @@
+"""A size-bounded on-disk cache for artwork images.
+
+Images are stored as files in a cache directory, named by a hash of the image
+URL. The least recently used files are removed when the total size exceeds
+the limit. The modification time of a file is its last use time.
+
+Kodi keeps its own texture cache, too, but it has no size limit and it
+doesn't know about images before they are shown. This cache lets the add-on
+download the artwork of the next page in advance and reuse it across
+listings. The artwork of the shown listings is not stored here, because
+Kodi is already downloading it for its texture cache.
+"""
+import hashlib
+import os
+import time
+from . import logger
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+# Maximum number of images downloaded in parallel
+MAX_PREFETCH_WORKERS = 4
+
+_directory: Optional[str] = None
+_max_bytes = 0
+
+
+def configure(directory: Optional[str], max_bytes: int) -> None:
+    """Enable the cache in directory. directory None or max_bytes 0 disables it."""
+    global _directory
+    global _max_bytes
+
+    if directory is not None and max_bytes > 0:
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as ex:
+            logger.warning(f'Failed to create the image cache directory: {ex}')
+            directory = None
+    else:
+        directory = None
+
+    _directory = directory
+    _max_bytes = max_bytes
+
+
+def is_enabled() -> bool:
+    return _directory is not None
+
+
+def art_path(url: Optional[str]) -> Optional[str]:
+    """Return the path of the cached copy of url, or url itself if it is not cached."""
+    if url is None:
+        return None
+
+    return local_path(url) or url
+
+
+def local_path(url: str) -> Optional[str]:
+    """Return the path of the cached copy of url or None if it is not cached.
+
+    Marks the file as recently used.
+    """
+    if _directory is None:
+        return None
+
+    path = _cache_filename(_directory, url)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+
+    return path
+
+
+def prefetch(urls: Iterable[Optional[str]], timeout: float) -> int:
+    """Download the images at urls into the cache.
+
+    Images that are already cached are skipped. Errors are ignored. Returns
+    the number of downloaded images.
+    """
+    directory = _directory
+    if directory is None:
+        return 0
+
+    missing = list(dict.fromkeys(
+        url for url in urls
+        if url and not os.path.exists(_cache_filename(directory, url))
+    ))
+    if not missing:
+        return 0
+
+    deadline = time.monotonic() + timeout
+
+    def download(url: str) -> bool:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        return _download(url, _cache_filename(directory, url), remaining)
+
+    with ThreadPoolExecutor(max_workers=MAX_PREFETCH_WORKERS) as executor:
+        num_downloaded = sum(executor.map(download, missing))
+
+    logger.debug(f'Prefetched {num_downloaded}/{len(missing)} images')
+    evict(directory, _max_bytes)
+    return num_downloaded
+
+
+def evict(directory: str, max_bytes: int) -> int:
+    """Remove the least recently used files until the total size is at most max_bytes.
+
+    Returns the number of removed files.
+    """
+    files = []
+    total = 0
+    for entry in _scandir(directory):
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+
+        files.append((st.st_mtime, st.st_size, entry.path))
+        total += st.st_size
+
+    num_removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+        total -= size
+        num_removed += 1
+
+    return num_removed
+
+
+def _download(url: str, path: str, timeout: float) -> bool:
+    # requests is slow to import. The root menu uses art_path() but never
+    # downloads anything, so import it only here. See tests/test_startup.py.
+    import requests  # type: ignore
+    from . import httpclient
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        r = httpclient.get(url, timeout=timeout)
+        r.raise_for_status()
+
+        with open(tmp_path, 'wb') as f:
+            f.write(r.content)
+        os.replace(tmp_path, path)
+    except (requests.RequestException, OSError) as ex:
+        logger.debug(f'Failed to download image {url}: {ex}')
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+    return True
+
+
+def _scandir(directory: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(directory) as it:
+            return [x for x in it if x.is_file() and not x.name.endswith('.tmp')]
+    except OSError:
+        return []
+
+
+def _cache_filename(directory: str, url: str) -> str:
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(directory, f'{digest}.jpg')
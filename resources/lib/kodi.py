@@ -1,3 +1,4 @@
+import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcplugin
@@ -7,6 +8,22 @@ from typing import Optional
 from urllib.parse import urlencode
 from resources.lib.manifesturl import ManifestUrl
 
+_addon = None
+
+
+def addon() -> xbmcaddon.Addon:
+    """Return the Addon object. It is created on the first call."""
+    global _addon
+
+    if _addon is None:
+        _addon = xbmcaddon.Addon()
+
+    return _addon
+
+
+def localized(string_id: int) -> str:
+    return addon().getLocalizedString(string_id)
+
 
 def play_media(handle: int, manifest: ManifestUrl) -> None:
     listitem = xbmcgui.ListItem(path=manifest.url)
@@ -24,17 +41,37 @@ def show_notification(message: str, icon: str = xbmcgui.NOTIFICATION_INFO) -> No
     xbmcgui.Dialog().notification('Yle Areena', message, icon)
 
 
+def refresh_container(path: str) -> None:
+    """Reload the current directory listing if it is still showing path."""
+    if xbmc.getInfoLabel('Container.FolderPath') == path:
+        xbmc.executebuiltin('Container.Refresh')
+
+
+def screen_width() -> int:
+    """Return the horizontal resolution of the display in pixels."""
+    try:
+        return int(xbmc.getInfoLabel('System.ScreenWidth'))
+    except ValueError:
+        return 1920
+
+
 def icon_path(filename: str) -> str:
-    addon_path = xbmcaddon.Addon().getAddonInfo('path')
+    addon_path = addon().getAddonInfo('path')
     return xbmcvfs.translatePath(f'{addon_path}/resources/media/{filename}')
 
 
+def profile_path(filename: str) -> str:
+    profile = addon().getAddonInfo('profile')
+    return xbmcvfs.translatePath(f'{profile}/{filename}')
+
+
 def set_video_info(
     item: xbmcgui.ListItem,
     *,
     published: Optional[datetime] = None,
     plot: Optional[str] = None,
     duration: Optional[int] = None,
+    season: Optional[int] = None,
 ):
     video_info = item.getVideoInfoTag()
 
@@ -45,3 +82,5 @@ def set_video_info(
         video_info.setPlot(plot)
     if duration is not None:
         video_info.setDuration(duration)
+    if season is not None:
+        video_info.setSeason(season)
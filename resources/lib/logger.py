@@ -1,11 +1,20 @@
+from typing import Optional
+
 try:
     import xbmc
     import xbmcaddon
 except ImportError:
     xbmc = None
 
+_addonid: Optional[str]
+
 
 def log_xbmc(message: str, level: int) -> None:
+    global _addonid
+
+    if _addonid is None:
+        _addonid = xbmcaddon.Addon().getAddonInfo('id')
+
     xbmc.log(f'[{_addonid}] {message}', level)
 
 
@@ -42,7 +51,8 @@ if xbmc is None:
     LOGERROR = 30
 else:
     log = log_xbmc
-    _addonid = xbmcaddon.Addon().getAddonInfo('id')
+    # Resolved on the first log call
+    _addonid = None
 
     LOGDEBUG = xbmc.LOGDEBUG
     LOGINFO = xbmc.LOGINFO
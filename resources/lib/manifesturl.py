@@ -1,5 +1,6 @@
 import ipaddress
 import random
+from . import endpoints
 from dataclasses import dataclass
 from typing import Optional
 
@@ -11,6 +12,15 @@ class ManifestUrl:
     debug_source_name: Optional[str] = None
 
 
+def live_tv_manifest_url(stream_id, stream_name):
+    path = f'/hls/live/{stream_id}/{stream_name}/index.m3u8'
+    return endpoints.url(endpoints.LIVE_STREAM, path)
+
+
+def media_url_for_plain_url(url: str) -> ManifestUrl:
+    return ManifestUrl(url, debug_source_name='plain media URL')
+
+
 def random_elisa_ipv4():
     return str(random_ip(ipaddress.ip_network('91.152.0.0/13')))
 
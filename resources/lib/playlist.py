@@ -1,14 +1,52 @@
-import html5lib
+import hashlib
 import json
 import re
 import requests  # type: ignore
+import threading
+import time
+from . import endpoints
+from . import httpcache
 from . import logger
-from dataclasses import dataclass
+from . import timing
+from .storage import Storage
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime
-from typing import List, Mapping, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 from .extractor import iso_duration_as_seconds, label_by_type
 
+_RELEASE_DATE_RE = re.compile(
+    r'[a-z]{2} (?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})')
+
+_NEXT_DATA_START_RE = re.compile(
+    r'<script\b[^>]*\bid\s*=\s*["\']?__NEXT_DATA__(?=["\'\s>])[^>]*>',
+    re.IGNORECASE
+)
+
+# The season structure of a series rarely changes. Parsed seasons are reused
+# for this many seconds before the series page is downloaded again.
+SERIES_SEASONS_TTL = 7 * 24 * 60 * 60
+
+# Stale seasons are kept for this many seconds as a fallback for network
+# errors.
+SERIES_SEASONS_MAX_AGE = 30 * 24 * 60 * 60
+
+SERIES_SEASONS_MAX_BYTES = 2 * 1024 * 1024
+
+# Upper limit for the size of the cached episode lists of whole seasons
+SEASON_EPISODES_MAX_BYTES = 10 * 1024 * 1024
+
+# Largest page size that the playlist API accepts
+MAX_PLAYLIST_PAGE_SIZE = 100
+
+# Maximum number of playlist pages that are downloaded in parallel
+MAX_PLAYLIST_WORKERS = 4
+
+_seasons_storage: Optional[Storage] = None
+_season_episodes_storage: Optional[Storage] = None
+_seasons_lock = threading.Lock()
+
 
 @dataclass(frozen=True)
 class SeriesSeasons:
@@ -45,12 +83,100 @@ class EpisodeMetadata:
     image_version: Optional[str]
 
 
+def configure_seasons_cache(storage_filename: Optional[str]) -> None:
+    """Enable the persistent SeriesSeasons and season episodes caches.
+
+    Pass None to disable them.
+    """
+    global _seasons_storage, _season_episodes_storage
+
+    if storage_filename is None:
+        _seasons_storage = None
+        _season_episodes_storage = None
+    else:
+        _seasons_storage = Storage(
+            storage_filename,
+            namespace='series_seasons',
+            max_bytes=SERIES_SEASONS_MAX_BYTES
+        )
+        _season_episodes_storage = Storage(
+            storage_filename,
+            namespace='season_episodes',
+            max_bytes=SEASON_EPISODES_MAX_BYTES,
+            compress_threshold=4096
+        )
+
+
+def series_seasons(series_id: str, refresh: bool = False) -> Optional[SeriesSeasons]:
+    """Return the seasons of a series from the cache or by parsing the series page.
+
+    If refresh is True, the series page is always downloaded and parsed. A
+    stale cached value is returned if downloading the page fails.
+    """
+    if _seasons_storage is None:
+        return parse_playlist_seasons(series_id)
+
+    with _seasons_lock:
+        try:
+            cached = _seasons_storage.get(series_id)
+        except Exception as ex:
+            logger.warning(f'Ignoring an invalid series cache entry: {ex}')
+            cached = None
+
+    if (
+        cached is not None and
+        not refresh and
+        time.time() - cached['fetched_at'] < SERIES_SEASONS_TTL
+    ):
+        logger.debug(f'Using cached seasons for series {series_id}')
+        return SeriesSeasons(cached['base_url'], cached['season_options'])
+
+    try:
+        seasons = parse_playlist_seasons(series_id)
+    except requests.RequestException as ex:
+        if cached is None:
+            raise
+
+        logger.warning(f'Failed to refresh seasons of {series_id}, using a stale value: {ex}')
+        return SeriesSeasons(cached['base_url'], cached['season_options'])
+
+    if seasons is not None:
+        with _seasons_lock:
+            _seasons_storage.set(series_id, {
+                'base_url': seasons.base_url,
+                'season_options': seasons.season_options,
+                'fetched_at': time.time(),
+            }, ttl=SERIES_SEASONS_MAX_AGE)
+
+    return seasons
+
+
 def parse_playlist_seasons(series_id):
-    r = requests.get(f'https://areena.yle.fi/{series_id}')
+    r = httpcache.get(
+        endpoints.url(endpoints.AREENA_WEB, f'/{series_id}'),
+        'series_page',
+        stream_until=_has_complete_next_data
+    )
     r.raise_for_status()
 
-    html_tree = html5lib.parse(r.text, namespaceHTMLElements=False)
-    next_data = _parse_next_data(html_tree)
+    with timing.measure('parse series_page'):
+        return parse_series_page(r.text)
+
+
+def parse_series_page(html: str) -> Optional[SeriesSeasons]:
+    """Parse the seasons from the HTML of a series page."""
+    next_data = _scan_next_data(html)
+    if next_data is None:
+        logger.debug('__NEXT_DATA__ not found by the scanner. Parsing the full HTML')
+        # html5lib is slow to import. It is needed only on this fallback path.
+        import html5lib
+        html_tree = html5lib.parse(html, namespaceHTMLElements=False)
+        next_data = _parse_next_data(html_tree)
+
+    if next_data is None:
+        logger.warning('__NEXT_DATA__ not found on the series page')
+        return None
+
     tabs = next_data.get('props', {}).get('pageProps', {}).get('view', {}).get('tabs', [])
     episodes_tab = [tab for tab in tabs if tab.get('title') in ['Jaksot', 'Klipit']]
     if episodes_tab:
@@ -72,11 +198,172 @@ def parse_playlist_seasons(series_id):
 def download_playlist(
     season_url: str,
     offset: int,
-    page_size: int
+    page_size: int,
+    timeout: Optional[float] = None
 ) -> Tuple[List[EpisodeMetadata], dict]:
+    url = playlist_page_url(season_url, offset, page_size)
+    return _parse_series_episode_data(url, timeout)
+
+
+def stream_playlist(
+    season_url: str,
+    offset: int,
+    page_size: int,
+    factory: Callable[..., Any] = EpisodeMetadata
+) -> Tuple[Iterator[Any], dict]:
+    """Download a playlist page.
+
+    Returns a generator of the episodes and the page metadata. The episodes
+    are created with factory (see iter_episodes()) as the generator is
+    consumed.
+    """
+    url = playlist_page_url(season_url, offset, page_size)
+    playlist = _download_playlist_page(url)
+    episodes = timing.measure_iter('parse playlist', iter_episodes(playlist, factory))
+    return episodes, playlist.get('meta') or {}
+
+
+def download_full_playlist(
+    season_url: str,
+    page_size: int = MAX_PLAYLIST_PAGE_SIZE
+) -> Tuple[List[EpisodeMetadata], List[int]]:
+    """Download all episodes of a season.
+
+    Returns the episodes in the playlist order and the offsets of the pages
+    that failed to download. See download_full_playlists().
+    """
+    return download_full_playlists([season_url], page_size)[0]
+
+
+def download_full_playlists(
+    season_urls: Sequence[str],
+    page_size: int = MAX_PLAYLIST_PAGE_SIZE
+) -> List[Tuple[List[EpisodeMetadata], List[int]]]:
+    """Download all episodes of several seasons.
+
+    The first pages of the seasons are downloaded concurrently. They tell the
+    total number of episodes in each season. If the season episodes cache is
+    enabled and the first page of a season hasn't changed since the season
+    was last downloaded, the cached episodes are used. The rest of the pages
+    of the other seasons are downloaded concurrently.
+
+    Returns a tuple (episodes, failed offsets) for each season in the same
+    order as season_urls. The episodes are in the playlist order. If the
+    failed offsets is not empty, some episodes are missing.
+    """
+    results: List[Tuple[List[EpisodeMetadata], List[int]]] = []
+    if not season_urls:
+        return results
+
+    with ThreadPoolExecutor(max_workers=MAX_PLAYLIST_WORKERS) as executor:
+        first_pages = list(executor.map(
+            lambda url: _download_first_page(url, page_size), season_urls))
+
+        jobs: List[Tuple[int, int]] = []
+        changed: Dict[int, str] = {}
+        for i, (season_url, first_page) in enumerate(zip(season_urls, first_pages)):
+            if first_page is None:
+                results.append(([], [0]))
+                continue
+
+            episodes, count, fingerprint = first_page
+            cached = _load_season_episodes(season_url, fingerprint)
+            if cached is not None:
+                logger.debug(f'Season has not changed, using cached episodes: {season_url}')
+                results.append((cached, []))
+            else:
+                results.append((episodes, []))
+                changed[i] = fingerprint
+                jobs.extend((i, offset) for offset in range(page_size, count, page_size))
+
+        pages = list(executor.map(
+            lambda job: _download_page(season_urls[job[0]], job[1], page_size), jobs))
+
+    for (i, offset), page in zip(jobs, pages):
+        if page is None:
+            results[i][1].append(offset)
+        else:
+            results[i][0].extend(page)
+
+    for i, fingerprint in changed.items():
+        episodes, failed_offsets = results[i]
+        if not failed_offsets:
+            _save_season_episodes(season_urls[i], fingerprint, episodes)
+
+    return results
+
+
+def _download_first_page(
+    season_url: str,
+    page_size: int
+) -> Optional[Tuple[List[EpisodeMetadata], int, str]]:
+    """Download the first page of a season playlist.
+
+    Returns the episodes, the total number of episodes in the season and a
+    fingerprint of the page, or None if the download fails.
+    """
+    url = playlist_page_url(season_url, 0, page_size)
+    try:
+        r = httpcache.get(url, 'playlist')
+        r.raise_for_status()
+        with timing.measure('parse playlist'):
+            episodes, meta = _parse_playlist(r.json())
+    except (requests.RequestException, ValueError) as ex:
+        logger.warning(f'Failed to download the first playlist page of {season_url}: {ex}')
+        return None
+
+    fingerprint = hashlib.sha1(r.text.encode('utf-8')).hexdigest()
+    return episodes, meta.get('count', 0), fingerprint
+
+
+def _download_page(
+    season_url: str,
+    offset: int,
+    page_size: int
+) -> Optional[List[EpisodeMetadata]]:
+    url = playlist_page_url(season_url, offset, page_size)
+    try:
+        return _parse_series_episode_data(url, strict=True)[0]
+    except (requests.RequestException, ValueError) as ex:
+        logger.warning(f'Failed to download playlist page at offset {offset}: {ex}')
+        return None
+
+
+def _load_season_episodes(season_url: str, fingerprint: str) -> Optional[List[EpisodeMetadata]]:
+    if _season_episodes_storage is None:
+        return None
+
+    with _seasons_lock:
+        try:
+            cached = _season_episodes_storage.get(season_url)
+            if cached is None or cached['fingerprint'] != fingerprint:
+                return None
+
+            return [EpisodeMetadata(**ep) for ep in cached['episodes']]
+        except Exception as ex:
+            logger.warning(f'Ignoring an invalid season cache entry: {ex}')
+            return None
+
+
+def _save_season_episodes(
+    season_url: str,
+    fingerprint: str,
+    episodes: List[EpisodeMetadata]
+) -> None:
+    if _season_episodes_storage is None:
+        return
+
+    with _seasons_lock:
+        _season_episodes_storage.set(season_url, {
+            'fingerprint': fingerprint,
+            'episodes': [asdict(ep) for ep in episodes],
+        }, ttl=SERIES_SEASONS_MAX_AGE)
+
+
+def playlist_page_url(season_url: str, offset: int, page_size: int) -> str:
     # Areena server fails (502 Bad gateway) if page_size is larger
     # than 100.
-    assert 0 < page_size <= 100
+    assert 0 < page_size <= MAX_PLAYLIST_PAGE_SIZE
 
     params = {
         'offset': str(offset),
@@ -84,8 +371,33 @@ def download_playlist(
         'app_id': 'areena-web-items',
         'app_key': 'wlTs5D9OjIdeS9krPzRQR4I1PYVzoazN',
     }
-    playlist_page_url = update_url_query(season_url, params)
-    return _parse_series_episode_data(playlist_page_url)
+    return update_url_query(season_url, params)
+
+
+def _scan_next_data(html: str) -> Optional[dict]:
+    """Find and decode the __NEXT_DATA__ JSON without parsing the whole HTML.
+
+    Returns None if the script element can't be found or its content is not
+    valid JSON. The caller should then fall back to a full HTML parser.
+    """
+    m = _NEXT_DATA_START_RE.search(html)
+    if m is None:
+        return None
+
+    end = html.find('</script>', m.end())
+    if end < 0:
+        return None
+
+    try:
+        return json.loads(html[m.end():end])
+    except ValueError:
+        return None
+
+
+def _has_complete_next_data(html: str) -> bool:
+    """Return True if html contains the whole __NEXT_DATA__ script element."""
+    m = _NEXT_DATA_START_RE.search(html)
+    return m is not None and html.find('</script>', m.end()) >= 0
 
 
 def _parse_next_data(html_tree):
@@ -96,19 +408,48 @@ def _parse_next_data(html_tree):
         return None
 
 
-def _parse_series_episode_data(playlist_page_url):
+def _parse_series_episode_data(playlist_page_url, timeout=None, strict=False):
+    """Download and parse a playlist page.
+
+    If strict is True, raises an exception if the download fails. Otherwise,
+    logs a warning and returns an empty playlist.
+    """
+    playlist = _download_playlist_page(playlist_page_url, timeout, strict)
+    with timing.measure('parse playlist'):
+        return _parse_playlist(playlist)
+
+
+def _download_playlist_page(playlist_page_url, timeout=None, strict=False) -> dict:
     logger.debug(f'Downloading playlist page {playlist_page_url}')
-    r = requests.get(playlist_page_url)
-    if r.status_code >= 400:
+    r = httpcache.get(playlist_page_url, 'playlist', timeout=timeout)
+    if strict:
+        r.raise_for_status()
+    elif r.status_code >= 400:
         logger.warning(
             f'Failed to download playlist page {playlist_page_url}. Some episodes may be missing!')
-        return [], {}
+        return {}
+
+    with timing.measure('parse playlist'):
+        return r.json()
+
 
-    playlist = r.json()
+def _parse_playlist(playlist: dict) -> Tuple[List[EpisodeMetadata], dict]:
+    return list(iter_episodes(playlist)), playlist.get('meta') or {}
 
-    episodes = []
+
+def iter_episodes(
+    playlist: dict,
+    factory: Callable[..., Any] = EpisodeMetadata
+) -> Iterator[Any]:
+    """Parse the episodes in a decoded playlist API response one at a time.
+
+    factory is called with the EpisodeMetadata fields as keyword arguments to
+    create each episode. The default creates EpisodeMetadata objects.
+    """
     for data in playlist.get('data', []):
         uri = data.get('pointer', {}).get('uri')
+        if not uri:
+            continue
 
         labels = data.get('labels')
 
@@ -120,7 +461,7 @@ def _parse_series_episode_data(playlist_page_url):
         release_date = None
         generics = label_by_type(labels, 'generic', 'formatted')
         for val in generics:
-            m = re.match(r'[a-z]{2} (?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})', val)
+            m = _RELEASE_DATE_RE.match(val)
             if m:
                 release_date = datetime(
                     int(m.group('year')),
@@ -129,22 +470,17 @@ def _parse_series_episode_data(playlist_page_url):
                 )
                 break
 
-        if uri:
-            media_id = uri.rsplit('/')[-1]
-            uri = f'https://areena.yle.fi/{media_id}'
-            episodes.append(EpisodeMetadata(
-                homepage=uri,
-                title=data.get('title'),
-                description=data.get('description'),
-                duration_seconds=duration,
-                published=release_date,
-                image_id=data.get('image', {}).get('id'),
-                image_version=data.get('image', {}).get('version')
-            ))
-
-    meta = playlist.get('meta')
-
-    return episodes, meta
+        media_id = uri.rsplit('/')[-1]
+        image = data.get('image', {})
+        yield factory(
+            homepage=f'https://areena.yle.fi/{media_id}',
+            title=data.get('title'),
+            description=data.get('description'),
+            duration_seconds=duration,
+            published=release_date,
+            image_id=image.get('id'),
+            image_version=image.get('version')
+        )
 
 
 def update_url_query(url: str, new_query_parameters: Mapping[str, str]) -> str:
@@ -0,0 +1,36 @@
+import os.path
+import xbmcvfs
+from .storage import Storage
+from typing import List
+
+_recent_series = None
+
+
+class RecentSeries():
+    """Series that the user has opened recently."""
+    def __init__(self, storage_filename: str, max_item_count: int = 10):
+        self.storage = Storage(storage_filename, namespace='recent_series')
+        self.max_item_count = max_item_count
+
+    def update(self, series_id: str) -> None:
+        with self.storage.session():
+            self.storage.set(series_id, series_id)
+            self.storage.trim(self.max_item_count)
+
+    def list(self) -> List[str]:
+        """Return the series IDs, the most recently opened first."""
+        items = self.storage.get_all(reverse=True, limit=self.max_item_count)
+        return [x[1] for x in items]
+
+
+def get_recent_series(addon):
+    global _recent_series
+
+    if _recent_series is None:
+        data_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+        if not xbmcvfs.exists(data_path):
+            xbmcvfs.mkdir(data_path)
+
+        _recent_series = RecentSeries(os.path.join(data_path, 'recent.sqlite'))
+
+    return _recent_series
@@ -0,0 +1,166 @@
+"""A local full-text index of the series and episodes the add-on has seen.
+
+Titles are split into terms that are stored in an inverted index table next
+to the items. Terms and queries are folded to lower case without diacritics,
+so "aani" finds "Ääni" and "o" finds "Ö". Each query term matches as a
+prefix. An item matches if it matches all query terms.
+
+The index makes it possible to show known titles instantly and without a
+network connection.
+"""
+import re
+import unicodedata
+from . import logger
+from .storage import Key, Storage
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+# Upper limit for the size of the indexed items. The least recently
+# updated items are evicted first.
+MAX_INDEX_BYTES = 5 * 1024 * 1024
+
+# Maximum number of matching items that are ranked for a query
+MAX_CANDIDATES = 500
+
+# Letters that don't decompose into a base letter and a diacritic
+_FOLD_TABLE = str.maketrans({'æ': 'a', 'ø': 'o', 'ß': 's', 'đ': 'd', 'ł': 'l'})
+
+_TERM_RE = re.compile(r'\w+')
+
+_search_index = None
+
+
+def fold(text: str) -> str:
+    """Convert text to lower case and remove diacritics."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.translate(_FOLD_TABLE)
+
+
+def terms(text: str) -> List[str]:
+    """Split text into folded terms."""
+    return _TERM_RE.findall(fold(text))
+
+
+class SearchIndex(Storage):
+    """Items with a title, searchable by the prefixes of the title words.
+
+    The items are stored like in Storage. The terms of the titles are kept
+    in a separate table that maps terms to item keys.
+    """
+    def __init__(self, filename: str, max_bytes: Optional[int] = MAX_INDEX_BYTES):
+        super().__init__(filename, namespace='search_items', max_bytes=max_bytes)
+        self._terms_table = f'{self._table_name}_terms'
+
+    def add(self, items: Iterable[Tuple[Key, str, Any]]) -> None:
+        """Add or update items. Each item is a (key, title, value) tuple."""
+        items = list(items)
+        if not items:
+            return
+
+        with self.session():
+            self._executemany(f'DELETE FROM {self._terms_table} WHERE id = ?',
+                              [(key,) for key, _, _ in items])
+            self._executemany(
+                f'INSERT OR IGNORE INTO {self._terms_table} (term, id) VALUES (?, ?)',
+                [(term, key) for key, title, _ in items for term in set(terms(title))]
+            )
+            # Set the items last, because evicting items removes also their terms
+            self.set_many(((key, (title, value)) for key, title, value in items))
+
+    def search(self, query: str, limit: int) -> List[Any]:
+        """Return the values of the items whose titles match query.
+
+        Titles that start with the query are ranked first. Otherwise the most
+        recently updated items come first.
+        """
+        query_terms = terms(query)
+        if not query_terms:
+            return []
+
+        with self.session(write=False):
+            keys: Optional[Set[Key]] = None
+            for term in sorted(set(query_terms), key=len, reverse=True):
+                matches = self._keys_with_prefix(term)
+                keys = matches if keys is None else keys & matches
+                if not keys:
+                    return []
+
+            candidates = self._load_items(keys or set())
+
+        folded_query = ' '.join(query_terms)
+        candidates.sort(key=lambda x: not ' '.join(terms(x[0])).startswith(folded_query))
+        return [value for _, value in candidates[:limit]]
+
+    def delete_many(self, keys: Iterable[Key]) -> None:
+        keys = list(keys)
+        with self.session():
+            super().delete_many(keys)
+            self._executemany(f'DELETE FROM {self._terms_table} WHERE id = ?',
+                              [(key,) for key in keys])
+
+    def _keys_with_prefix(self, prefix: str) -> Set[Key]:
+        cursor = self._execute(
+            f'SELECT id FROM {self._terms_table} WHERE term >= ? AND term < ?',
+            [prefix, prefix + '\U0010ffff']
+        )
+        return {row[0] for row in cursor}
+
+    def _load_items(self, keys: Set[Key]) -> List[Tuple[str, Any]]:
+        """Return (title, value) of the items with keys, the most recently updated first."""
+        key_list = list(keys)
+        rows: List[Tuple[str, bytes, bool]] = []
+        # Stay below the SQLite limit for the number of query parameters
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = self._execute(
+                f'SELECT time, value, compressed FROM {self._table_name} '
+                f'WHERE id IN ({placeholders})',
+                chunk
+            )
+            rows.extend(cursor)
+
+        # Sort across the chunks before keeping the newest candidates
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return [self._deserialize(row[1], row[2]) for row in rows[:MAX_CANDIDATES]]
+
+    def _create_table(self) -> None:
+        if not self._table_created:
+            super()._create_table()
+            self._execute(f'CREATE TABLE IF NOT EXISTS {self._terms_table} '
+                          '(term TEXT, id, PRIMARY KEY (term, id)) WITHOUT ROWID')
+            self._execute(f'CREATE INDEX IF NOT EXISTS {self._terms_table}_id '
+                          f'ON {self._terms_table} (id)')
+
+
+def configure(storage_filename: Optional[str]) -> None:
+    """Enable the index. Pass None to disable it."""
+    global _search_index
+
+    if storage_filename is None:
+        _search_index = None
+    else:
+        _search_index = SearchIndex(storage_filename)
+
+
+def add(items: Iterable[Tuple[Key, str, Any]]) -> None:
+    """Add (key, title, value) tuples to the index, if it has been configured."""
+    if _search_index is None:
+        return
+
+    try:
+        _search_index.add(items)
+    except Exception as ex:
+        logger.warning(f'Failed to update the search index: {ex}')
+
+
+def search(query: str, limit: int) -> List[Any]:
+    """Return the values of the indexed items matching query."""
+    if _search_index is None:
+        return []
+
+    try:
+        return _search_index.search(query, limit)
+    except Exception as ex:
+        logger.warning(f'Local search failed: {ex}')
+        return []
@@ -1,75 +1,259 @@
+import hashlib
 import pickle
+import random
+import re
 import sqlite3
+import time
+import zlib
 from . import logger
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, \
+    TypeVar, Union
+
+Key = Union[int, str]
+T = TypeVar('T')
+
+DEFAULT_NAMESPACE = 'objects'
+
+_NAMESPACE_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# How long SQLite waits for a lock held by another connection before giving up
+BUSY_TIMEOUT_SECONDS = 2.0
+
+# If the lock still can't be acquired, retry this many times with an
+# exponentially growing, jittered delay starting from BUSY_RETRY_DELAY_SECONDS.
+BUSY_RETRIES = 4
+BUSY_RETRY_DELAY_SECONDS = 0.05
+
+# The access time of an item, used for the LRU eviction, is updated on read
+# only if it is older than this. Most reads therefore don't need the write
+# lock or write to the disk.
+ACCESS_UPDATE_INTERVAL_SECONDS = 10 * 60
+
+# Columns added after the first version of the objects table. Missing columns
+# are added to old databases when they are opened.
+_EXTRA_COLUMNS = [
+    ('expires', 'REAL'),
+    ('accessed', 'REAL'),
+    ('size', 'INTEGER'),
+    ('compressed', 'INTEGER NOT NULL DEFAULT 0'),
+]
 
 
 class Storage():
-    def __init__(self, filename: str):
-        self._filename = filename
+    """A persistent key-value store backed by a SQLite database.
+
+    Each namespace is a separate table in the database file. Keys are integers
+    or strings. The objects table created by older versions of the add-on
+    accepts only integer keys.
+
+    Values are pickled. Pickled values larger than compress_threshold bytes
+    are compressed with zlib. If max_bytes is given, the least recently used
+    items are evicted when the total size of the stored values in the
+    namespace exceeds it. The total size is summed from the database only
+    when an estimate kept by this object reaches max_bytes, so writes by
+    other processes are noticed late.
+
+    Several processes can use the same database file. In the default WAL
+    journal mode readers don't block the writer. Writers wait for each other
+    and retry with a backoff if the database stays locked.
+    """
+    def __init__(
+        self,
+        filename: str,
+        namespace: str = DEFAULT_NAMESPACE,
+        max_bytes: Optional[int] = None,
+        compress_threshold: Optional[int] = None,
+        journal_mode: str = 'WAL'
+    ):
         self._conn: Optional[sqlite3.Connection] = None
-        self._table_name = 'objects'
+        if not _NAMESPACE_RE.match(namespace):
+            raise ValueError(f'Invalid namespace: {namespace}')
+
+        self._filename = filename
+        self._table_name = namespace
         self._table_created = False
         self._greeted = False
+        self._in_session = False
+        self.max_bytes = max_bytes
+        self.compress_threshold = compress_threshold
+        self.journal_mode = journal_mode
+        # An upper bound for the total size of the values, if known
+        self._size_estimate: Optional[int] = None
+        # Statistics of waiting for locks held by other connections
+        self.lock_wait_seconds = 0.0
+        self.busy_retries = 0
 
     def __del__(self):
         self._close()
 
-    def set(self, key: int, obj: Any) -> None:
-        self._open()
+    @contextmanager
+    def session(self, write: bool = True) -> Iterator['Storage']:
+        """Run several operations in one connection and one transaction.
 
-        t = datetime.now()
-        query = f'REPLACE INTO {self._table_name} (id, time, value) VALUES (?, ?, ?)'
+        The transaction is committed when the block exits normally and rolled
+        back if it raises an exception. Nested sessions join the outer one.
 
+        If write is True, the write lock is acquired at the start of the
+        transaction. Pass write=False only if the block doesn't modify the
+        database.
+        """
+        if self._in_session:
+            yield self
+            return
+
+        self._open()
+        self._in_session = True
         try:
-            self._execute(query, [key, t, self._serialize(obj)])
+            self._retry_if_busy(lambda: self._execute('BEGIN IMMEDIATE' if write else 'BEGIN'))
+            try:
+                yield self
+            except BaseException:
+                self._execute('ROLLBACK')
+                raise
+            else:
+                self._execute('COMMIT')
         finally:
+            self._in_session = False
             self._close()
 
-    def get(self, key: int) -> Any:
-        self._open()
+    def set(self, key: Key, obj: Any, ttl: Optional[float] = None) -> None:
+        """Insert or update an item.
 
-        query = f'SELECT value FROM {self._table_name} WHERE id = ?'
+        If ttl is given, the item expires after ttl seconds.
+        """
+        self.set_many([(key, obj)], ttl)
 
-        try:
-            cursor = self._execute(query, [key])
-            row = cursor.fetchone()
-        finally:
-            self._close()
+    def set_many(self, items: Iterable[Tuple[Key, Any]], ttl: Optional[float] = None) -> None:
+        """Insert or update several items.
+
+        The items are ordered as if they had been set one by one in the given
+        order. If ttl is given, the items expire after ttl seconds.
+        """
+        t = datetime.now()
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        query = (f'REPLACE INTO {self._table_name} '
+                 '(id, time, value, expires, accessed, size, compressed) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        params = []
+        for i, (key, obj) in enumerate(items):
+            value, compressed = self._serialize(obj)
+            params.append((key, t + timedelta(microseconds=i), value, expires,
+                           now, len(value), compressed))
+
+        with self.session():
+            self._executemany(query, params)
+            if self.max_bytes is not None:
+                self._evict(self.max_bytes, sum(x[5] for x in params))
+
+    def get(self, key: Key) -> Any:
+        """Return the value of key or None if key is missing or has expired."""
+        query = (f'SELECT value, compressed, accessed FROM {self._table_name} '
+                 'WHERE id = ? AND (expires IS NULL OR expires > ?)')
+
+        now = time.time()
+        with self.session(write=False):
+            row = self._execute(query, [key, now]).fetchone()
 
         if row is None:
             return None
 
-        return self._deserialize(row[0])
+        accessed = row[2]
+        if (
+            self.max_bytes is not None and
+            (accessed is None or now - accessed >= ACCESS_UPDATE_INTERVAL_SECONDS)
+        ):
+            with self.session():
+                self._execute(f'UPDATE {self._table_name} SET accessed = ? WHERE id = ?',
+                              [now, key])
+
+        return self._deserialize(row[0], row[1])
 
-    def get_all(self, reverse=False) -> List[Tuple[int, Any]]:
-        """Return all item in the insertion order.
+    def get_all(
+        self,
+        reverse: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Tuple[Key, Any]]:
+        """Return all unexpired items in the insertion order.
 
         The most recently inserted or updated item is last. If reverse is True,
         the most recently inserted is first.
-        """
-        self._open()
 
+        If limit is given, return at most limit items starting from offset.
+        """
         ordering = 'DESC' if reverse else 'ASC'
-        query = f'SELECT id, value FROM {self._table_name} ORDER BY time {ordering}'
+        query = (f'SELECT id, value, compressed FROM {self._table_name} '
+                 'WHERE expires IS NULL OR expires > ? '
+                 f'ORDER BY time {ordering} LIMIT ? OFFSET ?')
+        params = [time.time(), limit if limit is not None else -1, offset]
 
-        try:
-            cursor = self._execute(query)
-            return [(x[0], self._deserialize(x[1])) for x in cursor]
-        finally:
-            self._close()
+        with self.session(write=False):
+            cursor = self._execute(query, params)
+            return [(x[0], self._deserialize(x[1], x[2])) for x in cursor]
 
-    def delete(self, key: int) -> None:
-        self._open()
+    def delete(self, key: Key) -> None:
+        self.delete_many([key])
 
+    def delete_many(self, keys: Iterable[Key]) -> None:
         query = f'DELETE FROM {self._table_name} WHERE id = ?'
 
-        try:
-            self._execute(query, [key])
-        finally:
-            self._close()
+        with self.session():
+            self._executemany(query, [(key,) for key in keys])
+
+    def delete_expired(self) -> None:
+        query = f'DELETE FROM {self._table_name} WHERE expires <= ?'
+
+        with self.session():
+            self._execute(query, [time.time()])
+
+    def trim(self, max_count: int) -> None:
+        """Keep only the max_count most recently inserted or updated items."""
+        query = (f'DELETE FROM {self._table_name} WHERE id NOT IN '
+                 f'(SELECT id FROM {self._table_name} ORDER BY time DESC LIMIT ?)')
+
+        with self.session():
+            self._execute(query, [max_count])
+
+    def total_size(self) -> int:
+        """Return the total size of the stored values in bytes."""
+        query = f'SELECT COALESCE(SUM(size), 0) FROM {self._table_name}'
+
+        with self.session(write=False):
+            return self._execute(query).fetchone()[0]
+
+    def _evict(self, max_bytes: int, added_bytes: int) -> None:
+        """Delete the least recently used items until the values fit in max_bytes.
+
+        added_bytes is the size of the values that were just written.
+        """
+        if self._size_estimate is not None and self._size_estimate + added_bytes <= max_bytes:
+            self._size_estimate += added_bytes
+            return
+
+        size = self.total_size()
+        excess = size - max_bytes
+        if excess <= 0:
+            self._size_estimate = size
+            return
+
+        cursor = self._execute(
+            f'SELECT id, size FROM {self._table_name} ORDER BY accessed ASC, time ASC')
+        evicted = []
+        for key, item_size in cursor:
+            if excess <= 0:
+                break
+            evicted.append(key)
+            excess -= item_size
+            size -= item_size
+        cursor.close()
+
+        logger.debug(f'Evicting {len(evicted)} items from {self._table_name}')
+        self.delete_many(evicted)
+        self._size_estimate = size
 
     def _open(self) -> None:
         if self._conn is None:
@@ -78,20 +262,51 @@ class Storage():
 
             self._conn = sqlite3.connect(
                 self._filename,
-                timeout=1,
+                timeout=BUSY_TIMEOUT_SECONDS,
                 isolation_level=None,
                 check_same_thread=False
             )
 
-            if not self._greeted:
-                self._greeted = True
-                self._log_version()
+            try:
+                if not self._greeted:
+                    self._greeted = True
+                    self._log_version()
+
+                self._retry_if_busy(self._configure_connection)
+                self._retry_if_busy(self._create_table)
+            except BaseException:
+                self._close()
+                raise
+
+    def _configure_connection(self) -> None:
+        self._execute(f'PRAGMA journal_mode={self.journal_mode}')
+        if self.journal_mode.upper() == 'WAL':
+            # Safe against corruption in WAL mode. A power loss may roll back
+            # the latest transactions.
+            self._execute('PRAGMA synchronous=NORMAL')
+
+    def _retry_if_busy(self, func: Callable[[], T]) -> T:
+        """Call func and retry with a backoff if the database is locked.
 
-            cursor = self._conn.cursor()
-            cursor.execute('PRAGMA journal_mode=MEMORY')
-            cursor.close()
+        The time spent waiting is added to lock_wait_seconds.
+        """
+        start = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    return func()
+                except sqlite3.OperationalError as ex:
+                    if not _is_busy_error(ex) or attempt >= BUSY_RETRIES:
+                        raise
 
-            self._create_table()
+                delay = BUSY_RETRY_DELAY_SECONDS * 2**attempt * random.uniform(0.5, 1.5)
+                logger.warning(f'{self._filename} is locked, retrying in {delay:.2f} s')
+                time.sleep(delay)
+                attempt += 1
+                self.busy_retries += 1
+        finally:
+            self.lock_wait_seconds += time.perf_counter() - start
 
     def _close(self) -> None:
         if self._conn is not None:
@@ -101,10 +316,30 @@ class Storage():
 
     def _create_table(self) -> None:
         if not self._table_created:
+            # The id column has no type so that it accepts integer and string
+            # keys. Old databases have "id INTEGER PRIMARY KEY".
+            columns = ''.join(f', {name} {decl}' for name, decl in _EXTRA_COLUMNS)
             self._execute(f'CREATE TABLE IF NOT EXISTS {self._table_name} '
-                          '(id INTEGER PRIMARY KEY, time TIMESTAMP, value BLOB)')
+                          f'(id PRIMARY KEY, time TIMESTAMP, value BLOB{columns})')
+            self._migrate_table()
+            self._execute(f'CREATE INDEX IF NOT EXISTS {self._table_name}_time '
+                          f'ON {self._table_name} (time)')
+            self._execute(f'CREATE INDEX IF NOT EXISTS {self._table_name}_accessed '
+                          f'ON {self._table_name} (accessed)')
             self._table_created = True
 
+    def _migrate_table(self) -> None:
+        cursor = self._execute(f'PRAGMA table_info({self._table_name})')
+        existing = {row[1] for row in cursor}
+        missing = [(name, decl) for name, decl in _EXTRA_COLUMNS if name not in existing]
+        if not missing:
+            return
+
+        logger.info(f'Adding columns to {self._table_name} in {self._filename}')
+        for name, decl in missing:
+            self._execute(f'ALTER TABLE {self._table_name} ADD COLUMN {name} {decl}')
+        self._execute(f'UPDATE {self._table_name} SET size = LENGTH(value) WHERE size IS NULL')
+
     def _log_version(self) -> None:
         cursor = self._execute('SELECT SQLITE_VERSION()')
         sqlite_version = cursor.fetchone()[0]
@@ -123,8 +358,43 @@ class Storage():
         else:
             return cursor.execute(query)
 
-    def _serialize(self, obj: Any) -> bytes:
-        return pickle.dumps(obj, protocol=4)
+    def _executemany(self, query: str, params: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+        if self._conn is None:
+            raise RuntimeError('Not connected')
+
+        return self._conn.cursor().executemany(query, params)
+
+    def _serialize(self, obj: Any) -> Tuple[bytes, bool]:
+        """Pickle obj and compress the result if it is large.
 
-    def _deserialize(self, serialized: bytes) -> Any:
+        Returns the serialized value and a flag telling if it is compressed.
+        """
+        serialized = pickle.dumps(obj, protocol=4)
+        if self.compress_threshold is not None and len(serialized) > self.compress_threshold:
+            return zlib.compress(serialized), True
+        else:
+            return serialized, False
+
+    def _deserialize(self, serialized: bytes, compressed: bool = False) -> Any:
+        if compressed:
+            serialized = zlib.decompress(serialized)
         return pickle.loads(serialized)
+
+
+def _is_busy_error(ex: sqlite3.OperationalError) -> bool:
+    message = str(ex)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def hash_key(text: str) -> int:
+    """Convert a string into an integer key that can be used with Storage."""
+    # Use only the upper 64 bits of the MD5 hash, because SQLite supports at
+    # most 64 bit integers.
+    m = hashlib.md5(text.encode('utf-8'))
+    i = int(m.hexdigest()[:16], base=16)
+
+    # translate to signed 64 bit int range
+    if i >= 0x8000000000000000:
+        i -= 0x10000000000000000
+
+    return i
@@ -0,0 +1,127 @@
+"""Per-phase timing of a plugin invocation.
+
+The time spent in each phase (HTTP requests by endpoint, parsing, rendering
+the listing) is accumulated while a route runs and logged when it completes.
+Phases can be nested. The time of a nested phase is subtracted from the
+enclosing phase, so the phase times add up to the measured total.
+
+Phases running in worker threads are accumulated in the same totals. Their
+sum can therefore exceed the wall clock time of the invocation.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')
+
+
+@dataclass
+class PhaseStats:
+    seconds: float = 0.0
+    count: int = 0
+    num_bytes: int = 0
+
+
+_phases: Dict[str, PhaseStats] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+@contextmanager
+def measure(phase: str) -> Iterator[None]:
+    """Measure the time spent inside the with block as phase."""
+    stack = _stack()
+    # Time spent in nested phases. Excluded from this phase.
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        record(phase, elapsed - nested)
+
+
+def measure_iter(phase: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Generate the items of iterable and measure the time spent producing them.
+
+    Use this for lazy parsers whose items are created while the consumer is
+    rendering them. Only the time inside the iterable counts as phase. The
+    time the consumer spends on each item does not.
+    """
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            stack = _stack()
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                step = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += step
+                elapsed += step - nested
+            yield item
+    finally:
+        record(phase, elapsed)
+
+
+def record(phase: str, seconds: float, num_bytes: int = 0) -> None:
+    with _lock:
+        stats = _phases.setdefault(phase, PhaseStats())
+        stats.seconds += seconds
+        stats.count += 1
+        stats.num_bytes += num_bytes
+
+
+def add_bytes(phase: str, num_bytes: int) -> None:
+    """Add num_bytes to the data amount of phase."""
+    with _lock:
+        _phases.setdefault(phase, PhaseStats()).num_bytes += num_bytes
+
+
+def phases() -> Dict[str, PhaseStats]:
+    with _lock:
+        return {name: PhaseStats(x.seconds, x.count, x.num_bytes) for name, x in _phases.items()}
+
+
+def reset() -> None:
+    with _lock:
+        _phases.clear()
+
+
+def summary(total_seconds: float) -> str:
+    """Format the phase times as a single line, the slowest phase first."""
+    parts: List[str] = []
+    accounted = 0.0
+    for name, stats in sorted(phases().items(), key=lambda x: -x[1].seconds):
+        part = f'{name} {stats.seconds * 1000:.0f} ms'
+        if stats.count > 1:
+            part += f' ({stats.count}x)'
+        if stats.num_bytes:
+            part += f' {stats.num_bytes / 1024:.1f} kB'
+        parts.append(part)
+        accounted += stats.seconds
+
+    other = total_seconds - accounted
+    if other > 0:
+        parts.append(f'other {other * 1000:.0f} ms')
+
+    return f'total {total_seconds * 1000:.0f} ms: ' + ', '.join(parts)
+
+
+def _stack() -> List[float]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = []
+        _local.stack = stack
+    return stack
@@ -0,0 +1,104 @@
+import time
+import traceback
+import xbmc
+import xbmcaddon
+from resources.lib import logger
+from resources.lib.kodi import profile_path
+
+# How often the service checks whether it is time to warm the caches
+CHECK_INTERVAL_SECONDS = 60
+
+# Warm the caches only after the user hasn't touched the remote for this long
+MIN_IDLE_SECONDS = 120
+
+# Number of the most recent search keywords and series that are refreshed
+NUM_SEARCHES = 3
+NUM_SERIES = 5
+
+
+class CacheWarmerService:
+    def __init__(self):
+        self.monitor = xbmc.Monitor()
+        self.player = xbmc.Player()
+        self.last_run = 0.0
+
+    def run(self) -> None:
+        logger.info('Cache warmer service started')
+        while not self.monitor.waitForAbort(CHECK_INTERVAL_SECONDS):
+            # An unexpected error must not end the service for the rest of
+            # the Kodi session
+            try:
+                self.update_schedules()
+            except Exception:
+                logger.error(f'Updating the schedules failed:\n{traceback.format_exc()}')
+
+            try:
+                if self.is_due():
+                    self.warm()
+            except Exception:
+                logger.error(f'Cache warming failed:\n{traceback.format_exc()}')
+                # Try again after the normal interval, not on the next check
+                self.last_run = time.time()
+
+    def update_schedules(self) -> None:
+        """Download the TV schedules if the current program has ended."""
+        from resources.lib import epg
+
+        if not xbmcaddon.Addon().getSettingBool('show_epg'):
+            return
+
+        # Don't use the network during playback, like the cache warmer
+        if self.player.isPlaying():
+            return
+
+        # Checking the stored schedules is cheap. The network modules are
+        # imported only if a schedule has to be downloaded.
+        cache_filename = profile_path('cache.sqlite')
+        if epg.needs_update(cache_filename):
+            from resources.lib import circuitbreaker
+
+            circuitbreaker.configure(cache_filename)
+            epg.update_schedules(cache_filename)
+
+    def is_due(self) -> bool:
+        # A new Addon object sees the latest settings
+        addon = xbmcaddon.Addon()
+        if not addon.getSettingBool('warmer_enabled'):
+            return False
+
+        interval = addon.getSettingInt('warmer_interval') * 60
+        return (
+            time.time() - self.last_run >= interval and
+            not self.player.isPlaying() and
+            xbmc.getGlobalIdleTime() >= MIN_IDLE_SECONDS
+        )
+
+    def warm(self) -> None:
+        # The network modules are imported only when needed to keep the idle
+        # service light
+        from resources.lib import circuitbreaker, httpcache, playlist, searchindex
+        from resources.lib.cachewarmer import warm_caches
+        from resources.lib.recentseries import get_recent_series
+        from resources.lib.searchhistory import get_search_history
+
+        cache_filename = profile_path('cache.sqlite')
+        httpcache.configure(cache_filename)
+        playlist.configure_seasons_cache(cache_filename)
+        circuitbreaker.configure(cache_filename)
+        searchindex.configure(cache_filename)
+
+        addon = xbmcaddon.Addon()
+        max_bytes = addon.getSettingInt('warmer_max_megabytes') * 1024 * 1024
+        keywords = get_search_history(addon).list()[:NUM_SEARCHES]
+        series_ids = get_recent_series(addon).list()[:NUM_SERIES]
+
+        # Back off as soon as the user starts playing a video
+        warm_caches(keywords, series_ids, max_bytes, self.should_continue)
+        self.last_run = time.time()
+
+    def should_continue(self) -> bool:
+        return not self.monitor.abortRequested() and not self.player.isPlaying()
+
+
+if __name__ == '__main__':
+    CacheWarmerService().run()
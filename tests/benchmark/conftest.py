@@ -0,0 +1,59 @@
+import json
+import pytest
+from pathlib import Path
+from tools.synthetic import synthetic_preview, synthetic_search_results, \
+    synthetic_season_playlist, synthetic_series_page
+
+FIXTURE_DIR = Path(__file__).parent.parent / 'fixtures'
+
+
+def recorded_fixtures(kind: str, extension: str):
+    """Return recorded fixtures of kind as a dict from file name to content."""
+    return {
+        path.name: path.read_text(encoding='utf-8')
+        for path in sorted(FIXTURE_DIR.glob(f'v*/{kind}/*.{extension}'))
+    }
+
+
+def fixture_params(kind: str, extension: str, synthetic: str):
+    pages = recorded_fixtures(kind, extension)
+    pages['synthetic'] = synthetic
+    return sorted(pages.items())
+
+
+def ids(param):
+    return param[0]
+
+
+@pytest.fixture(params=fixture_params('series_page', 'html', synthetic_series_page()), ids=ids)
+def series_page(request):
+    return request.param[1]
+
+
+@pytest.fixture(
+    params=fixture_params('search', 'json', json.dumps(synthetic_search_results())),
+    ids=ids
+)
+def search_response(request):
+    return request.param[1]
+
+
+@pytest.fixture(
+    params=fixture_params('content_list', 'json', json.dumps(synthetic_search_results())),
+    ids=ids
+)
+def content_list_response(request):
+    return request.param[1]
+
+
+@pytest.fixture(
+    params=fixture_params('season_playlist', 'json', json.dumps(synthetic_season_playlist())),
+    ids=ids
+)
+def season_playlist_response(request):
+    return request.param[1]
+
+
+@pytest.fixture(params=fixture_params('preview', 'json', json.dumps(synthetic_preview())), ids=ids)
+def preview_response(request):
+    return request.param[1]
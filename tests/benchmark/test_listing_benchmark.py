@@ -0,0 +1,76 @@
+import gc
+import json
+import pytest
+import tracemalloc
+from resources.lib import areena, playlist
+from resources.lib.httpcache import CachedResponse
+from tools.synthetic import synthetic_search_results, synthetic_season_playlist
+
+pytest.importorskip('pytest_benchmark')
+
+PAGE_SIZE = 100
+SEASON_URL = 'https://areena.api.yle.fi/v1/ui/content/list?token=abc'
+
+
+@pytest.fixture
+def season_page(monkeypatch):
+    """Make the playlist API return a season page of PAGE_SIZE episodes."""
+    text = json.dumps(synthetic_season_playlist(PAGE_SIZE))
+    monkeypatch.setattr(playlist.httpcache, 'get',
+                        lambda url, endpoint, *args, **kwargs: CachedResponse(url, 200, text))
+
+
+@pytest.fixture
+def search_page(monkeypatch):
+    """Make the search API return a page of PAGE_SIZE results."""
+    text = json.dumps(synthetic_search_results(PAGE_SIZE))
+    monkeypatch.setattr(areena.httpcache, 'get',
+                        lambda url, endpoint, *args, **kwargs: CachedResponse(url, 200, text))
+
+
+@pytest.fixture
+def directory_items(monkeypatch, kodi_main):
+    """Capture the items passed to addDirectoryItems."""
+    captured = []
+    monkeypatch.setattr(kodi_main.xbmcplugin, 'addDirectoryItems',
+                        lambda handle, items, total: captured.append(items))
+    return captured
+
+
+@pytest.mark.benchmark(group='listing')
+def test_benchmark_season_listing(benchmark, kodi_main, season_page, directory_items):
+    num_items = benchmark(
+        lambda: kodi_main.show_links(areena.iter_season_playlist(SEASON_URL, 0, PAGE_SIZE)))
+
+    assert num_items > PAGE_SIZE
+    assert len(directory_items[-1]) == num_items
+
+
+@pytest.mark.benchmark(group='listing')
+def test_benchmark_search_listing(benchmark, kodi_main, search_page, directory_items):
+    num_items = benchmark(
+        lambda: kodi_main.show_links(areena.iter_search('ohjelma', 0, PAGE_SIZE)))
+
+    assert num_items > 0
+
+
+def test_listing_memory(kodi_main, season_page, directory_items):
+    """Report the peak memory and garbage collections while listing a page."""
+    gc.collect()
+    collections_before = [x['collections'] for x in gc.get_stats()]
+    tracemalloc.start()
+    try:
+        kodi_main.show_links(areena.iter_season_playlist(SEASON_URL, 0, PAGE_SIZE))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    collections = [
+        after['collections'] - before
+        for before, after in zip(collections_before, gc.get_stats())
+    ]
+
+    print(f'Listing {PAGE_SIZE} episodes: peak memory {peak / 1024:.0f} KiB, '
+          f'GC collections by generation {collections}')
+
+    links = list(areena.iter_season_playlist(SEASON_URL, 0, PAGE_SIZE))
+    assert not any(hasattr(x, '__dict__') for x in links if isinstance(x, areena.StreamLink))
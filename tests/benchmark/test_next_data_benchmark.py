@@ -0,0 +1,27 @@
+import html5lib
+import pytest
+from resources.lib.playlist import _parse_next_data, _scan_next_data
+
+pytest.importorskip('pytest_benchmark')
+
+
+def parse_with_html5lib(html):
+    return _parse_next_data(html5lib.parse(html, namespaceHTMLElements=False))
+
+
+def test_scanner_matches_html5lib(series_page):
+    assert _scan_next_data(series_page) == parse_with_html5lib(series_page)
+
+
+@pytest.mark.benchmark(group='next_data')
+def test_benchmark_next_data_scanner(benchmark, series_page):
+    next_data = benchmark(_scan_next_data, series_page)
+
+    assert next_data is not None
+
+
+@pytest.mark.benchmark(group='next_data')
+def test_benchmark_next_data_html5lib(benchmark, series_page):
+    next_data = benchmark(parse_with_html5lib, series_page)
+
+    assert next_data is not None
@@ -0,0 +1,69 @@
+import json
+import pytest
+from resources.lib import areena, playlist
+from resources.lib.extractor import AreenaPreviewApiResponse
+from resources.lib.httpcache import CachedResponse
+
+pytest.importorskip('pytest_benchmark')
+
+
+def serve(monkeypatch, text):
+    """Make httpcache.get return text for any URL."""
+    def fake_get(url, endpoint, *args, **kwargs):
+        return CachedResponse(url, 200, text)
+
+    monkeypatch.setattr(playlist.httpcache, 'get', fake_get)
+
+
+@pytest.mark.benchmark(group='search')
+def test_benchmark_parse_search_results(benchmark, search_response):
+    data = json.loads(search_response)
+
+    links = benchmark(areena._parse_search_results, data)
+
+    assert len(links) > 0
+
+
+@pytest.mark.benchmark(group='search')
+def test_benchmark_parse_content_list(benchmark, content_list_response):
+    data = json.loads(content_list_response)
+
+    links = benchmark(areena._parse_search_results, data, False)
+
+    assert len(links) > 0
+
+
+@pytest.mark.benchmark(group='playlist')
+def test_benchmark_parse_series_episode_data(benchmark, monkeypatch, season_playlist_response):
+    serve(monkeypatch, season_playlist_response)
+
+    episodes, meta = benchmark(
+        playlist._parse_series_episode_data, 'https://areena.api.yle.fi/v1/ui/content/list')
+
+    assert len(episodes) > 0
+
+
+@pytest.mark.benchmark(group='series_page')
+def test_benchmark_parse_playlist_seasons(benchmark, monkeypatch, series_page):
+    serve(monkeypatch, series_page)
+
+    seasons = benchmark(playlist.parse_playlist_seasons, '1-4446513')
+
+    assert seasons is not None
+
+
+@pytest.mark.benchmark(group='preview')
+def test_benchmark_preview_response(benchmark, preview_response):
+    def parse(text):
+        preview = AreenaPreviewApiResponse(json.loads(text))
+        return (
+            preview.manifest_url() or preview.media_url(),
+            preview.media_type(),
+            preview.is_live(),
+            preview.is_expired(),
+            preview.is_pending(),
+        )
+
+    manifest_url, *_ = benchmark(parse, preview_response)
+
+    assert manifest_url is not None
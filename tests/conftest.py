@@ -0,0 +1,84 @@
+import importlib
+import pytest
+import sys
+import textwrap
+import types
+
+# Minimal stand-ins for the Kodi modules. They are available only inside Kodi.
+KODI_STUBS = {
+    'xbmc': '''
+        LOGDEBUG, LOGINFO, LOGWARNING, LOGERROR = 0, 1, 2, 3
+
+        def log(message, level):
+            pass
+
+        def getInfoLabel(label):
+            return ''
+    ''',
+    'xbmcaddon': '''
+        class Addon:
+            def getAddonInfo(self, key):
+                return {'id': 'plugin.video.yleareena.jade', 'path': '.', 'profile': '.'}[key]
+
+            def getLocalizedString(self, string_id):
+                return str(string_id)
+
+            def getSettingBool(self, setting_id):
+                return False
+
+            def getSettingInt(self, setting_id):
+                return 0
+    ''',
+    'xbmcgui': '''
+        NOTIFICATION_INFO = 'info'
+        NOTIFICATION_ERROR = 'error'
+
+        class VideoInfoTag:
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: None
+
+        class ListItem:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: None
+
+            def getVideoInfoTag(self):
+                return VideoInfoTag()
+    ''',
+    'xbmcplugin': '''
+        SORT_METHOD_NONE = 0
+
+        def __getattr__(name):
+            return lambda *args, **kwargs: None
+    ''',
+    'xbmcvfs': '''
+        def translatePath(path):
+            return path
+    ''',
+}
+
+
+@pytest.fixture
+def kodi_stub_sources():
+    """Source code of the Kodi module stand-ins by the module name."""
+    return KODI_STUBS
+
+
+@pytest.fixture
+def kodi_main(monkeypatch):
+    """Import main.py with the Kodi module stand-ins."""
+    for name, source in KODI_STUBS.items():
+        module = types.ModuleType(name)
+        exec(textwrap.dedent(source), module.__dict__)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    monkeypatch.setattr(sys, 'argv', ['plugin://plugin.video.yleareena.jade/', '1', ''])
+    for name in ['main', 'resources.lib.kodi']:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    yield importlib.import_module('main')
+
+    for name in ['main', 'resources.lib.kodi']:
+        sys.modules.pop(name, None)
@@ -0,0 +1,209 @@
+import pytest
+import requests
+from resources.lib import areena, searchindex
+from resources.lib.httpcache import CachedResponse
+from resources.lib.playlist import EpisodeMetadata, SeriesSeasons
+import json
+
+
+def card(uri, title):
+    return {
+        'type': 'card',
+        'title': title,
+        'pointer': {'type': 'program', 'uri': uri},
+        'labels': [],
+    }
+
+
+def episode(title):
+    return EpisodeMetadata(f'https://areena.yle.fi/{title}', title, None, None, None, None, None)
+
+
+def content_list(cards, offset=0, limit=10, count=None):
+    return {
+        'data': cards,
+        'meta': {
+            'offset': offset,
+            'limit': limit,
+            'count': len(cards) if count is None else count,
+        },
+    }
+
+
+def fake_live_lists(monkeypatch, lists):
+    urls = {
+        source: areena.LIVE_SOURCES[source](0, areena.LIVE_PAGE_SIZE)
+        for source in lists
+    }
+
+    def fake_get(url, endpoint, headers=None):
+        for source, source_url in urls.items():
+            if url == source_url:
+                status_code, data = lists[source]
+                return CachedResponse(url, status_code, json.dumps(data))
+        raise AssertionError(f'Unexpected URL {url}')
+
+    monkeypatch.setattr(areena.httpcache, 'get', fake_get)
+
+
+def test_live_broadcasts_are_merged(monkeypatch):
+    fake_live_lists(monkeypatch, {
+        'only_in_areena': (200, content_list([card('yleareena://items/1-1', 'A')])),
+        'sports': (200, content_list([card('yleareena://items/1-2', 'B')])),
+    })
+
+    links = areena.get_live_broadcasts()
+
+    assert [x.title for x in links] == ['A', 'B']
+
+
+def test_live_broadcasts_deduplicated(monkeypatch):
+    fake_live_lists(monkeypatch, {
+        'only_in_areena': (200, content_list([card('yleareena://items/1-1', 'A')])),
+        'sports': (200, content_list([
+            card('yleareena://items/1-1', 'A'),
+            card('yleareena://items/1-2', 'B'),
+        ])),
+    })
+
+    links = areena.get_live_broadcasts()
+
+    assert [x.homepage for x in links] == ['yleareena://items/1-1', 'yleareena://items/1-2']
+
+
+def test_live_broadcasts_pagination(monkeypatch):
+    fake_live_lists(monkeypatch, {
+        'only_in_areena': (200, content_list([card('yleareena://items/1-1', 'A')])),
+        'sports': (200, content_list([card('yleareena://items/1-2', 'B')], limit=10, count=25)),
+    })
+
+    links = areena.get_live_broadcasts()
+    navigation = [x for x in links if isinstance(x, areena.LiveNavigationLink)]
+
+    assert navigation == [areena.LiveNavigationLink('sports', 10, 10)]
+    assert links[-1] == navigation[0]
+
+
+def test_live_broadcasts_failing_source(monkeypatch):
+    fake_live_lists(monkeypatch, {
+        'only_in_areena': (502, {}),
+        'sports': (200, content_list([card('yleareena://items/1-2', 'B')])),
+    })
+
+    links = areena.get_live_broadcasts()
+
+    assert [x.title for x in links] == ['B']
+
+
+def test_prefetch_next_search_page(monkeypatch):
+    requested = []
+
+    def fake_get(url, endpoint, headers=None, timeout=None):
+        requested.append((url, endpoint, timeout))
+        return CachedResponse(url, 200, '{}')
+
+    monkeypatch.setattr(areena.httpcache, 'get', fake_get)
+    monkeypatch.setattr(areena.httpcache, 'is_enabled', lambda: True)
+
+    links = [
+        areena.StreamLink(homepage='yleareena://items/1-1', title='A'),
+        areena.SearchNavigationLink('uutiset', 30, 30),
+    ]
+    areena.prefetch_next_page(links, timeout=2)
+
+    assert requested == [(areena._search_url('uutiset', 30, 30), 'search', 2)]
+
+
+def test_prefetch_without_cache(monkeypatch):
+    def fake_get(url, endpoint, headers=None, timeout=None):
+        raise AssertionError('Should not download anything')
+
+    monkeypatch.setattr(areena.httpcache, 'get', fake_get)
+    monkeypatch.setattr(areena.httpcache, 'is_enabled', lambda: False)
+
+    areena.prefetch_next_page([areena.SearchNavigationLink('uutiset', 30, 30)], timeout=2)
+
+
+def test_series_all_episodes(monkeypatch):
+    seasons = SeriesSeasons('https://example.com/playlist', [
+        {'title': 'Kausi 2', 'parameters': {'season': 's2'}},
+        {'title': 'Kausi 1', 'parameters': {'season': 's1'}},
+    ])
+    monkeypatch.setattr(areena, 'series_seasons', lambda series_id: seasons)
+
+    def fake_download(season_urls):
+        return [
+            ([episode(f'{url[-2:]}-{i}') for i in range(2)], [0] if url.endswith('s2') else [])
+            for url in season_urls
+        ]
+
+    monkeypatch.setattr(areena, 'download_full_playlists', fake_download)
+
+    links, incomplete_seasons = areena.series_all_episodes('1-123')
+
+    assert [(x.season, x.title) for x in links] == [
+        (1, 's1-0'), (1, 's1-1'), (2, 's2-0'), (2, 's2-1')
+    ]
+    assert incomplete_seasons == [2]
+
+
+@pytest.fixture
+def local_index(tmp_path):
+    searchindex.configure(str(tmp_path / 'cache.sqlite'))
+    yield
+    searchindex.configure(None)
+
+
+def fake_search(monkeypatch, cards):
+    def fake_get(url, endpoint, headers=None, timeout=None):
+        return CachedResponse(url, 200, json.dumps(content_list(cards)))
+
+    monkeypatch.setattr(areena.httpcache, 'get', fake_get)
+
+
+def test_search_results_are_indexed(monkeypatch, local_index):
+    fake_search(monkeypatch, [card('yleareena://items/1-1', 'Pasila')])
+    areena.search('pasila')
+
+    links = areena.search_local('päs', 10)
+
+    assert links == [areena.StreamLink(homepage='yleareena://items/1-1', title='Pasila',
+                                       description='Pasila')]
+
+
+def test_live_broadcasts_are_not_indexed(monkeypatch, local_index):
+    fake_live_lists(monkeypatch, {
+        'only_in_areena': (200, content_list([card('yleareena://items/1-1', 'Pasila live')])),
+    })
+    areena.get_live_broadcasts(['only_in_areena'])
+
+    assert areena.search_local('pasila', 10) == []
+
+
+def test_search_with_local_matches_first(monkeypatch, local_index):
+    fake_search(monkeypatch, [card('yleareena://items/1-1', 'Pasila')])
+    areena.search('pasila')
+    fake_search(monkeypatch, [
+        card('yleareena://items/1-2', 'Pasila 2'),
+        card('yleareena://items/1-1', 'Pasila'),
+    ])
+
+    links = list(areena.iter_search_with_local('pasila'))
+
+    assert [x.homepage for x in links] == ['yleareena://items/1-1', 'yleareena://items/1-2']
+
+
+def test_search_offline_shows_local_matches(monkeypatch, local_index):
+    fake_search(monkeypatch, [card('yleareena://items/1-1', 'Pasila')])
+    areena.search('pasila')
+
+    def failing_get(url, endpoint, headers=None, timeout=None):
+        raise requests.ConnectionError('offline')
+
+    monkeypatch.setattr(areena.httpcache, 'get', failing_get)
+
+    links = list(areena.iter_search_with_local('pasila'))
+
+    assert [x.homepage for x in links] == ['yleareena://items/1-1']
+    with pytest.raises(requests.ConnectionError):
+        list(areena.iter_search_with_local('uutiset'))
@@ -0,0 +1,49 @@
+import pytest
+from resources.lib import artwork
+
+
+@pytest.fixture(autouse=True)
+def reset_screen_width():
+    yield
+    artwork.set_screen_width(artwork.REFERENCE_SCREEN_WIDTH)
+
+
+def test_image_width_full_hd():
+    artwork.set_screen_width(1920)
+
+    assert artwork.image_width(artwork.THUMB) == 480
+    assert artwork.image_width(artwork.FANART) == 1920
+
+
+def test_image_width_scales_with_screen():
+    artwork.set_screen_width(3840)
+    assert artwork.image_width(artwork.THUMB) == 960
+    assert artwork.image_width(artwork.FANART) == 3840
+
+    artwork.set_screen_width(1280)
+    assert artwork.image_width(artwork.THUMB) == 320
+    assert artwork.image_width(artwork.FANART) == 1280
+
+
+def test_image_width_limits():
+    artwork.set_screen_width(100)
+    assert artwork.image_width(artwork.THUMB) == artwork.MIN_WIDTH
+
+    artwork.set_screen_width(7680)
+    assert artwork.image_width(artwork.FANART) == artwork.MAX_WIDTH
+
+
+def test_invalid_screen_width():
+    artwork.set_screen_width(0)
+
+    assert artwork.image_width(artwork.FANART) == 1920
+
+
+def test_image_url():
+    artwork.set_screen_width(1920)
+
+    url = artwork.image_url('13-1-123', '1624522786', artwork.THUMB)
+
+    assert url == ('https://images.cdn.yle.fi/image/upload/'
+                   'w_480,dpr_1.0,fl_lossy,f_auto,q_auto,d_yle-elava-arkisto.jpg/'
+                   'v1624522786/13-1-123.jpg')
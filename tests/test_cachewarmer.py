@@ -0,0 +1,82 @@
+import requests
+from resources.lib import cachewarmer, httpclient
+from resources.lib.playlist import SeriesSeasons
+
+
+class FakeNetwork:
+    """Record the warming calls and pretend that each one downloads bytes_per_call."""
+    def __init__(self, monkeypatch, bytes_per_call=100):
+        self.calls = []
+        self.bytes_per_call = bytes_per_call
+        self.bytes = 0
+
+        monkeypatch.setattr(httpclient, 'bytes_received', lambda: self.bytes)
+        monkeypatch.setattr(cachewarmer.areena, 'get_live_broadcasts',
+                            lambda: self.call('live'))
+        monkeypatch.setattr(cachewarmer.areena, 'search',
+                            lambda keyword: self.call(f'search {keyword}'))
+        monkeypatch.setattr(cachewarmer, 'series_seasons', lambda series_id: SeriesSeasons(
+            f'https://example.com/{series_id}', [{'title': 'Kausi 1'}, {'title': 'Kausi 2'}]))
+        monkeypatch.setattr(cachewarmer, 'download_playlist',
+                            lambda url, offset, page_size, timeout: self.call(f'playlist {url}'))
+
+    def call(self, name):
+        self.calls.append(name)
+        self.bytes += self.bytes_per_call
+
+
+def test_warm_caches(monkeypatch):
+    network = FakeNetwork(monkeypatch)
+
+    used = cachewarmer.warm_caches(['uutiset', 'pasila'], ['1-123'], max_bytes=10000)
+
+    assert network.calls == [
+        'live',
+        'search uutiset',
+        'search pasila',
+        'playlist https://example.com/1-123',
+        'playlist https://example.com/1-123',
+    ]
+    assert used == 500
+
+
+def test_warm_caches_bandwidth_limit(monkeypatch):
+    network = FakeNetwork(monkeypatch, bytes_per_call=1000)
+
+    used = cachewarmer.warm_caches(['uutiset', 'pasila'], ['1-123'], max_bytes=2500)
+
+    assert network.calls == ['live', 'search uutiset', 'search pasila']
+    assert used == 3000
+
+
+def test_warm_caches_bandwidth_limit_within_a_series(monkeypatch):
+    network = FakeNetwork(monkeypatch, bytes_per_call=1000)
+
+    used = cachewarmer.warm_caches([], ['1-123'], max_bytes=1500)
+
+    assert network.calls == ['live', 'playlist https://example.com/1-123']
+    assert used == 2000
+
+
+def test_warm_caches_interrupted(monkeypatch):
+    network = FakeNetwork(monkeypatch)
+    playing = iter([False, False, False, False, True])
+
+    cachewarmer.warm_caches(['uutiset'], ['1-123'], max_bytes=10000,
+                            should_continue=lambda: not next(playing))
+
+    # Playback started between the seasons of the series
+    assert network.calls == ['live', 'search uutiset', 'playlist https://example.com/1-123']
+
+
+def test_warm_caches_continues_after_error(monkeypatch):
+    network = FakeNetwork(monkeypatch)
+
+    def failing_search(keyword):
+        raise requests.ConnectionError('Network is down')
+
+    monkeypatch.setattr(cachewarmer.areena, 'search', failing_search)
+
+    cachewarmer.warm_caches(['uutiset'], ['1-123'], max_bytes=10000)
+
+    assert network.calls[-1] == 'playlist https://example.com/1-123'
@@ -0,0 +1,69 @@
+import pytest
+import time
+from resources.lib import circuitbreaker
+
+
+@pytest.fixture(autouse=True)
+def reset_breaker():
+    circuitbreaker.configure(None)
+    yield
+    circuitbreaker.configure(None)
+
+
+def open_circuit(host):
+    for _ in range(circuitbreaker.FAILURE_THRESHOLD):
+        circuitbreaker.record_failure(host)
+
+
+def test_opens_after_consecutive_failures():
+    for _ in range(circuitbreaker.FAILURE_THRESHOLD - 1):
+        circuitbreaker.record_failure('example.com')
+    assert circuitbreaker.allow_request('example.com')
+
+    circuitbreaker.record_failure('example.com')
+    assert not circuitbreaker.allow_request('example.com')
+    assert circuitbreaker.allow_request('other.example.com')
+
+
+def test_success_resets_failures():
+    for _ in range(circuitbreaker.FAILURE_THRESHOLD - 1):
+        circuitbreaker.record_failure('example.com')
+    circuitbreaker.record_success('example.com')
+    circuitbreaker.record_failure('example.com')
+
+    assert circuitbreaker.allow_request('example.com')
+
+
+def test_trial_request_after_open_period(monkeypatch):
+    open_circuit('example.com')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + circuitbreaker.OPEN_SECONDS + 1)
+
+    # Only one trial request is let through
+    assert circuitbreaker.allow_request('example.com')
+    assert not circuitbreaker.allow_request('example.com')
+
+    circuitbreaker.record_success('example.com')
+    assert circuitbreaker.allow_request('example.com')
+
+
+def test_failed_trial_keeps_circuit_open(monkeypatch):
+    open_circuit('example.com')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + circuitbreaker.OPEN_SECONDS + 1)
+
+    assert circuitbreaker.allow_request('example.com')
+    circuitbreaker.record_failure('example.com')
+
+    assert not circuitbreaker.allow_request('example.com')
+
+
+def test_state_is_persisted(tmp_path):
+    filename = str(tmp_path / 'cache.sqlite')
+    circuitbreaker.configure(filename)
+    open_circuit('example.com')
+
+    # A new invocation of the plugin
+    circuitbreaker.configure(filename)
+
+    assert not circuitbreaker.allow_request('example.com')
@@ -0,0 +1,109 @@
+import pytest
+import requests
+import threading
+from datetime import date, datetime, timedelta, timezone
+from resources.lib import circuitbreaker, endpoints, epg, httpcache, httpclient
+from tools.fakeserver import FakeServerConfig, make_server
+from tools.synthetic import synthetic_schedule
+
+
+def program(title, start, end):
+    return epg.Program(title, start, end)
+
+
+def test_now_and_next():
+    schedule = epg.ChannelSchedule([
+        program('C', 200, 300),
+        program('A', 0, 100),
+        program('B', 100, 200),
+    ], valid_until=100)
+
+    assert schedule.now_and_next(50) == (program('A', 0, 100), program('B', 100, 200))
+    assert schedule.now_and_next(100) == (program('B', 100, 200), program('C', 200, 300))
+    assert schedule.now_and_next(299) == (program('C', 200, 300), None)
+    assert schedule.now_and_next(-10) == (None, program('A', 0, 100))
+    assert schedule.now_and_next(300) == (None, None)
+
+
+def test_gap_in_schedule():
+    schedule = epg.ChannelSchedule([program('A', 0, 100), program('B', 150, 200)], 100)
+
+    assert schedule.now_and_next(120) == (None, program('B', 150, 200))
+
+
+def test_parse_schedule():
+    programs = epg.parse_schedule(synthetic_schedule(date(2024, 5, 14), program_minutes=60))
+
+    assert len(programs) == 24
+    assert programs[0].title == 'Ohjelma 00.00'
+    assert all(x.end - x.start == 3600 for x in programs)
+    assert all(a.end == b.start for a, b in zip(programs, programs[1:]))
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_finnish_timezone():
+    # Summer time starts on 2024-03-31 and ends on 2024-10-27 at 01:00 UTC
+    assert epg.finnish_timezone(utc(2024, 3, 31, 0, 59)).utcoffset(None) == timedelta(hours=2)
+    assert epg.finnish_timezone(utc(2024, 3, 31, 1, 0)).utcoffset(None) == timedelta(hours=3)
+    assert epg.finnish_timezone(utc(2024, 10, 27, 0, 59)).utcoffset(None) == timedelta(hours=3)
+    assert epg.finnish_timezone(utc(2024, 10, 27, 1, 0)).utcoffset(None) == timedelta(hours=2)
+
+
+def test_schedule_day_is_the_day_in_finland(monkeypatch):
+    # 00:30 on May 15th in Finland
+    now = utc(2024, 5, 14, 21, 30)
+    monkeypatch.setattr(epg.time, 'time', lambda: now)
+    requested = []
+
+    def fake_get(url, endpoint, timeout=None):
+        requested.append(url)
+        raise requests.ConnectionError('offline')
+
+    monkeypatch.setattr(httpcache, 'get', fake_get)
+    epg._download_channel_schedule(epg.TV1)
+
+    assert '/2024-05-15.json' in requested[0]
+
+
+def test_no_stored_schedules(tmp_path):
+    filename = str(tmp_path / 'cache.sqlite')
+
+    assert epg.load_schedules(filename) == {}
+    assert epg.needs_update(filename) == epg.CHANNELS
+    assert not (tmp_path / 'cache.sqlite').exists()
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = make_server(FakeServerConfig(seed=1), quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(endpoints, '_base_urls', dict(endpoints._base_urls))
+    endpoints.set_base_url(endpoints.AREENA_API, f'http://127.0.0.1:{server.server_address[1]}')
+    monkeypatch.setattr(httpclient, 'RETRY_BASE_DELAY_SECONDS', 0)
+    circuitbreaker.configure(None)
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_update_schedules(fake_server, tmp_path):
+    filename = str(tmp_path / 'cache.sqlite')
+
+    assert epg.update_schedules(filename) == epg.CHANNELS
+    assert epg.needs_update(filename) == []
+    # Nothing is downloaded until the current program ends
+    assert epg.update_schedules(filename) == []
+
+    schedules = epg.load_schedules(filename)
+    for channel in epg.CHANNELS:
+        current, following = schedules[channel].now_and_next(schedules[channel].valid_until - 1)
+        assert current is not None
+        assert following is not None
+        assert current.end == schedules[channel].valid_until
@@ -1,4 +1,8 @@
-from resources.lib.extractor import iso_duration_as_seconds
+import json
+import time
+from resources.lib.extractor import iso_duration_as_seconds, _preview_ttl, _token_expiration, \
+    MANIFEST_TOKEN_MARGIN, PREVIEW_TTL_LIVE, PREVIEW_TTL_NOT_FOUND, PREVIEW_TTL_ONDEMAND
+from resources.lib.httpcache import CachedResponse
 
 
 def test_iso_duration_as_seconds():
@@ -12,3 +16,51 @@ def test_iso_duration_invalid_input():
     assert iso_duration_as_seconds('PT123') is None
     assert iso_duration_as_seconds('PTS') is None
     assert iso_duration_as_seconds('abc') is None
+
+
+def preview_response(data, status_code=200):
+    return CachedResponse('https://player.api.yle.fi/v1/preview/1-1.json', status_code,
+                          json.dumps(data))
+
+
+def test_preview_ttl_ondemand():
+    ondemand = {'manifest_url': 'https://a/b.m3u8'}
+    response = preview_response({'data': {'ongoing_ondemand': ondemand}})
+
+    assert _preview_ttl(response) == PREVIEW_TTL_ONDEMAND
+
+
+def test_preview_ttl_live():
+    channel = preview_response({'data': {'ongoing_channel': {'manifest_url': 'https://a/b.m3u8'}}})
+    event = preview_response({'data': {'ongoing_event': {'manifest_url': 'https://a/b.m3u8'}}})
+
+    assert _preview_ttl(channel) == PREVIEW_TTL_LIVE
+    assert _preview_ttl(event) == PREVIEW_TTL_LIVE
+
+
+def test_preview_ttl_negative():
+    assert _preview_ttl(preview_response({}, status_code=404)) == PREVIEW_TTL_NOT_FOUND
+    assert _preview_ttl(preview_response({'data': {'gone': {}}})) == PREVIEW_TTL_NOT_FOUND
+    assert _preview_ttl(preview_response({}, status_code=500)) == 0
+
+
+def test_preview_ttl_signed_manifest_url():
+    expires = int(time.time()) + MANIFEST_TOKEN_MARGIN + 600
+    url = f'https://a/b.m3u8?hdnts=st=1~exp={expires}~acl=/*~hmac=abc'
+    response = preview_response({'data': {'ongoing_ondemand': {'manifest_url': url}}})
+
+    assert 590 < _preview_ttl(response) <= 600
+
+
+def test_preview_ttl_token_starting_with_exp():
+    expires = int(time.time()) + MANIFEST_TOKEN_MARGIN + 600
+    url = f'https://a/b.m3u8?hdnts=exp={expires}~acl=/*~hmac=abc'
+    response = preview_response({'data': {'ongoing_ondemand': {'manifest_url': url}}})
+
+    assert 590 < _preview_ttl(response) <= 600
+
+
+def test_token_expiration_url_encoded_separators():
+    url = 'https://a/b.m3u8?hdnts=st=1%7Eexp=1700000000%7Eacl=/*%7Ehmac=abc'
+
+    assert _token_expiration(url) == 1700000000
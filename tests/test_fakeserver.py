@@ -0,0 +1,84 @@
+import pytest
+import requests
+import threading
+from resources.lib import areena, circuitbreaker, endpoints, extractor, httpclient
+from tools.fakeserver import FakeServerConfig, make_server
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    config = FakeServerConfig(count=45, seasons=3, seed=1)
+    server = make_server(config, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    monkeypatch.setattr(endpoints, '_base_urls', dict(endpoints._base_urls))
+    monkeypatch.setattr(httpclient, 'RETRY_BASE_DELAY_SECONDS', 0)
+    circuitbreaker.configure(None)
+    for service in endpoints.DEFAULT_BASE_URLS:
+        endpoints.set_base_url(service, base_url)
+
+    yield config
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_search(fake_server):
+    links = areena.search('uutiset', offset=30, page_size=30)
+    streams = [x for x in links if isinstance(x, areena.StreamLink)]
+    navigation = [x for x in links if isinstance(x, areena.SearchNavigationLink)]
+
+    assert len(streams) > 0
+    assert navigation == []
+
+
+def test_series_with_seasons(fake_server):
+    links = areena.playlist('1-4446513')
+    seasons = [x for x in links if isinstance(x, areena.SeriesNavigationLink)]
+    assert len(seasons) == 3
+    assert isinstance(links[-1], areena.SeriesAllSeasonsLink)
+
+    episodes = areena.season_playlist(seasons[0].season_playlist_url, page_size=20)
+    streams = [x for x in episodes if isinstance(x, areena.StreamLink)]
+    navigation = [x for x in episodes if isinstance(x, areena.SeriesNavigationLink)]
+
+    assert len(streams) == 20
+    assert navigation[0].offset == 20
+
+
+def test_series_all_episodes(fake_server):
+    links, incomplete_seasons = areena.series_all_episodes('1-4446513')
+
+    count = fake_server.count
+    assert len(links) == 3 * count
+    assert [x.season for x in links[::count]] == [1, 2, 3]
+    assert incomplete_seasons == []
+
+
+def test_live_broadcasts(fake_server):
+    links = areena.get_live_broadcasts()
+
+    assert any(isinstance(x, areena.StreamLink) for x in links)
+    assert any(isinstance(x, areena.LiveNavigationLink) for x in links)
+
+
+def test_preview(fake_server):
+    manifest_url = extractor.extract_media_url('yleareena://items/1-787136')
+
+    assert manifest_url is not None
+    assert manifest_url.url.endswith('/hls/vod/1-787136/index.m3u8')
+
+
+def test_injected_errors(fake_server):
+    fake_server.error_rate = 1.0
+    fake_server.error_status = 502
+
+    for _ in range(circuitbreaker.FAILURE_THRESHOLD):
+        with pytest.raises(requests.HTTPError) as exc_info:
+            areena.search('uutiset')
+        assert exc_info.value.response.status_code == 502
+
+    with pytest.raises(httpclient.CircuitOpenError):
+        areena.search('uutiset')
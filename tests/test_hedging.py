@@ -0,0 +1,96 @@
+import pytest
+import threading
+import time
+from resources.lib import hedging, httpclient
+
+
+class FakeResponse:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def hedging_enabled(tmp_path):
+    hedging.configure(str(tmp_path / 'cache.sqlite'))
+    yield str(tmp_path / 'cache.sqlite')
+    hedging.configure(None)
+
+
+def record_history(endpoint, seconds):
+    for _ in range(hedging.MIN_SAMPLES):
+        hedging.record_latency(endpoint, seconds)
+
+
+def test_hedge_delay_is_p95(hedging_enabled):
+    assert hedging.hedge_delay('search') is None
+
+    for i in range(1, 21):
+        hedging.record_latency('search', i / 10)
+
+    assert hedging.hedge_delay('search') == pytest.approx(1.9)
+
+
+def test_history_is_persisted(hedging_enabled):
+    record_history('search', 0.3)
+
+    hedging.configure(hedging_enabled)
+
+    assert hedging.hedge_delay('search') == pytest.approx(0.3)
+
+
+def test_history_is_bounded(hedging_enabled):
+    for _ in range(hedging.MAX_SAMPLES + 10):
+        hedging.record_latency('search', 0.2)
+
+    assert len(hedging._load('search')) == hedging.MAX_SAMPLES
+
+
+def test_slow_request_is_hedged(hedging_enabled, monkeypatch):
+    record_history('search', 0.1)
+    responses = []
+    lock = threading.Lock()
+
+    def fake_get(url, **kwargs):
+        with lock:
+            response = FakeResponse(f'attempt {len(responses) + 1}')
+            responses.append(response)
+        if response.name == 'attempt 1':
+            time.sleep(1)
+        return response
+
+    monkeypatch.setattr(httpclient, 'get', fake_get)
+
+    start = time.perf_counter()
+    r = hedging.get('https://example.com/search', 'search', timeout=5)
+
+    assert time.perf_counter() - start < 0.9
+    assert r.name == 'attempt 2'
+    assert len(responses) == 2
+
+
+def test_fast_request_is_not_hedged(hedging_enabled, monkeypatch):
+    record_history('search', 0.5)
+    requested = []
+
+    def fake_get(url, **kwargs):
+        requested.append(url)
+        return FakeResponse('only')
+
+    monkeypatch.setattr(httpclient, 'get', fake_get)
+
+    assert hedging.get('https://example.com/search', 'search').name == 'only'
+    assert len(requested) == 1
+
+
+def test_other_endpoints_are_not_hedged(hedging_enabled, monkeypatch):
+    record_history('playlist', 0.01)
+    monkeypatch.setattr(httpclient, 'get', lambda url, **kwargs: FakeResponse('only'))
+
+    hedging.get('https://example.com/playlist', 'playlist')
+
+    assert hedging.hedge_delay('playlist') == pytest.approx(hedging.MIN_HEDGE_DELAY_SECONDS)
+    assert len(hedging._load('playlist')) == hedging.MIN_SAMPLES
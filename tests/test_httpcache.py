@@ -0,0 +1,236 @@
+from resources.lib import httpcache
+from resources.lib import httpclient
+from tempfile import NamedTemporaryFile
+
+
+class FakeResponse:
+    def __init__(self, url, status_code, text='', headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+
+class FakeServer:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, headers or {}))
+        return self.responses.pop(0)
+
+
+def test_cache_hit(monkeypatch):
+    url = 'https://example.com/search'
+    server = FakeServer([FakeResponse(url, 200, '{"data": [1]}')])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        r1 = cache.get(url, 'search')
+        r2 = cache.get(url, 'search')
+
+    assert r1.json() == {'data': [1]}
+    assert r2.json() == {'data': [1]}
+    assert len(server.requests) == 1
+
+
+def test_uncached_endpoint(monkeypatch):
+    url = 'https://example.com/other'
+    server = FakeServer([FakeResponse(url, 200, 'a'), FakeResponse(url, 200, 'b')])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        r1 = cache.get(url, 'unknown')
+        r2 = cache.get(url, 'unknown')
+
+    assert (r1.text, r2.text) == ('a', 'b')
+
+
+def test_errors_are_not_cached(monkeypatch):
+    url = 'https://example.com/search'
+    server = FakeServer([FakeResponse(url, 502), FakeResponse(url, 200, '{}')])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        r1 = cache.get(url, 'search')
+        r2 = cache.get(url, 'search')
+
+    assert r1.status_code == 502
+    assert r2.status_code == 200
+
+
+def test_revalidate_stale_response(monkeypatch):
+    url = 'https://example.com/playlist'
+    server = FakeServer([
+        FakeResponse(url, 200, '{"v": 1}', headers={'ETag': '"abc"'}),
+        FakeResponse(url, 304),
+    ])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+    monkeypatch.setitem(httpcache.TTL_SECONDS, 'playlist', 1e-9)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        cache.get(url, 'playlist')
+        r = cache.get(url, 'playlist')
+
+    assert r.status_code == 200
+    assert r.json() == {'v': 1}
+    assert server.requests[1][1] == {'If-None-Match': '"abc"'}
+
+
+def test_response_specific_ttl(monkeypatch):
+    url = 'https://example.com/preview'
+    server = FakeServer([FakeResponse(url, 404), FakeResponse(url, 200, '{}')])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+    ttls = {404: 60, 200: 0}
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        r1 = cache.get(url, 'preview', ttl=lambda r: ttls[r.status_code])
+        r2 = cache.get(url, 'preview', ttl=lambda r: ttls[r.status_code])
+
+    assert r1.status_code == 404
+    assert r2.status_code == 404
+    assert len(server.requests) == 1
+
+
+def test_stale_while_revalidate(monkeypatch):
+    url = 'https://example.com/search'
+    server = FakeServer([
+        FakeResponse(url, 200, '{"v": 1}'),
+        FakeResponse(url, 200, '{"v": 2}'),
+    ])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+    monkeypatch.setitem(httpcache.TTL_SECONDS, 'search', 1e-9)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name, stale_while_revalidate=True)
+        cache.get(url, 'search')
+        stale = cache.get(url, 'search')
+        requests_before_revalidation = len(server.requests)
+        changed = cache.revalidate()
+        unchanged = cache.revalidate()
+        monkeypatch.setitem(httpcache.TTL_SECONDS, 'search', 600)
+        fresh = cache.get(url, 'search')
+
+    assert stale.json() == {'v': 1}
+    assert requests_before_revalidation == 1
+    assert changed == [url]
+    assert unchanged == []
+    assert fresh.json() == {'v': 2}
+
+
+def test_stale_response_revalidated_to_not_found(monkeypatch):
+    url = 'https://example.com/playlist'
+    server = FakeServer([
+        FakeResponse(url, 200, '{"v": 1}'),
+        FakeResponse(url, 404),
+        FakeResponse(url, 404),
+    ])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+    monkeypatch.setitem(httpcache.TTL_SECONDS, 'playlist', 1e-9)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name, stale_while_revalidate=True)
+        cache.get(url, 'playlist')
+        cache.get(url, 'playlist')
+        changed = cache.revalidate()
+        # The refreshed listing must not get the stale copy again
+        refreshed = cache.get(url, 'playlist')
+        changed_again = cache.revalidate()
+
+    assert changed == [url]
+    assert refreshed.status_code == 404
+    assert changed_again == []
+
+
+def test_stale_while_revalidate_not_modified(monkeypatch):
+    url = 'https://example.com/playlist'
+    server = FakeServer([
+        FakeResponse(url, 200, '{"v": 1}', headers={'ETag': '"abc"'}),
+        FakeResponse(url, 304),
+    ])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+    monkeypatch.setitem(httpcache.TTL_SECONDS, 'playlist', 1e-9)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name, stale_while_revalidate=True)
+        cache.get(url, 'playlist')
+        cache.get(url, 'playlist')
+        changed = cache.revalidate()
+
+    assert changed == []
+    assert len(server.requests) == 2
+
+
+def test_stale_response_not_used_for_playback(monkeypatch):
+    url = 'https://example.com/preview'
+    server = FakeServer([FakeResponse(url, 200, '{"v": 1}'), FakeResponse(url, 200, '{"v": 2}')])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name, stale_while_revalidate=True)
+        cache.get(url, 'preview', ttl=lambda r: 1e-9)
+        r = cache.get(url, 'preview', ttl=lambda r: 1e-9)
+
+    assert r.json() == {'v': 2}
+
+
+def test_stale_response_used_on_error(monkeypatch):
+    url = 'https://example.com/search'
+    server = FakeServer([FakeResponse(url, 200, '{"v": 1}'), FakeResponse(url, 503)])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+    monkeypatch.setitem(httpcache.TTL_SECONDS, 'search', 1e-9)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        cache.get(url, 'search')
+        r = cache.get(url, 'search')
+
+    assert r.status_code == 200
+    assert r.json() == {'v': 1}
+    assert len(server.requests) == 2
+
+
+def test_stale_response_used_when_host_is_down(monkeypatch):
+    url = 'https://example.com/search'
+    responses = [FakeResponse(url, 200, '{"v": 1}')]
+
+    def fake_get(url, **kwargs):
+        if responses:
+            return responses.pop(0)
+        raise httpclient.CircuitOpenError('example.com is not responding')
+
+    monkeypatch.setattr(httpclient, 'get', fake_get)
+    monkeypatch.setitem(httpcache.TTL_SECONDS, 'search', 1e-9)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        cache.get(url, 'search')
+        r = cache.get(url, 'search')
+
+    assert r.json() == {'v': 1}
+
+
+def test_is_cached(monkeypatch):
+    url = 'https://example.com/search'
+    server = FakeServer([FakeResponse(url, 200, '{}')])
+    monkeypatch.setattr(httpclient, 'get', server.get)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        cache = httpcache.ResponseCache(tmp.name)
+        assert not cache.is_cached(url, 'search')
+
+        cache.get(url, 'search')
+        assert cache.is_cached(url, 'search')
+
+        monkeypatch.setitem(httpcache.TTL_SECONDS, 'search', 1e-9)
+        assert not cache.is_cached(url, 'search')
+
+        cache.stale_while_revalidate = True
+        assert cache.is_cached(url, 'search')
@@ -0,0 +1,181 @@
+import pytest
+import requests
+import time
+from resources.lib import circuitbreaker, httpclient
+
+
+class FakeRaw:
+    def __init__(self):
+        self.position = 0
+
+    def tell(self):
+        return self.position
+
+
+class FakeStreamedResponse:
+    def __init__(self, body, chunk_size, content_length=True):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.url = 'https://example.com/'
+        self.encoding = 'utf-8'
+        self.headers = {'Content-Length': str(len(body))} if content_length else {}
+        self.raw = FakeRaw()
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), self.chunk_size):
+            chunk = self.body[i:i + self.chunk_size]
+            self.raw.position += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_read_until_stops_early():
+    body = ('<p>ä</p>' + '<end>' + 'x' * 1000).encode('utf-8')
+    response = FakeStreamedResponse(body, chunk_size=4)
+
+    text, skipped = httpclient.read_until(response, lambda t: '<end>' in t)
+
+    assert text.startswith('<p>ä</p><end>')
+    assert len(text) < 20
+    assert skipped == len(body) - response.raw.position
+    assert skipped > 990
+    assert response.closed
+
+
+def test_read_until_reads_everything_if_not_complete():
+    body = 'abc' * 100
+    response = FakeStreamedResponse(body.encode('utf-8'), chunk_size=7)
+
+    text, skipped = httpclient.read_until(response, lambda t: False)
+
+    assert text == body
+    assert skipped == 0
+
+
+def test_read_until_unknown_length():
+    response = FakeStreamedResponse(b'abc<end>def', chunk_size=8, content_length=False)
+
+    text, skipped = httpclient.read_until(response, lambda t: '<end>' in t)
+
+    assert text == 'abc<end>'
+    assert skipped is None
+
+
+def test_read_until_counts_received_bytes():
+    body = ('<end>' + 'x' * 1000).encode('utf-8')
+    response = FakeStreamedResponse(body, chunk_size=10)
+    before = httpclient.bytes_received()
+
+    httpclient.read_until(response, lambda t: '<end>' in t)
+
+    assert httpclient.bytes_received() - before == 10
+
+
+def test_wire_bytes_is_the_size_before_decoding():
+    # A gzipped body that decodes to 1000 bytes
+    response = FakeStreamedResponse(b'x' * 1000, chunk_size=1000)
+    response.raw.position = 120
+
+    assert httpclient.wire_bytes(response) == 120
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.content = b''
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    def install(outcomes):
+        session = FakeSession(outcomes)
+        monkeypatch.setattr(httpclient, 'session', lambda: session)
+        return session
+
+    monkeypatch.setattr(httpclient, 'RETRY_BASE_DELAY_SECONDS', 0)
+    circuitbreaker.configure(None)
+    yield install
+    circuitbreaker.configure(None)
+
+
+def test_get_uses_default_timeout(fake_session):
+    session = fake_session([200])
+
+    httpclient.get('https://example.com/a')
+
+    assert session.requests[0][1]['timeout'] == httpclient.DEFAULT_TIMEOUT
+
+
+def test_get_retries_errors(fake_session):
+    session = fake_session([requests.ConnectionError(), 503, 200])
+
+    r = httpclient.get('https://example.com/a', retries=2)
+
+    assert r.status_code == 200
+    assert len(session.requests) == 3
+
+
+def test_get_gives_up_after_retries(fake_session):
+    session = fake_session([503, 503, 503])
+
+    r = httpclient.get('https://example.com/a', retries=1)
+
+    assert r.status_code == 503
+    assert len(session.requests) == 2
+
+
+def test_get_does_not_retry_client_errors(fake_session):
+    session = fake_session([404])
+
+    r = httpclient.get('https://example.com/a', retries=2)
+
+    assert r.status_code == 404
+    assert len(session.requests) == 1
+
+
+def test_get_fails_fast_when_circuit_is_open(fake_session):
+    session = fake_session([requests.Timeout()] * circuitbreaker.FAILURE_THRESHOLD)
+
+    for _ in range(circuitbreaker.FAILURE_THRESHOLD):
+        with pytest.raises(requests.Timeout):
+            httpclient.get('https://example.com/a')
+
+    with pytest.raises(httpclient.CircuitOpenError):
+        httpclient.get('https://example.com/b')
+    assert len(session.requests) == circuitbreaker.FAILURE_THRESHOLD
+
+    # Other hosts are not affected
+    session.outcomes.append(200)
+    assert httpclient.get('https://other.example.com/').status_code == 200
+
+
+def test_get_stops_retrying_at_the_deadline(fake_session, monkeypatch):
+    monkeypatch.setattr(httpclient, 'RETRY_BASE_DELAY_SECONDS', 0.4)
+    session = fake_session([503] * 5)
+
+    start = time.monotonic()
+    r = httpclient.get('https://example.com/a', retries=4, deadline=start + 1.0, timeout=5)
+
+    assert r.status_code == 503
+    assert len(session.requests) < 5
+    assert time.monotonic() - start < 1.0
+    assert all(kwargs['timeout'] <= 1.0 for _, kwargs in session.requests)
@@ -0,0 +1,74 @@
+import os
+import pytest
+import requests
+from resources.lib import httpclient, imagecache
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'HTTP {self.status_code}')
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    directory = tmp_path / 'images'
+    imagecache.configure(str(directory), 1000)
+    yield directory
+    imagecache.configure(None, 0)
+
+
+def test_prefetch_and_local_path(cache_dir, monkeypatch):
+    requested = []
+
+    def fake_get(url, **kwargs):
+        requested.append(url)
+        return FakeResponse(b'image data')
+
+    monkeypatch.setattr(httpclient, 'get', fake_get)
+
+    url = 'https://images.example.com/a.jpg'
+    assert imagecache.art_path(url) == url
+
+    assert imagecache.prefetch([url, url, None], timeout=5) == 1
+    path = imagecache.local_path(url)
+    assert path is not None
+    assert open(path, 'rb').read() == b'image data'
+    assert imagecache.art_path(url) == path
+
+    # Cached images are not downloaded again
+    assert imagecache.prefetch([url], timeout=5) == 0
+    assert requested == [url]
+
+
+def test_prefetch_failure(cache_dir, monkeypatch):
+    monkeypatch.setattr(httpclient, 'get', lambda url, **kwargs: FakeResponse(b'', 404))
+
+    url = 'https://images.example.com/missing.jpg'
+    assert imagecache.prefetch([url], timeout=5) == 0
+    assert imagecache.local_path(url) is None
+    assert os.listdir(cache_dir) == []
+
+
+def test_evict_least_recently_used(tmp_path):
+    for i, name in enumerate(['old', 'middle', 'new']):
+        path = tmp_path / f'{name}.jpg'
+        path.write_bytes(b'x' * 400)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    assert imagecache.evict(str(tmp_path), 1000) == 1
+    assert sorted(os.listdir(tmp_path)) == ['middle.jpg', 'new.jpg']
+
+
+def test_disabled(tmp_path):
+    imagecache.configure(str(tmp_path / 'images'), 0)
+
+    assert not imagecache.is_enabled()
+    assert imagecache.art_path('https://images.example.com/a.jpg') == \
+        'https://images.example.com/a.jpg'
+    assert imagecache.prefetch(['https://images.example.com/a.jpg'], timeout=5) == 0
+    assert not (tmp_path / 'images').exists()
@@ -0,0 +1,179 @@
+import json
+import pytest
+import requests
+from resources.lib import playlist
+from resources.lib.httpcache import CachedResponse
+from resources.lib.playlist import SeriesSeasons, _scan_next_data
+from tempfile import NamedTemporaryFile
+from urllib.parse import parse_qs, urlparse
+
+
+@pytest.fixture
+def seasons_cache():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        playlist.configure_seasons_cache(tmp.name)
+        yield
+        playlist.configure_seasons_cache(None)
+
+
+def test_scan_next_data():
+    html = (
+        '<html><head><script src="app.js"></script></head><body>'
+        '<div id="__next"></div>'
+        '<script id="__NEXT_DATA__" type="application/json">{"props": {"a": 1}}</script>'
+        '<script>var x = 1;</script>'
+        '</body></html>'
+    )
+
+    assert _scan_next_data(html) == {'props': {'a': 1}}
+
+
+def test_scan_next_data_attribute_variations():
+    assert _scan_next_data("<script type='application/json' id='__NEXT_DATA__'>[]</script>") == []
+    assert _scan_next_data('<SCRIPT ID=__NEXT_DATA__>{}</SCRIPT>') is None
+    assert _scan_next_data('<script id=__NEXT_DATA__>{}</script>') == {}
+
+
+def test_scan_next_data_missing():
+    assert _scan_next_data('<html><body><script>{}</script></body></html>') is None
+    assert _scan_next_data('<script id="__NEXT_DATA__X">{}</script>') is None
+
+
+def test_scan_next_data_invalid():
+    assert _scan_next_data('<script id="__NEXT_DATA__">{"a": </script>') is None
+    assert _scan_next_data('<script id="__NEXT_DATA__">{"a": 1}') is None
+
+
+def test_series_seasons_cached(monkeypatch, seasons_cache):
+    calls = []
+
+    def fake_parse(series_id):
+        calls.append(series_id)
+        return SeriesSeasons('https://example.com/playlist', [{'title': 'Kausi 1'}])
+
+    monkeypatch.setattr(playlist, 'parse_playlist_seasons', fake_parse)
+
+    s1 = playlist.series_seasons('1-123')
+    s2 = playlist.series_seasons('1-123')
+
+    assert s1 == s2
+    assert calls == ['1-123']
+
+
+def test_series_seasons_refresh(monkeypatch, seasons_cache):
+    urls = ['https://example.com/v1', 'https://example.com/v2']
+    monkeypatch.setattr(playlist, 'parse_playlist_seasons',
+                        lambda series_id: SeriesSeasons(urls.pop(0), []))
+
+    s1 = playlist.series_seasons('1-123')
+    s2 = playlist.series_seasons('1-123', refresh=True)
+    s3 = playlist.series_seasons('1-123')
+
+    assert s1.base_url == 'https://example.com/v1'
+    assert s2.base_url == 'https://example.com/v2'
+    assert s3 == s2
+
+
+def test_series_seasons_stale_on_failure(monkeypatch, seasons_cache):
+    def failing_parse(series_id):
+        raise requests.ConnectionError('Network is down')
+
+    monkeypatch.setattr(playlist, 'parse_playlist_seasons',
+                        lambda series_id: SeriesSeasons('https://example.com/v1', []))
+    playlist.series_seasons('1-123')
+
+    monkeypatch.setattr(playlist, 'parse_playlist_seasons', failing_parse)
+    seasons = playlist.series_seasons('1-123', refresh=True)
+
+    assert seasons.base_url == 'https://example.com/v1'
+
+
+def fake_season(monkeypatch, count, failing_offsets=()):
+    requested_offsets = []
+
+    def fake_get(url, endpoint, timeout=None):
+        query = parse_qs(urlparse(url).query)
+        offset = int(query['offset'][0])
+        limit = int(query['limit'][0])
+        requested_offsets.append(offset)
+        if offset in failing_offsets:
+            return CachedResponse(url, 502, 'Bad gateway')
+
+        data = {
+            'data': [
+                {
+                    'pointer': {'uri': f'yleareena://items/1-{i}'},
+                    'title': f'Jakso {i}',
+                    'labels': [],
+                }
+                for i in range(offset, min(offset + limit, count))
+            ],
+            'meta': {'offset': offset, 'limit': limit, 'count': count},
+        }
+        return CachedResponse(url, 200, json.dumps(data))
+
+    monkeypatch.setattr(playlist.httpcache, 'get', fake_get)
+    return requested_offsets
+
+
+def test_download_full_playlist(monkeypatch):
+    requested_offsets = fake_season(monkeypatch, count=250)
+
+    episodes, failed_offsets = playlist.download_full_playlist('https://example.com/season')
+
+    assert [ep.title for ep in episodes] == [f'Jakso {i}' for i in range(250)]
+    assert failed_offsets == []
+    assert sorted(requested_offsets) == [0, 100, 200]
+
+
+def test_download_full_playlist_single_page(monkeypatch):
+    requested_offsets = fake_season(monkeypatch, count=20)
+
+    episodes, failed_offsets = playlist.download_full_playlist('https://example.com/season')
+
+    assert len(episodes) == 20
+    assert failed_offsets == []
+    assert requested_offsets == [0]
+
+
+def test_download_full_playlist_partial_failure(monkeypatch):
+    fake_season(monkeypatch, count=350, failing_offsets=[200])
+
+    episodes, failed_offsets = playlist.download_full_playlist('https://example.com/season')
+
+    expected = list(range(200)) + list(range(300, 350))
+    assert [ep.title for ep in episodes] == [f'Jakso {i}' for i in expected]
+    assert failed_offsets == [200]
+
+
+def test_download_full_playlist_first_page_fails(monkeypatch):
+    fake_season(monkeypatch, count=350, failing_offsets=[0])
+
+    episodes, failed_offsets = playlist.download_full_playlist('https://example.com/season')
+
+    assert episodes == []
+    assert failed_offsets == [0]
+
+
+def test_download_full_playlists_reuses_unchanged_seasons(monkeypatch, seasons_cache):
+    requested_offsets = fake_season(monkeypatch, count=250)
+    season_urls = ['https://example.com/season1', 'https://example.com/season2']
+
+    first = playlist.download_full_playlists(season_urls)
+    requested_offsets.clear()
+    second = playlist.download_full_playlists(season_urls)
+
+    assert [len(episodes) for episodes, _ in first] == [250, 250]
+    assert second == first
+    assert requested_offsets == [0, 0]
+
+
+def test_download_full_playlists_failed_season_is_not_cached(monkeypatch, seasons_cache):
+    requested_offsets = fake_season(monkeypatch, count=250, failing_offsets=[100])
+    season_urls = ['https://example.com/season1']
+
+    playlist.download_full_playlists(season_urls)
+    requested_offsets.clear()
+    playlist.download_full_playlists(season_urls)
+
+    assert sorted(requested_offsets) == [0, 100, 200]
@@ -0,0 +1,69 @@
+import pytest
+from resources.lib import searchindex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = searchindex.SearchIndex(str(tmp_path / 'cache.sqlite'))
+    index.add([
+        ('1-1', 'Ääniä menneisyydestä', {'id': 1}),
+        ('1-2', 'Kotikatu', {'id': 2}),
+        ('1-3', 'Strömsö', {'id': 3}),
+        ('1-4', 'Uutiset: Kotimaa', {'id': 4}),
+    ])
+    return index
+
+
+def test_fold():
+    assert searchindex.fold('Ääni Åland Strömsö') == 'aani aland stromso'
+    assert searchindex.fold('Café Bœuf') == 'cafe bœuf'
+    assert searchindex.terms('Uutiset: Kotimaa 12.5.') == ['uutiset', 'kotimaa', '12', '5']
+
+
+def test_diacritics_are_folded(index):
+    assert index.search('aani', 10) == [{'id': 1}]
+    assert index.search('ÄÄNIÄ', 10) == [{'id': 1}]
+    assert index.search('stromso', 10) == [{'id': 3}]
+
+
+def test_prefix_match(index):
+    assert index.search('str', 10) == [{'id': 3}]
+    assert index.search('men', 10) == [{'id': 1}]
+
+
+def test_all_terms_must_match(index):
+    assert index.search('uut koti', 10) == [{'id': 4}]
+    assert index.search('kotikatu uutiset', 10) == []
+
+
+def test_title_prefix_ranked_first(index):
+    assert index.search('koti', 10) == [{'id': 2}, {'id': 4}]
+
+
+def test_update_replaces_terms(index):
+    index.add([('1-2', 'Salatut elämät', {'id': 2})])
+
+    assert index.search('kotikatu', 10) == []
+    assert index.search('salatut', 10) == [{'id': 2}]
+
+
+def test_eviction_removes_terms(tmp_path):
+    index = searchindex.SearchIndex(str(tmp_path / 'cache.sqlite'), max_bytes=1000)
+    index.add((f'1-{i}', f'Ohjelma {i}', {'padding': 'x' * 100}) for i in range(50))
+
+    assert len(index.search('ohjelma', 100)) < 50
+    with index.session(write=False):
+        num_terms = index._execute(f'SELECT COUNT(*) FROM {index._terms_table}').fetchone()[0]
+    assert num_terms <= 2 * len(index.get_all())
+
+
+def test_empty_query(index):
+    assert index.search(' - ', 10) == []
+
+
+def test_newest_matches_first_across_chunks(tmp_path):
+    index = searchindex.SearchIndex(str(tmp_path / 'cache.sqlite'))
+    # Items added later in the same batch count as more recently updated
+    index.add((f'1-{i}', f'Uutiset {i}', {'id': i}) for i in range(1200))
+
+    assert index.search('uutiset', 3) == [{'id': 1199}, {'id': 1198}, {'id': 1197}]
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Upper limit for running main.py to show the root menu, including imports.
+# The limit is generous, because the machine running the tests may be slow.
+# The real protection is that the slow modules are not imported at all.
+ROOT_MENU_BUDGET_SECONDS = 0.5
+
+# Modules that must not be imported when showing the root menu
+SLOW_MODULES = ['requests', 'html5lib', 'resources.lib.areena', 'resources.lib.extractor']
+
+PROFILE_SCRIPT = '''
+import runpy
+import sys
+import time
+
+sys.argv = ['plugin://plugin.video.yleareena.jade/', '1', '']
+sys.stderr.write('MAIN_START\\n')
+sys.stderr.flush()
+start = time.perf_counter()
+runpy.run_path('main.py', run_name='__main__')
+print(f'ELAPSED {{time.perf_counter() - start}}')
+
+for module in {slow_modules!r}:
+    if module in sys.modules:
+        print(f'SLOW_MODULE_IMPORTED {{module}}')
+'''
+
+
+def parse_import_times(stderr):
+    """Parse the output of python -X importtime.
+
+    Returns a list of (module name, self seconds, cumulative seconds).
+    """
+    res = []
+    lines = stderr.splitlines()
+    for line in lines[lines.index('MAIN_START') + 1:]:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+
+        self_us, cumulative_us, name = fields
+        res.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+
+    return res
+
+
+def test_root_menu_cold_start(tmp_path, kodi_stub_sources):
+    for name, source in kodi_stub_sources.items():
+        (tmp_path / f'{name}.py').write_text(textwrap.dedent(source))
+
+    script = PROFILE_SCRIPT.format(slow_modules=SLOW_MODULES)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=ROOT_DIR,
+        env={'PYTHONPATH': f'{tmp_path}:{ROOT_DIR}', 'PYTHONDONTWRITEBYTECODE': '1'},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+
+    import_times = parse_import_times(proc.stderr)
+    stdout = proc.stdout.splitlines()
+    elapsed = float([x for x in stdout if x.startswith('ELAPSED')][0].split()[1])
+    profile = '\n'.join(
+        f'{name:40} {cumulative * 1000:8.1f} ms'
+        for name, _, cumulative in sorted(import_times, key=lambda x: -x[2])[:20]
+    )
+    print(f'Root menu shown in {elapsed * 1000:.1f} ms. Cumulative import times:\n{profile}')
+
+    slow_imported = [x.split()[1] for x in stdout if x.startswith('SLOW_MODULE_IMPORTED')]
+    assert slow_imported == []
+    assert elapsed < ROOT_MENU_BUDGET_SECONDS, profile
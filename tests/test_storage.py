@@ -1,4 +1,9 @@
-from resources.lib.storage import Storage
+import pickle
+import pytest
+import sqlite3
+import time
+from datetime import datetime
+from resources.lib.storage import ACCESS_UPDATE_INTERVAL_SECONDS, BUSY_TIMEOUT_SECONDS, Storage
 from tempfile import NamedTemporaryFile
 
 
@@ -105,3 +110,231 @@ def test_reopen_database():
         res = [x[1] for x in db2.get_all()]
 
     assert res == [{'data': 123}]
+
+
+def test_get_all_limit_offset():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name)
+
+        for i in range(1, 6):
+            db.set(i, i * 10)
+
+        first = db.get_all(limit=2)
+        middle = db.get_all(limit=2, offset=2)
+        newest = db.get_all(reverse=True, limit=3)
+        rest = db.get_all(offset=3)
+
+    assert first == [(1, 10), (2, 20)]
+    assert middle == [(3, 30), (4, 40)]
+    assert newest == [(5, 50), (4, 40), (3, 30)]
+    assert rest == [(4, 40), (5, 50)]
+
+
+def test_set_many_and_delete_many():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name)
+
+        db.set_many([(3, 'c'), (1, 'a'), (2, 'b')])
+        inserted = db.get_all()
+        db.delete_many([1, 3, 999])
+        remaining = db.get_all()
+
+    assert inserted == [(3, 'c'), (1, 'a'), (2, 'b')]
+    assert remaining == [(2, 'b')]
+
+
+def test_trim():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name)
+
+        db.set_many([(i, i) for i in range(10)])
+        db.set(0, 'updated')
+        db.trim(3)
+
+        res = db.get_all()
+
+    assert res == [(8, 8), (9, 9), (0, 'updated')]
+
+
+def test_session_commit():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name)
+
+        with db.session():
+            db.set(1, 'a')
+            db.set(2, 'b')
+            db.delete(1)
+
+        res = Storage(tmp.name).get_all()
+
+    assert res == [(2, 'b')]
+
+
+def test_session_rollback():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name)
+        db.set(1, 'a')
+
+        try:
+            with db.session():
+                db.set(2, 'b')
+                db.delete(1)
+                raise ValueError('Test error')
+        except ValueError:
+            pass
+
+        res = db.get_all()
+
+    assert res == [(1, 'a')]
+
+
+def test_string_keys():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name, namespace='strings')
+
+        db.set('https://example.com/a', 'a')
+        db.set(1, 'one')
+        db.set('1', 'string one')
+
+        res = (db.get('https://example.com/a'), db.get(1), db.get('1'), db.get('missing'))
+
+    assert res == ('a', 'one', 'string one', None)
+
+
+def test_namespaces_are_separate():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db1 = Storage(tmp.name, namespace='first')
+        db2 = Storage(tmp.name, namespace='second')
+
+        db1.set('key', 1)
+        db2.set('key', 2)
+
+        res = (db1.get('key'), db2.get('key'), db1.get_all())
+
+    assert res == (1, 2, [('key', 1)])
+
+
+def test_invalid_namespace():
+    with pytest.raises(ValueError):
+        Storage(':memory:', namespace='objects; DROP TABLE objects')
+
+
+def test_expiry(monkeypatch):
+    now = 1000000.0
+    monkeypatch.setattr(time, 'time', lambda: now)
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name)
+        db.set(1, 'short', ttl=10)
+        db.set(2, 'long', ttl=100)
+        db.set(3, 'forever')
+
+        now += 50
+        res = (db.get(1), db.get(2), db.get(3))
+        res_all = db.get_all()
+
+        db.delete_expired()
+        now -= 50
+        after_delete = db.get_all()
+
+    assert res == (None, 'long', 'forever')
+    assert res_all == [(2, 'long'), (3, 'forever')]
+    assert after_delete == [(2, 'long'), (3, 'forever')]
+
+
+def test_compression():
+    value = 'x' * 10000
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name, compress_threshold=1000)
+        db.set(1, value)
+        db.set(2, 'small')
+
+        res = (db.get(1), db.get(2))
+        size = db.total_size()
+
+    assert res == (value, 'small')
+    assert size < 1000
+
+
+def test_lru_eviction(monkeypatch):
+    now = 1000000.0
+    monkeypatch.setattr(time, 'time', lambda: now)
+    value = b'x' * 1000
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name, max_bytes=3500)
+        for key in ['a', 'b', 'c']:
+            now += 1
+            db.set(key, value)
+
+        # Use "a" so that "b" becomes the least recently used item
+        now += ACCESS_UPDATE_INTERVAL_SECONDS
+        db.get('a')
+
+        now += 1
+        db.set('d', value)
+
+        keys = [x[0] for x in db.get_all()]
+        size = db.total_size()
+
+    assert keys == ['a', 'c', 'd']
+    assert size <= 3500
+
+
+def test_get_does_not_take_the_write_lock():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name, max_bytes=10000)
+        db.set('a', 'value')
+
+        writer = sqlite3.connect(tmp.name, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            start = time.perf_counter()
+            res = db.get('a')
+            elapsed = time.perf_counter() - start
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+
+    assert res == 'value'
+    assert db.busy_retries == 0
+    assert elapsed < BUSY_TIMEOUT_SECONDS
+
+
+def test_eviction_sees_items_written_by_another_storage():
+    value = b'x' * 1000
+
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        db = Storage(tmp.name, max_bytes=3500)
+        other = Storage(tmp.name, max_bytes=3500)
+        db.set('a', value)
+        other.set('b', value)
+        other.set('c', value)
+        # The writes of the other Storage are noticed when the estimate of
+        # this one reaches the limit
+        for key in ['d', 'e', 'f']:
+            db.set(key, value)
+
+        size = db.total_size()
+
+    assert size <= 3500
+
+
+def test_migrate_legacy_table():
+    with NamedTemporaryFile(suffix='.sqlite') as tmp:
+        conn = sqlite3.connect(tmp.name)
+        conn.execute('CREATE TABLE objects (id INTEGER PRIMARY KEY, time TIMESTAMP, value BLOB)')
+        conn.execute('INSERT INTO objects (id, time, value) VALUES (?, ?, ?)',
+                     (1, datetime(2024, 1, 1), pickle.dumps('legacy')))
+        conn.commit()
+        conn.close()
+
+        db = Storage(tmp.name, max_bytes=10000)
+        db.set(2, 'new', ttl=60)
+
+        res = db.get_all()
+        size = db.total_size()
+
+    assert res == [(1, 'legacy'), (2, 'new')]
+    assert size > 0
@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+from resources.lib.storage import Storage
+
+NUM_PROCESSES = 8
+OPERATIONS_PER_PROCESS = 100
+
+
+def hammer(filename, worker_id, start_event, results):
+    """Write, read and trim the shared database like concurrent plugin invocations."""
+    db = Storage(filename, namespace='stress', max_bytes=200000, compress_threshold=1000)
+    errors = 0
+    start_event.wait()
+    start = time.perf_counter()
+
+    for i in range(OPERATIONS_PER_PROCESS):
+        try:
+            key = f'{worker_id}-{i}'
+            if i % 10 == 0:
+                with db.session():
+                    db.set_many([(f'{key}-{j}', 'x' * 2000) for j in range(5)])
+                    db.trim(2000)
+            else:
+                db.set(key, {'worker': worker_id, 'i': i})
+                db.get(key)
+                db.get_all(reverse=True, limit=10)
+        except Exception:
+            errors += 1
+
+    results.put({
+        'worker': worker_id,
+        'elapsed': time.perf_counter() - start,
+        'lock_wait': db.lock_wait_seconds,
+        'retries': db.busy_retries,
+        'errors': errors,
+    })
+
+
+def test_concurrent_processes(tmp_path):
+    filename = str(tmp_path / 'stress.sqlite')
+    Storage(filename, namespace='stress').set('init', 0)
+
+    ctx = multiprocessing.get_context('spawn')
+    start_event = ctx.Event()
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=hammer, args=(filename, i, start_event, results))
+        for i in range(NUM_PROCESSES)
+    ]
+    for p in processes:
+        p.start()
+
+    start = time.perf_counter()
+    start_event.set()
+    stats = [results.get(timeout=120) for _ in processes]
+    elapsed = time.perf_counter() - start
+    for p in processes:
+        p.join(timeout=10)
+
+    total_operations = NUM_PROCESSES * OPERATIONS_PER_PROCESS
+    lock_waits = sorted(x['lock_wait'] for x in stats)
+    print(
+        f'{total_operations} operations by {NUM_PROCESSES} processes in {elapsed:.2f} s '
+        f'({total_operations / elapsed:.0f} operations/s). '
+        f'Lock wait per process: median {lock_waits[len(lock_waits) // 2] * 1000:.0f} ms, '
+        f'max {lock_waits[-1] * 1000:.0f} ms. '
+        f'Busy retries: {sum(x["retries"] for x in stats)}'
+    )
+
+    assert sum(x['errors'] for x in stats) == 0
+    assert all(p.exitcode == 0 for p in processes)
+
+    db = Storage(filename, namespace='stress')
+    for worker_id in range(NUM_PROCESSES):
+        last_key = f'{worker_id}-{OPERATIONS_PER_PROCESS - 1}'
+        assert db.get(last_key) == {'worker': worker_id, 'i': OPERATIONS_PER_PROCESS - 1}
@@ -0,0 +1,63 @@
+import time
+import pytest
+from resources.lib import timing
+
+
+@pytest.fixture(autouse=True)
+def reset_timing():
+    timing.reset()
+    yield
+    timing.reset()
+
+
+def test_nested_phases_are_excluded_from_the_outer_phase():
+    with timing.measure('render'):
+        time.sleep(0.02)
+        with timing.measure('http search'):
+            time.sleep(0.05)
+        timing.add_bytes('http search', 2048)
+
+    phases = timing.phases()
+    assert phases['http search'].seconds >= 0.05
+    assert phases['http search'].num_bytes == 2048
+    assert 0.02 <= phases['render'].seconds < 0.05
+
+
+def test_phases_accumulate():
+    for _ in range(3):
+        with timing.measure('parse playlist'):
+            pass
+
+    assert timing.phases()['parse playlist'].count == 3
+
+
+def test_phase_recorded_on_exception():
+    with pytest.raises(ValueError):
+        with timing.measure('parse search'):
+            raise ValueError()
+
+    assert 'parse search' in timing.phases()
+
+
+def test_summary():
+    timing.record('http search', 0.2, num_bytes=10240)
+    timing.record('render', 0.05)
+
+    assert timing.summary(0.3) == \
+        'total 300 ms: http search 200 ms 10.0 kB, render 50 ms, other 50 ms'
+
+
+def test_measure_iter_excludes_the_consumer():
+    def slow_parser():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    with timing.measure('render'):
+        for _ in timing.measure_iter('parse search', slow_parser()):
+            time.sleep(0.02)
+
+    phases = timing.phases()
+    assert phases['parse search'].count == 1
+    assert 0.03 <= phases['parse search'].seconds < 0.06
+    assert phases['render'].seconds >= 0.06
@@ -0,0 +1,244 @@
+"""A local stand-in for the Yle Areena services.
+
+Serves search, content/list (live lists and season playlists), schedule,
+series page, preview and HLS responses. The responses are synthetic (see synthetic.py) or
+recorded fixtures (see record_fixtures.py). Latency, errors and payload sizes
+can be injected to measure the add-on under controlled network conditions.
+
+Start the server and point the add-on to it with environment variables:
+
+    python3 tools/fakeserver.py --port 8000 --latency 0.2 --error-rate 0.05
+
+    export YLEAREENA_AREENA_API_URL=http://127.0.0.1:8000
+    export YLEAREENA_AREENA_WEB_URL=http://127.0.0.1:8000
+    export YLEAREENA_PLAYER_API_URL=http://127.0.0.1:8000
+    export YLEAREENA_LIVE_STREAM_URL=http://127.0.0.1:8000
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tools.synthetic import synthetic_hls_playlist, synthetic_preview, synthetic_schedule, \
+    synthetic_search_results, synthetic_season_playlist, synthetic_series_page  # noqa: E402
+
+
+@dataclass
+class FakeServerConfig:
+    # Fixed delay before each response in seconds
+    latency: float = 0.0
+    # Uniformly distributed extra delay in seconds
+    jitter: float = 0.0
+    # Probability of responding with error_status
+    error_rate: float = 0.0
+    error_status: int = 503
+    # Total number of items in each search result, live list and season
+    count: int = 300
+    # Number of seasons on series pages
+    seasons: int = 3
+    # Extra bytes added to each JSON and HTML response
+    padding: int = 0
+    # Recorded fixtures by kind. Used instead of synthetic responses.
+    fixtures: Dict[str, List[Path]] = field(default_factory=dict)
+    seed: Optional[int] = None
+
+
+class FakeAreenaHandler(BaseHTTPRequestHandler):
+    config = FakeServerConfig()
+    rng = random.Random()
+    rng_lock = threading.Lock()
+
+    def do_GET(self):
+        self._inject_latency()
+        if self._inject_error():
+            self._send(self.config.error_status, 'text/plain', 'Injected error')
+            return
+
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        route = self._route(parsed.path, query)
+        if route is None:
+            self._send(404, 'text/plain', 'Not found')
+        else:
+            status, content_type, body = route
+            self._send(status, content_type, body)
+
+    def _route(self, path: str, query: Dict[str, str]) -> Optional[Tuple[int, str, str]]:
+        base_url = f'http://{self.headers.get("Host", "127.0.0.1")}'
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 30))
+
+        if path == '/v1/ui/search':
+            data = self._recorded('search') or synthetic_search_results(
+                limit, offset, self.config.count, query.get('query', ''))
+            return self._json(data)
+        elif path == '/v1/ui/content/list':
+            if 'season' in query or query.get('token') == 'synthetic-season':
+                data = self._recorded('season_playlist') or synthetic_season_playlist(
+                    limit, offset, self.config.count)
+            else:
+                data = self._recorded('content_list') or synthetic_search_results(
+                    limit, offset, self.config.count)
+            return self._json(data)
+        elif re.match(r'^/v1/ui/schedules/[^/]+/\d{4}-\d{2}-\d{2}\.json$', path):
+            day = date.fromisoformat(path.rsplit('/', 1)[-1][:-len('.json')])
+            return self._json(self._recorded('schedule') or synthetic_schedule(day))
+        elif re.match(r'^/v1/preview/[^/]+\.json$', path):
+            pid = path.rsplit('/', 1)[-1][:-len('.json')]
+            manifest_url = f'{base_url}/hls/vod/{pid}/index.m3u8'
+            data = self._recorded('preview') or synthetic_preview(pid, manifest_url)
+            return self._json(data)
+        elif path.startswith('/hls/'):
+            return (200, 'application/vnd.apple.mpegurl', synthetic_hls_playlist())
+        elif re.match(r'^/1-\d+$', path):
+            recorded = self._recorded_text('series_page')
+            if recorded is None:
+                playlist_url = f'{base_url}/v1/ui/content/list?token=synthetic-season'
+                html = synthetic_series_page(self.config.seasons, 30, playlist_url)
+            else:
+                html = recorded
+            padding = '<!-- ' + 'x' * self.config.padding + ' -->' if self.config.padding else ''
+            return (200, 'text/html; charset=utf-8', html + padding)
+        else:
+            return None
+
+    def _json(self, data) -> Tuple[int, str, str]:
+        if self.config.padding and isinstance(data, dict):
+            data = dict(data, padding='x' * self.config.padding)
+        return (200, 'application/json; charset=utf-8', json.dumps(data))
+
+    def _recorded(self, kind: str):
+        text = self._recorded_text(kind)
+        return json.loads(text) if text is not None else None
+
+    def _recorded_text(self, kind: str) -> Optional[str]:
+        paths = self.config.fixtures.get(kind)
+        if not paths:
+            return None
+
+        with self.rng_lock:
+            path = self.rng.choice(paths)
+        return path.read_text(encoding='utf-8')
+
+    def _inject_latency(self) -> None:
+        delay = self.config.latency
+        if self.config.jitter > 0:
+            with self.rng_lock:
+                delay += self.rng.uniform(0, self.config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _inject_error(self) -> bool:
+        with self.rng_lock:
+            return self.rng.random() < self.config.error_rate
+
+    def _send(self, status: int, content_type: str, body: str) -> None:
+        encoded = body.encode('utf-8')
+        etag = '"' + hashlib.md5(encoded).hexdigest() + '"'
+
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(encoded)))
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        if not getattr(self.server, 'quiet', False):
+            super().log_message(format, *args)
+
+
+def load_fixtures(fixture_dir: Path) -> Dict[str, List[Path]]:
+    """Find recorded fixtures in fixture_dir. Returns paths by kind."""
+    fixtures: Dict[str, List[Path]] = {}
+    for path in sorted(fixture_dir.glob('*/*')):
+        if path.suffix in ['.json', '.html']:
+            fixtures.setdefault(path.parent.name, []).append(path)
+    return fixtures
+
+
+def make_server(
+    config: FakeServerConfig,
+    host: str = '127.0.0.1',
+    port: int = 0,
+    quiet: bool = False
+) -> ThreadingHTTPServer:
+    """Create the server. Port 0 selects a free port."""
+    handler = type('ConfiguredFakeAreenaHandler', (FakeAreenaHandler,), {
+        'config': config,
+        'rng': random.Random(config.seed),
+        'rng_lock': threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    setattr(server, 'quiet', quiet)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local stand-in for the Yle Areena services')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Delay before each response in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Maximum random extra delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503,
+                        help='HTTP status code of the failing requests')
+    parser.add_argument('--count', type=int, default=300,
+                        help='Total number of items in each list')
+    parser.add_argument('--seasons', type=int, default=3,
+                        help='Number of seasons on series pages')
+    parser.add_argument('--padding', type=int, default=0,
+                        help='Extra bytes in each response')
+    parser.add_argument('--fixtures', type=Path,
+                        help='Serve recorded fixtures from this directory, '
+                             'for example tests/fixtures/v1')
+    parser.add_argument('--seed', type=int, help='Random seed for latency and errors')
+    parser.add_argument('--quiet', action='store_true', help='Do not log requests')
+    args = parser.parse_args()
+
+    config = FakeServerConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        count=args.count,
+        seasons=args.seasons,
+        padding=args.padding,
+        fixtures=load_fixtures(args.fixtures) if args.fixtures else {},
+        seed=args.seed,
+    )
+    server = make_server(config, args.host, args.port, args.quiet)
+    print(f'Serving on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
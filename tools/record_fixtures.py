@@ -0,0 +1,133 @@
+"""Record Areena API responses as test fixtures.
+
+The responses are saved in tests/fixtures/v<FIXTURE_VERSION>/<kind>/ and
+listed in manifest.json in the same directory. Increment FIXTURE_VERSION
+when the format of the saved files changes, so that older recordings are
+not mixed with new ones.
+
+Example:
+
+    python3 tools/record_fixtures.py --search Pasila --series 1-4446513 --preview 1-787136
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from resources.lib import areena, endpoints, extractor, httpclient, playlist  # noqa: E402
+
+FIXTURE_VERSION = 1
+FIXTURE_DIR = ROOT_DIR / 'tests' / 'fixtures' / f'v{FIXTURE_VERSION}'
+
+PREVIEW_HEADERS = {
+    'Referer': 'https://areena.yle.fi/tv',
+    'Origin': 'https://areena.yle.fi'
+}
+
+
+class Recorder:
+    def __init__(self, fixture_dir: Path):
+        self.fixture_dir = fixture_dir
+        self.manifest_path = fixture_dir / 'manifest.json'
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        else:
+            self.manifest = {'version': FIXTURE_VERSION, 'fixtures': {}}
+
+    def record(self, kind: str, name: str, url: str, headers=None) -> str:
+        r = httpclient.get(url, headers=headers)
+        r.raise_for_status()
+
+        extension = 'html' if kind == 'series_page' else 'json'
+        filename = f'{kind}/{_safe_name(name)}.{extension}'
+        path = self.fixture_dir / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(r.text, encoding='utf-8')
+
+        self.manifest['fixtures'][filename] = {
+            'kind': kind,
+            'url': url,
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        print(f'Recorded {url} into {path} ({len(r.content)} bytes)')
+
+        return r.text
+
+    def save_manifest(self) -> None:
+        self.fixture_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(
+            json.dumps(self.manifest, indent=2, sort_keys=True) + '\n',
+            encoding='utf-8'
+        )
+
+
+def record_search(recorder: Recorder, keyword: str) -> None:
+    url = areena._search_url(keyword, offset=0, page_size=areena.DEFAULT_PAGE_SIZE)
+    recorder.record('search', keyword, url)
+
+
+def record_live_lists(recorder: Recorder) -> None:
+    for source, url_func in areena.LIVE_SOURCES.items():
+        recorder.record('content_list', source, url_func(0, areena.LIVE_PAGE_SIZE))
+
+
+def record_series(recorder: Recorder, series_id: str, page_size: int) -> None:
+    series_url = endpoints.url(endpoints.AREENA_WEB, f'/{series_id}')
+    html = recorder.record('series_page', series_id, series_url)
+
+    seasons = playlist.parse_series_page(html)
+    if seasons is None:
+        print(f'No seasons found on the series page {series_id}', file=sys.stderr)
+        return
+
+    for season_number, season_url in seasons.season_playlist_urls():
+        url = playlist.playlist_page_url(season_url, 0, page_size)
+        recorder.record('season_playlist', f'{series_id}_season_{season_number}', url)
+
+
+def record_preview(recorder: Recorder, pid: str) -> None:
+    recorder.record('preview', pid, extractor.preview_url(pid), headers=PREVIEW_HEADERS)
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Record Areena API responses as test fixtures')
+    parser.add_argument('--search', action='append', default=[], metavar='KEYWORD',
+                        help='Record search results for KEYWORD')
+    parser.add_argument('--series', action='append', default=[], metavar='SERIES_ID',
+                        help='Record the series page and season playlists of SERIES_ID')
+    parser.add_argument('--preview', action='append', default=[], metavar='PROGRAM_ID',
+                        help='Record the preview API response for PROGRAM_ID')
+    parser.add_argument('--live', action='store_true',
+                        help='Record the live broadcast lists')
+    parser.add_argument('--page-size', type=int, default=100,
+                        help='Number of episodes on recorded season playlist pages')
+    args = parser.parse_args()
+
+    if not (args.search or args.series or args.preview or args.live):
+        parser.error('Nothing to record')
+
+    recorder = Recorder(FIXTURE_DIR)
+    try:
+        for keyword in args.search:
+            record_search(recorder, keyword)
+        for series_id in args.series:
+            record_series(recorder, series_id, args.page_size)
+        for pid in args.preview:
+            record_preview(recorder, pid)
+        if args.live:
+            record_live_lists(recorder)
+    finally:
+        recorder.save_manifest()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Synthetic Areena API responses for benchmarks and the fake server.
+
+The responses mimic the structure of the real responses. They are
+deterministic, so they can be used to compare performance between versions.
+"""
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from resources.lib.epg import finnish_timezone
+from typing import Optional
+
+
+def synthetic_series_page(
+    num_seasons: int = 5,
+    num_cards: int = 200,
+    playlist_url: str = 'https://areena.api.yle.fi/v1/ui/content/list?token=abc'
+) -> str:
+    """Build an HTML page that resembles an Areena series page.
+
+    The page has a large head, a lot of pre-rendered markup and the
+    __NEXT_DATA__ script at the end of the body, like the real pages.
+    playlist_url is the season playlist URL in __NEXT_DATA__.
+    """
+    options = [
+        {'title': f'Kausi {i}', 'parameters': {'availability': '', 'season': f'1-{1000 + i}'}}
+        for i in range(1, num_seasons + 1)
+    ]
+    cards = [
+        {
+            'type': 'card',
+            'title': f'Jakso {i}',
+            'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3,
+            'pointer': {'type': 'program', 'uri': f'yleareena://items/1-{2000000 + i}'},
+            'image': {'id': f'13-1-{3000000 + i}', 'version': '1624522786'},
+            'labels': [{'type': 'generic', 'formatted': f'ti {i % 28 + 1}.5.2024'}],
+        }
+        for i in range(num_cards)
+    ]
+    next_data = {
+        'props': {
+            'pageProps': {
+                'view': {
+                    'tabs': [
+                        {
+                            'title': 'Jaksot',
+                            'content': [{
+                                'source': {'uri': playlist_url},
+                                'filters': [{'options': options}] if num_seasons > 1 else [],
+                                'initialData': cards,
+                            }],
+                        },
+                    ],
+                },
+            },
+        },
+        'page': '/[...slug]',
+        'buildId': 'synthetic',
+    }
+
+    head = ''.join(
+        f'<link rel="preload" href="/_next/static/chunks/{i}.js" as="script"/>'
+        for i in range(100)
+    )
+    body = ''.join(
+        f'<div class="card"><a href="/1-{2000000 + i}"><img src="/img/{i}.jpg" alt="Jakso {i}"/>'
+        f'<span class="title">Jakso {i}</span><p>{card["description"]}</p></a></div>'
+        for i, card in enumerate(cards)
+    )
+    return (
+        '<!DOCTYPE html><html lang="fi"><head><meta charset="utf-8"/>'
+        f'<title>Sarja | Yle Areena</title>{head}</head>'
+        f'<body><div id="__next">{body}</div>'
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>'
+        '</body></html>'
+    )
+
+
+def synthetic_search_results(
+    num_results: int = 30,
+    offset: int = 0,
+    count: Optional[int] = None,
+    keyword: str = 'ohjelma'
+) -> dict:
+    """Build a search API or content/list API response.
+
+    count is the total number of results. The default is 10 pages.
+    """
+    if count is None:
+        count = 10 * num_results
+
+    cards = []
+    for i in range(offset, min(offset + num_results, count)):
+        pointer_type = ['program', 'clip', 'series', 'package'][i % 4]
+        cards.append({
+            'type': 'card',
+            'presentation': 'searchCard',
+            'title': f'Ohjelma {i}',
+            'description': ['14.05.2021', 'Sarjan nimi', None][i % 3],
+            'pointer': {'type': pointer_type, 'uri': f'yleareena://items/1-{4000000 + i}'},
+            'image': {'id': f'13-1-{5000000 + i}', 'version': '1624522786'},
+            'labels': [
+                {'type': 'duration', 'raw': f'PT{i % 2}H{i % 60}M{i % 60}S', 'formatted': '1 h'},
+                {'type': 'generic', 'formatted': 'Katsottavissa 30 päivää'},
+            ],
+            'transmissions': [],
+        })
+
+    return {
+        'data': cards,
+        'meta': {
+            'offset': offset,
+            'limit': num_results,
+            'count': count,
+            'analytics': {'onReceive': {'comscore': {'yle_search_phrase': keyword}}},
+        },
+    }
+
+
+def synthetic_season_playlist(
+    num_episodes: int = 100,
+    offset: int = 0,
+    count: Optional[int] = None
+) -> dict:
+    """Build a season playlist (content/list API) response.
+
+    count is the total number of episodes in the season. The default is 3
+    pages.
+    """
+    if count is None:
+        count = 3 * num_episodes
+
+    episodes = [
+        {
+            'type': 'card',
+            'presentation': 'episodeCard',
+            'title': f'Jakso {i}',
+            'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3,
+            'pointer': {'type': 'program', 'uri': f'yleareena://items/1-{2000000 + i}'},
+            'image': {'id': f'13-1-{3000000 + i}', 'version': '1624522786'},
+            'labels': [
+                {'type': 'progress', 'raw': f'PT{i % 60}M{i % 60}S'},
+                {'type': 'generic', 'formatted': f'ti {i % 28 + 1}.5.2024'},
+                {'type': 'generic', 'formatted': 'Katsottavissa 30 päivää'},
+            ],
+        }
+        for i in range(offset, min(offset + num_episodes, count))
+    ]
+
+    return {
+        'data': episodes,
+        'meta': {'offset': offset, 'limit': num_episodes, 'count': count},
+    }
+
+
+def synthetic_schedule(day: date, program_minutes: int = 30) -> dict:
+    """Build a schedule API response for one day.
+
+    The programs are program_minutes long and cover the whole day in
+    Finland.
+    """
+    noon = datetime.combine(day, time(12), tzinfo=timezone.utc).timestamp()
+    start = datetime.combine(day, time(), tzinfo=finnish_timezone(noon))
+    end_of_day = start + timedelta(days=1)
+    cards = []
+    while start < end_of_day:
+        end = start + timedelta(minutes=program_minutes)
+        cards.append({
+            'type': 'card',
+            'presentation': 'scheduleCard',
+            'title': f'Ohjelma {start:%H.%M}',
+            'description': 'Lorem ipsum dolor sit amet.',
+            'pointer': {'type': 'program', 'uri': f'yleareena://items/1-{start:%H%M}'},
+            'labels': [
+                {'type': 'broadcastStartDate', 'raw': start.isoformat(),
+                 'formatted': f'{start:%H.%M}'},
+                {'type': 'broadcastEndDate', 'raw': end.isoformat(),
+                 'formatted': f'{end:%H.%M}'},
+            ],
+        })
+        start = end
+
+    return {
+        'data': cards,
+        'meta': {'offset': 0, 'limit': len(cards), 'count': len(cards)},
+    }
+
+
+def synthetic_preview(
+    pid: str = '1-787136',
+    manifest_url: str = 'https://yleawodamd.akamaized.net/foo/bar/manifest.m3u8'
+) -> dict:
+    """Build an on-demand preview API response."""
+    return {
+        'meta': {'id': pid},
+        'data': {
+            'ongoing_ondemand': {
+                'media_id': '6-a0c1e8d2a1b94e0e8f3b5e0f8a1b2c3d',
+                'manifest_url': manifest_url,
+                'content_type': 'VideoObject',
+                'duration': {'duration_in_seconds': 1832},
+                'description': {'fin': 'Kuvaus ' * 50, 'swe': 'Beskrivning ' * 50},
+                'title': {'fin': 'Otsikko', 'swe': 'Rubrik'},
+                'image': {'id': '13-1-3000000', 'version': '1624522786'},
+                'subtitles': [
+                    {'language': lang, 'uri': f'https://example.com/{lang}.vtt'}
+                    for lang in ['fin', 'swe', 'eng']
+                ],
+            },
+        },
+    }
+
+
+def synthetic_hls_playlist(num_segments: int = 10, segment_seconds: int = 6) -> str:
+    """Build a HLS media playlist."""
+    segments = ''.join(
+        f'#EXTINF:{segment_seconds}.0,\nsegment{i}.ts\n'
+        for i in range(num_segments)
+    )
+    return (
+        '#EXTM3U\n'
+        '#EXT-X-VERSION:3\n'
+        f'#EXT-X-TARGETDURATION:{segment_seconds}\n'
+        '#EXT-X-MEDIA-SEQUENCE:0\n'
+        f'{segments}'
+        '#EXT-X-ENDLIST\n'
+    )